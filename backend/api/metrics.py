@@ -0,0 +1,186 @@
+"""
+Request metrics middleware and scrape-time metrics
+
+Runs as the outermost ASGI middleware so latency and status cover
+everything the client sees, including 429s from rate limiting. Requests
+are labelled with their route template (/share/{token}/query), never the
+raw path, so share tokens do not end up in label values.
+"""
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+from api.rate_limit import rate_limiter
+from services.cursor_service import cursor_service
+from services.query_service import inflight_queries, result_cache, shared_result_cache
+from utils.cost_tracker import cost_tracker
+from utils.executor import query_executor
+from utils.logger import logging_stats
+from utils.metrics import (
+    REQUEST_ERRORS,
+    REQUEST_LATENCY,
+    RESPONSE_BYTES,
+    CallbackMetric,
+    metrics_registry
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route that serves a request"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records latency, response size and errors per route template"""
+
+    def __init__(self, app: ASGIApp):
+        """
+        Wrap an ASGI app
+
+        Args:
+            app: Downstream ASGI app
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Time the request and observe its status and body size"""
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception as e:
+            REQUEST_ERRORS.inc(route=route, type=type(e).__name__)
+            raise
+        finally:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route,
+                status=str(status_code)
+            )
+            RESPONSE_BYTES.observe(size, route=route)
+
+        if status_code >= 400:
+            REQUEST_ERRORS.inc(route=route, type=f"http_{status_code}")
+
+
+# Counters other components keep themselves, read at scrape time
+metrics_registry.register(CallbackMetric(
+    "query_in_flight",
+    "Queries running on the query worker pool",
+    "gauge",
+    lambda: {(): query_executor.stats()["active"]}
+))
+metrics_registry.register(CallbackMetric(
+    "query_queue_depth",
+    "Queries waiting for a query worker",
+    "gauge",
+    lambda: {(): query_executor.stats()["queued"]}
+))
+metrics_registry.register(CallbackMetric(
+    "query_rejected_total",
+    "Queries rejected by the worker pool, by reason",
+    "counter",
+    lambda: {
+        ("capacity",): query_executor.rejected,
+        ("queue_timeout",): query_executor.timed_out,
+    },
+    ("reason",)
+))
+metrics_registry.register(CallbackMetric(
+    "query_coalesced_total",
+    "Query executions saved by joining an identical query already in flight",
+    "counter",
+    lambda: {(): inflight_queries.coalesced}
+))
+metrics_registry.register(CallbackMetric(
+    "rate_limit_rejected_total",
+    "Requests answered with 429 by per-token rate limiting",
+    "counter",
+    lambda: {(): rate_limiter.rejected}
+))
+metrics_registry.register(CallbackMetric(
+    "log_records_discarded_total",
+    "Log records not written, by reason (queue full or sampled out)",
+    "counter",
+    lambda: {
+        ("queue_full",): logging_stats()["dropped"],
+        ("sampled_out",): logging_stats()["sampled_out"],
+    },
+    ("reason",)
+))
+metrics_registry.register(CallbackMetric(
+    "query_estimated_bytes_total",
+    "Dry-run byte estimates of queries by dataset and admission decision",
+    "counter",
+    cost_tracker.estimated_bytes,
+    ("dataset", "decision")
+))
+metrics_registry.register(CallbackMetric(
+    "query_actual_bytes_total",
+    "Bytes processed by backend executions by dataset",
+    "counter",
+    cost_tracker.actual_bytes,
+    ("dataset",)
+))
+metrics_registry.register(CallbackMetric(
+    "query_result_cache_requests_total",
+    "Result cache lookups by outcome",
+    "counter",
+    lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses},
+    ("outcome",)
+))
+metrics_registry.register(CallbackMetric(
+    "query_result_cache_bytes",
+    "Estimated bytes held by the result cache",
+    "gauge",
+    lambda: {(): result_cache.stats()["bytes"]}
+))
+metrics_registry.register(CallbackMetric(
+    "query_cursor_retained_bytes",
+    "Estimated bytes of paginated query results retained for their later pages",
+    "gauge",
+    lambda: {(): cursor_service.stats()["bytes"]}
+))
+if shared_result_cache is not None:
+    metrics_registry.register(CallbackMetric(
+        "query_shared_cache_requests_total",
+        "Shared (host-wide) result cache lookups of this process by outcome",
+        "counter",
+        lambda: {
+            ("hit",): shared_result_cache.hits,
+            ("miss",): shared_result_cache.misses,
+            ("error",): shared_result_cache.errors,
+        },
+        ("outcome",)
+    ))
+    metrics_registry.register(CallbackMetric(
+        "query_shared_cache_bytes",
+        "Bytes of results stored in the shared result cache file, as of this process's last write",
+        "gauge",
+        lambda: {(): shared_result_cache.stats()["bytes"]}
+    ))
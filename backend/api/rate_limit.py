@@ -0,0 +1,77 @@
+"""
+Per-share-token rate limiting middleware
+
+Runs as plain ASGI middleware in front of routing, so a request over its
+token's limit is answered with 429 before the body is read or parsed.
+Limits come from the token's SHARE_TOKENS entry (requests_per_minute,
+burst) with the RATE_LIMIT_* settings as defaults.
+"""
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+from utils.rate_limiter import RateLimiter
+
+SHARE_PREFIX = "/share/"
+
+# Shared across requests in this process
+rate_limiter = RateLimiter()
+
+
+def _share_token(path: str) -> str:
+    """Token segment of a /share/{token}/... path, or "" for other paths"""
+    if not path.startswith(SHARE_PREFIX):
+        return ""
+    return path[len(SHARE_PREFIX):].split("/", 1)[0]
+
+
+class RateLimitMiddleware:
+    """Token bucket per share token, with X-RateLimit-* response headers"""
+
+    def __init__(self, app: ASGIApp):
+        """
+        Wrap an ASGI app
+
+        Args:
+            app: Downstream ASGI app
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Check the token's bucket, then pass through or answer 429"""
+        if scope["type"] != "http" or not config.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        # Unknown tokens are left to the route's 401
+        token = _share_token(scope["path"])
+        token_info = config.SHARE_TOKENS.get(token)
+        if token_info is None:
+            await self.app(scope, receive, send)
+            return
+
+        decision = rate_limiter.check(
+            token,
+            requests_per_minute=token_info.get("requests_per_minute", config.RATE_LIMIT_REQUESTS_PER_MINUTE),
+            burst=token_info.get("burst", config.RATE_LIMIT_BURST)
+        )
+        headers = decision.headers()
+
+        if not decision.allowed:
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Rate limit exceeded for this share link, please retry later"},
+                headers=headers
+            )
+            await response(scope, receive, send)
+            return
+
+        raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + raw_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,86 @@
+"""
+Request log context middleware
+
+Binds a request ID, the share token's label (never the token itself)
+and the route template to the log context, so every record logged while
+the request is handled - on the event loop or a query worker - can be
+tied back to it, and logs one structured access record per request.
+The request ID is taken from an incoming X-Request-ID header or
+generated, and echoed in the response.
+"""
+import logging
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+from api.metrics import route_template
+from api.rate_limit import _share_token
+from utils.logger import bind_log_context, reset_log_context
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+def _request_id(scope: Scope) -> str:
+    """Incoming X-Request-ID (if short and printable) or a new ID"""
+    for name, value in scope.get("headers", ()):
+        if name == REQUEST_ID_HEADER and 0 < len(value) <= 128 and value.isascii():
+            return value.decode("ascii")
+    return uuid.uuid4().hex
+
+
+class RequestLogMiddleware:
+    """Binds per-request log context and logs each completed request"""
+
+    def __init__(self, app: ASGIApp):
+        """
+        Wrap an ASGI app
+
+        Args:
+            app: Downstream ASGI app
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Bind the context, run the request and log its outcome"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _request_id(scope)
+        token_info = config.SHARE_TOKENS.get(_share_token(scope["path"]))
+        route = route_template(scope)
+        context = bind_log_context(
+            request_id=request_id,
+            token_label=token_info.get("label") if token_info else None,
+            route=route
+        )
+
+        start = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode("ascii"))
+                ]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            logger.info("Request completed", extra={
+                "method": scope["method"],
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                "response_bytes": size,
+            })
+            reset_log_context(context)
@@ -1,8 +1,9 @@
 """
 Dataset API endpoints
 """
-from fastapi import APIRouter, HTTPException, status, Path
+from fastapi import APIRouter, HTTPException, Request, status, Path
 
+import config
 from schemas.dataset_schema import DatasetItem, DatasetFields
 from services.dataset_service import dataset_service
 from core.security import validate_dataset_exists
@@ -10,6 +11,11 @@ from api.dependencies import get_verified_token
 
 router = APIRouter(prefix="/share", tags=["datasets"])
 
+# Metadata only changes with the registry; clients revalidate with the ETag.
+# The bodies are the same for every token and the token is part of the URL,
+# so browsers and shared caches (CDNs) may both store them
+METADATA_CACHE_CONTROL = f"public, max-age={config.METADATA_CACHE_MAX_AGE}, must-revalidate"
+
 
 @router.get(
     "/{token}/datasets",
@@ -18,19 +24,21 @@ router = APIRouter(prefix="/share", tags=["datasets"])
     description="Returns list of datasets available for the given token"
 )
 async def list_datasets(
+    request: Request,
     token: str = Path(...)
 ) -> list[DatasetItem]:
     """
     Get all datasets available for sharing
     
     Args:
+        request: Incoming request (If-None-Match is honoured)
         token: Share token from URL path
     
     Returns:
-        List of dataset items
+        List of dataset items, or 304 if the client's copy is current
     """
     get_verified_token(token)
-    return dataset_service.get_all_datasets()
+    return dataset_service.datasets_response().respond(request, METADATA_CACHE_CONTROL)
 
 
 @router.get(
@@ -40,6 +48,7 @@ async def list_datasets(
     description="Returns available dimensions and measures for a dataset"
 )
 async def get_dataset_fields(
+    request: Request,
     token: str = Path(...),
     dataset_id: str = Path(...)
 ) -> DatasetFields:
@@ -47,11 +56,13 @@ async def get_dataset_fields(
     Get dimensions and measures for a specific dataset
     
     Args:
+        request: Incoming request (If-None-Match is honoured)
         token: Share token from URL path
         dataset_id: Dataset ID
     
     Returns:
-        DatasetFields with dimensions and measures
+        DatasetFields with dimensions and measures, or 304 if the
+        client's copy is current
     
     Raises:
         HTTPException: If dataset not found
@@ -62,8 +73,8 @@ async def get_dataset_fields(
     # Validate dataset exists (this will raise if not found)
     validate_dataset_exists(dataset_id)
     
-    # Get fields
-    fields = dataset_service.get_dataset_fields(dataset_id)
+    # Get pre-serialized fields
+    fields = dataset_service.fields_response(dataset_id)
     
     if not fields:
         raise HTTPException(
@@ -71,4 +82,4 @@ async def get_dataset_fields(
             detail=f"Dataset '{dataset_id}' not found"
         )
     
-    return fields
+    return fields.respond(request, METADATA_CACHE_CONTROL)
@@ -0,0 +1,31 @@
+"""
+Metrics API endpoint
+"""
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import Response
+
+import config
+from utils.metrics import CONTENT_TYPE, metrics_registry
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description="Request, query and worker pool metrics in the Prometheus text format",
+    response_class=Response
+)
+async def metrics() -> Response:
+    """
+    Render all registered metrics
+
+    Returns:
+        Text exposition of every metric
+
+    Raises:
+        HTTPException: 404 if metrics are disabled
+    """
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,90 @@
+"""
+Request profile API endpoints
+"""
+from fastapi import APIRouter, HTTPException, status, Path
+from fastapi.responses import PlainTextResponse
+
+from api.dependencies import get_verified_token
+from api.timing import profile_store, profiling_allowed
+from utils.json_response import FastJSONResponse
+
+router = APIRouter(prefix="/share", tags=["profiling"])
+
+
+def _verify_profiling_token(token: str) -> str:
+    """Verify a share token and that it may use profiling"""
+    get_verified_token(token)
+    if not profiling_allowed(token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling is not enabled for this share link"
+        )
+    return token
+
+
+@router.get(
+    "/{token}/profiles",
+    summary="List request profiles",
+    description=(
+        "Lists the most recent profiles recorded for this share link. A "
+        "request is profiled when it sends the header `X-Profile: 1` and "
+        "the share link is allowed to profile."
+    )
+)
+async def list_profiles(
+    token: str = Path(...)
+) -> list[dict]:
+    """
+    List the token's stored profiles, newest first
+    
+    Args:
+        token: Share token from URL path
+    
+    Returns:
+        Profile summaries (id, path, duration, samples)
+    
+    Raises:
+        HTTPException: If the token is invalid, or 403 if it may not profile
+    """
+    _verify_profiling_token(token)
+    return FastJSONResponse(content=[profile.summary() for profile in profile_store.for_token(token)])
+
+
+@router.get(
+    "/{token}/profiles/{profile_id}",
+    summary="Get a request profile",
+    description=(
+        "Returns the sampled stacks of a profiled request in folded format "
+        "(one `frame;frame;... count` line per stack), readable by "
+        "flamegraph.pl and speedscope."
+    ),
+    response_class=PlainTextResponse
+)
+async def get_profile(
+    token: str = Path(...),
+    profile_id: str = Path(...)
+) -> PlainTextResponse:
+    """
+    Get the folded stacks of one profile
+    
+    Args:
+        token: Share token from URL path
+        profile_id: ID returned in the profiled response's X-Profile-Id
+    
+    Returns:
+        Folded stack samples as text
+    
+    Raises:
+        HTTPException: If the token is invalid, 403 if it may not profile,
+            or 404 if the profile does not exist (or expired)
+    """
+    _verify_profiling_token(token)
+    
+    profile = profile_store.get(profile_id)
+    if profile is None or profile.token != token:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile '{profile_id}' not found"
+        )
+    
+    return PlainTextResponse(content=profile.folded)
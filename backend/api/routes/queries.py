@@ -1,37 +1,429 @@
 """
 Query API endpoints
 """
-from fastapi import APIRouter, Body, Path
+import asyncio
+import logging
+import threading
+from datetime import date
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Generator, Optional, Union
 
-from schemas.query_schema import ExploreQuery, QueryResponse
-from services.query_service import query_service
+from fastapi import APIRouter, Body, HTTPException, Path, Request, status
+from fastapi.responses import Response, StreamingResponse
+
+import config
+from schemas.query_schema import (
+    ExploreQuery,
+    QueryResponse,
+    ColumnarQueryResponse,
+    BatchQueryResponse
+)
+from services.cost_service import Admission, cost_service
+from services.cursor_service import cursor_service
+from services.data_version_service import data_version_service
+from services.query_service import ScanGroup, query_service
 from api.dependencies import get_verified_token
+from utils.columnar import arrow_available, to_arrow_ipc, to_rows
+from utils.cost_tracker import cost_tracker
+from utils.executor import query_executor
+from utils.http_cache import etag_matches, make_etag, not_modified
+from utils.json_response import FastJSONResponse, dumps
+from utils.tracing import stage
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/share", tags=["queries"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.data-explorer.columnar+json"
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _ndjson_stream(
+    first: Optional[list[dict]],
+    chunks: Generator[list[dict], None, None],
+    headers: dict[str, str]
+) -> StreamingResponse:
+    """
+    Stream row chunks as NDJSON
+
+    The first chunk was fetched on the query pool before the response
+    starts, so admission and backend errors still produce a proper error
+    status. The rest belong to a query that is already admitted and are
+    pulled on a plain worker thread: once the 200 is sent, the per-token
+    queue cap and queue timeout can no longer cut the body short. The
+    chunk generator is closed when the stream ends or the client goes
+    away, which releases the backend's pooled connection or result iterator.
+    """
+    # A pull still running for a disconnected client finishes before the close
+    lock = threading.Lock()
+
+    def pull() -> Optional[list[dict]]:
+        with lock:
+            return next(chunks, None)
+
+    def close() -> None:
+        with lock:
+            try:
+                chunks.close()
+            except Exception as e:
+                logger.warning("Closing a result stream failed", extra={"error": repr(e)})
+
+    def close_later() -> None:
+        # Not awaited: this also runs while the request is being cancelled
+        asyncio.get_running_loop().run_in_executor(None, close)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            chunk = first
+            while chunk is not None:
+                yield b"".join(dumps(row) + b"\n" for row in chunk)
+                chunk = await asyncio.to_thread(pull)
+        finally:
+            close_later()
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def _validators(payload: ExploreQuery, token: str, media_type: str) -> Optional[dict[str, str]]:
+    """
+    ETag and Cache-Control of a query result, known before it runs
+
+    The result is determined by the normalized query, the dataset's data
+    version, the token's byte budget (which may downgrade the range) and
+    the response format, so the ETag hashes exactly those.
+
+    Returns:
+        Validator headers, or None if the backend has no data version
+    """
+    version = data_version_service.version(payload.dataset_id)
+    if version is None:
+        return None
+
+    etag = make_etag(repr((
+        query_service.cache_key(payload),
+        payload.page_size,
+        payload.cursor,
+        version,
+        cost_service.budget(token),
+        media_type,
+    )).encode("utf-8"))
+
+    # Ranges that include today still receive data until the day closes
+    if payload.date_to >= date.today():
+        max_age = config.QUERY_RESULT_RECENT_MAX_AGE
+    else:
+        max_age = config.QUERY_RESULT_HISTORICAL_MAX_AGE
+
+    return {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "Accept",
+    }
+
+
+def _render_rows(result: dict) -> bytes:
+    """Serialize a columnar result in the default row format"""
+    return dumps({"rows": to_rows(result)})
+
+
+def _execute(
+    payload: ExploreQuery,
+    token: str,
+    render: Callable[[dict], bytes]
+) -> tuple[bytes, dict[str, str]]:
+    """Admit a query against the token's byte budget, execute and render it"""
+    admission = cost_service.admit(payload, token)
+    result = query_service.execute_columns(admission.query)
+    with stage("serialize"):
+        return render(result), admission.headers()
+
+
+def _render_page(page: dict, media_type: str, meta: dict) -> bytes:
+    """Serialize one page in the negotiated format (JSON formats carry meta)"""
+    if media_type == ARROW_MEDIA_TYPE:
+        return to_arrow_ipc(page)
+    if media_type == NDJSON_MEDIA_TYPE:
+        return b"".join(dumps(row) + b"\n" for row in to_rows(page))
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        return dumps({**page, **meta})
+    return dumps({"rows": to_rows(page), **meta})
+
+
+def _execute_page(payload: ExploreQuery, token: str, media_type: str) -> tuple[bytes, dict[str, str]]:
+    """Serve one page of a paginated query from its retained result and render it"""
+    page, retained, next_cursor = cursor_service.execute_page(payload, token)
+    headers = {**retained.headers, "X-Total-Rows": str(retained.total_rows)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    with stage("serialize"):
+        meta = {"next_cursor": next_cursor, "total_rows": retained.total_rows}
+        return _render_page(page, media_type, meta), headers
+
+
+def _stream(
+    payload: ExploreQuery,
+    token: str
+) -> tuple[tuple[Optional[list[dict]], Generator[list[dict], None, None]], dict[str, str]]:
+    """Admit a query against the token's byte budget, start streaming it and fetch the first chunk"""
+    admission = cost_service.admit(payload, token)
+    chunks = query_service.stream_query(admission.query)
+    try:
+        first = next(chunks, None)
+    except BaseException:
+        chunks.close()
+        raise
+    return (first, chunks), admission.headers()
+
+
+def _respond(
+    request: Request,
+    payload: ExploreQuery,
+    token: str,
+    media_type: str,
+    handler: Callable[[], tuple[Any, dict[str, str]]]
+) -> tuple[Optional[Any], dict[str, str]]:
+    """
+    Revalidate or answer a query in one call on the query pool
+
+    Revalidation is answered from the data version alone, before
+    admission; otherwise the handler executes the query.
+
+    Args:
+        request: Incoming request (If-None-Match is honoured)
+        payload: Query parameters
+        token: Verified share token
+        media_type: Negotiated response format
+        handler: Admits, executes and renders the query
+
+    Returns:
+        Tuple of (handler output, or None if the client's copy is
+        current, and response headers including the validators)
+
+    Raises:
+        HTTPException: If validation or query execution fails
+    """
+    validators = _validators(payload, token, media_type) or {}
+    if validators and etag_matches(request, validators["ETag"]):
+        # Only a valid query has a result to be current
+        query_service.validate(payload)
+        return None, validators
+    content, headers = handler()
+    return content, {**headers, **validators}
+
 
 @router.post(
     "/{token}/query",
     response_model=QueryResponse,
     summary="Execute explore query",
-    description="Execute a query to explore data by dimension and measure"
+    description=(
+        "Execute a query to explore data by dimension and measure. "
+        "The response format is negotiated with the Accept header: "
+        f"'{COLUMNAR_MEDIA_TYPE}' returns {{columns, data}}, "
+        f"'{ARROW_MEDIA_TYPE}' returns an Arrow IPC stream and "
+        f"'{NDJSON_MEDIA_TYPE}' streams rows as NDJSON. "
+        "Anything else returns the default row format. Results carry an "
+        "ETag covering the query and the dataset's data version; a "
+        "matching If-None-Match is answered with 304 without running "
+        "the query. With page_size the result is paginated: the first "
+        "page runs the query and keeps its result server-side, and the "
+        "same query sent with the returned next_cursor (also in the "
+        "X-Next-Cursor header) gets the next page without running it again. "
+        "A cursor from before a data load, or from another query, is "
+        "rejected with 410; restart pagination without a cursor."
+    ),
+    responses={
+        200: {
+            "content": {
+                COLUMNAR_MEDIA_TYPE: {"schema": ColumnarQueryResponse.model_json_schema()},
+                ARROW_MEDIA_TYPE: {},
+                NDJSON_MEDIA_TYPE: {},
+            }
+        },
+        304: {"description": "The client's cached result is still current"},
+        406: {"description": "Requested format is not available on this server"},
+        410: {"description": "The cursor expired; restart pagination without a cursor"},
+    }
 )
 async def execute_query(
+    request: Request,
     token: str = Path(...),
     payload: ExploreQuery = Body(...)
-) -> QueryResponse:
+) -> Union[QueryResponse, Response]:
     """
     Execute an explore query
-    
+
     Args:
+        request: Incoming request (Accept header selects the format,
+            If-None-Match is honoured)
         token: Share token from URL path
         payload: Query parameters (dimension, measure, date range, etc)
+
+    Returns:
+        QueryResponse with result rows, the negotiated format, or 304 if
+        the client's copy is current
+
+    Raises:
+        HTTPException: If validation or query execution fails, 400 if
+            the query is over the token's byte budget or the cursor is
+            malformed, 410 if the cursor expired (another query or data
+            version, or its result is gone), 406 if Arrow is
+            requested without pyarrow installed, or 503 if the query
+            worker pool is saturated
+    """
+    get_verified_token(token)
+    # Bytes the backends process for this request are billed to the token
+    cost_tracker.bill_to(token)
+    accept = request.headers.get("accept", "")
+    media_type = next(
+        (t for t in (ARROW_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, NDJSON_MEDIA_TYPE) if t in accept),
+        JSON_MEDIA_TYPE
+    )
+
+    if media_type == ARROW_MEDIA_TYPE and not arrow_available():
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="Arrow format is not available (pyarrow not installed)"
+        )
+
+    if payload.page_size is not None:
+        handler = partial(_execute_page, payload, token, media_type)
+    elif media_type == ARROW_MEDIA_TYPE:
+        handler = partial(_execute, payload, token, to_arrow_ipc)
+    elif media_type == COLUMNAR_MEDIA_TYPE:
+        handler = partial(_execute, payload, token, dumps)
+    elif media_type == NDJSON_MEDIA_TYPE:
+        handler = partial(_stream, payload, token)
+    else:
+        handler = partial(_execute, payload, token, _render_rows)
+
+    # One trip through the token's queue covers revalidation and execution
+    content, headers = await query_executor.run(
+        _respond, request, payload, token, media_type, handler, tenant=token
+    )
+    if content is None:
+        return not_modified(headers["ETag"], headers["Cache-Control"], {"Vary": "Accept"})
+
+    if payload.page_size is not None or media_type == ARROW_MEDIA_TYPE:
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        return FastJSONResponse(content=content, media_type=COLUMNAR_MEDIA_TYPE, headers=headers)
+
+    if media_type == NDJSON_MEDIA_TYPE:
+        return _ndjson_stream(*content, headers)
+
+    # Engine output is trusted: serialized on the worker, it skips
+    # response_model re-validation (the OpenAPI schema is unchanged)
+    return FastJSONResponse(content=content, headers=headers)
+
+
+def _prepare_batch(
+    payload: list[ExploreQuery],
+    token: str
+) -> tuple[
+    list[Union[Admission, HTTPException]],
+    list[Union[dict, HTTPException, None]],
+    list[ScanGroup]
+]:
+    """Admit every query against the token's byte budget, then plan the batch"""
+    # Pages are served by /query only; a paginated query fails on its own
+    paginated = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Cursor pagination is not supported in batches"
+    )
+    admitted = iter(cost_service.admit_many([q for q in payload if q.page_size is None], token))
+    admissions = [paginated if q.page_size is not None else next(admitted) for q in payload]
+    results, groups = query_service.prepare_batch([
+        admission.query if isinstance(admission, Admission) else admission
+        for admission in admissions
+    ])
+    return admissions, results, groups
+
+
+def _batch_entry(result: Union[dict, HTTPException], admission: Union[Admission, HTTPException]) -> dict:
+    """One batch result: rows (with the served start date if downgraded) or an error"""
+    if not isinstance(result, dict):
+        return {"error": {"status_code": result.status_code, "detail": result.detail}}
+    entry = {"rows": to_rows(result)}
+    if isinstance(admission, Admission) and admission.downgraded:
+        entry["date_from"] = admission.query.date_from.isoformat()
+    return entry
+
+
+def _batch_body(
+    results: list[Union[dict, HTTPException]],
+    admissions: list[Union[Admission, HTTPException]]
+) -> bytes:
+    """Serialize batch results, one rows or error entry per query"""
+    with stage("serialize"):
+        return dumps({
+            "results": [
+                _batch_entry(result, admission)
+                for result, admission in zip(results, admissions)
+            ]
+        })
+
+
+@router.post(
+    "/{token}/queries",
+    response_model=BatchQueryResponse,
+    summary="Execute a batch of explore queries",
+    description=(
+        "Execute several explore queries in one request. Queries over the "
+        "same table, date range and platform share a single scan, groups "
+        "run concurrently, and every query reports its own error. Queries "
+        "over the token's byte budget are rejected or downgraded individually."
+    )
+)
+async def execute_queries(
+    token: str = Path(...),
+    payload: list[ExploreQuery] = Body(..., min_length=1, max_length=config.MAX_BATCH_QUERIES)
+) -> BatchQueryResponse:
+    """
+    Execute a batch of explore queries
+    
+    Args:
+        token: Share token from URL path
+        payload: List of queries (at most MAX_BATCH_QUERIES)
     
     Returns:
-        QueryResponse with result rows
+        BatchQueryResponse with one result per query, in request order
     
     Raises:
-        HTTPException: If validation or query execution fails
+        HTTPException: If the token is invalid, or 503 if the query
+            worker pool is saturated while planning the batch
     """
     get_verified_token(token)
-    return query_service.execute_query(payload)
+    cost_tracker.bill_to(token)
+    
+    admissions, results, groups = await query_executor.run(_prepare_batch, payload, token, tenant=token)
+    
+    # Never queue more scans than the executor accepts per share token;
+    # the other groups wait here instead of being rejected with a 503
+    slots = asyncio.Semaphore(query_executor.max_queue_per_tenant)
+    
+    async def run_group(group: ScanGroup) -> dict[int, dict]:
+        async with slots:
+            return await query_executor.run(query_service.execute_scan_group, group, tenant=token)
+    
+    outcomes = await asyncio.gather(*(run_group(group) for group in groups), return_exceptions=True)
+    
+    for group, outcome in zip(groups, outcomes):
+        if isinstance(outcome, BaseException):
+            if not isinstance(outcome, HTTPException):
+                logger.error("Batch scan failed", extra={"table": group.table, "error": repr(outcome)})
+                outcome = HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Query execution failed"
+                )
+            for _, _, positions in group.members.values():
+                for position in positions:
+                    results[position] = outcome
+        else:
+            for position, result in outcome.items():
+                results[position] = result
+    
+    body = await query_executor.run(_batch_body, results, admissions, tenant=token)
+    return FastJSONResponse(content=body)
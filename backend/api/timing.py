@@ -0,0 +1,85 @@
+"""
+Server-Timing and opt-in request profiling middleware
+
+Every HTTP request gets a RequestTrace; the stages recorded while it is
+handled are reported in a Server-Timing response header. A request that
+sends `X-Profile: 1` on a share token allowed to profile (the token's
+"profiling" SHARE_TOKENS key) is also sampled by a SamplingProfiler; its
+profile ID is returned in X-Profile-Id and the profile can be fetched
+from /share/{token}/profiles/{profile_id}.
+"""
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+from api.rate_limit import _share_token
+from utils.profiler import Profile, ProfileStore, SamplingProfiler
+from utils.tracing import RequestTrace, trace_request
+
+PROFILE_REQUEST_HEADER = b"x-profile"
+
+# Most recent profiles of this process
+profile_store = ProfileStore(config.PROFILING_MAX_PROFILES)
+
+
+def profiling_allowed(token: str) -> bool:
+    """Whether a share token may request profiles"""
+    return config.PROFILING_ENABLED and bool(config.SHARE_TOKENS.get(token, {}).get("profiling"))
+
+
+def _wants_profile(scope: Scope) -> bool:
+    """Whether the request opted in with X-Profile: 1"""
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_REQUEST_HEADER:
+            return value.strip().lower() in (b"1", b"true")
+    return False
+
+
+class ServerTimingMiddleware:
+    """Adds Server-Timing to responses and profiles opted-in requests"""
+
+    def __init__(self, app: ASGIApp):
+        """
+        Wrap an ASGI app
+
+        Args:
+            app: Downstream ASGI app
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Trace the request and report its stages when the response starts"""
+        if scope["type"] != "http" or not config.SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        token = _share_token(scope["path"])
+        profiler = None
+        profile_id = None
+        if _wants_profile(scope) and profiling_allowed(token):
+            profiler = SamplingProfiler(config.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+
+        trace = RequestTrace(profiler)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                if profile_id is not None:
+                    headers.append((b"x-profile-id", profile_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        if profiler is None:
+            with trace_request(trace):
+                await self.app(scope, receive, send_with_timing)
+            return
+
+        # The ID is handed out up front; the profile is stored when the request ends
+        profile_id = Profile.new_id()
+        profiler.start()
+        try:
+            with trace_request(trace), profiler.attach():
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            profiler.stop()
+            profile_store.add(Profile(profile_id, token, scope["method"], scope["path"], trace.elapsed(), profiler))
@@ -1,24 +1,59 @@
 """
 Main FastAPI application
 """
+import time
+
+# Startup reports module import time as its first phase
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import logging
+from fastapi.responses import JSONResponse
 
 import config
-from api.routes import datasets, queries
-from utils.logger import logger
+from api.metrics import MetricsMiddleware
+from api.rate_limit import RateLimitMiddleware
+from api.request_log import RequestLogMiddleware
+from api.routes import datasets, metrics, profiles, queries
+from api.timing import ServerTimingMiddleware
+from services.startup_service import startup_service
+from utils.logger import logger, start_logging, stop_logging
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start logging and the background warmup, then stop both on shutdown"""
+    startup_service.record("import", IMPORT_SECONDS)
+    with startup_service.phase("logging"):
+        start_logging()
+    startup_service.start(warmup=config.WARMUP_ENABLED)
+    logger.info("Startup complete", extra={"phases": dict(startup_service.phases)})
+    yield
+    await startup_service.stop()
+    stop_logging()
+
 
 # Create FastAPI app
 app = FastAPI(
     title=config.API_TITLE,
     version=config.API_VERSION,
     description="Data Explorer API - Looker-like explore interface",
-    debug=config.DEBUG
+    debug=config.DEBUG,
+    lifespan=lifespan
 )
-import os
-print("ENV CORS_ORIGINS =", os.getenv("CORS_ORIGINS"))
-print("CONFIG CORS_ORIGINS =", config.CORS_ORIGINS)
+
+# Per-token rate limiting (added first so CORS headers wrap its 429s)
+app.add_middleware(RateLimitMiddleware)
+
+# Server-Timing and opt-in profiling (outside rate limiting so 429s are timed too)
+app.add_middleware(ServerTimingMiddleware)
+
+# Request ID and log context for every record logged while handling a request
+app.add_middleware(RequestLogMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,11 +62,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cost admission, rate limit, cache validator and timing headers are read by the frontend
+    expose_headers=[
+        "ETag",
+        "Server-Timing",
+        "X-Profile-Id",
+        "X-Request-ID",
+        "X-Bytes-Estimated",
+        "X-Query-Downgraded",
+        "X-Next-Cursor",
+        "X-Total-Rows",
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        "Retry-After",
+    ],
 )
 
+# Request metrics (added last so it is outermost and sees every response)
+app.add_middleware(MetricsMiddleware)
+
 # Include routes
 app.include_router(datasets.router)
 app.include_router(queries.router)
+app.include_router(profiles.router)
+app.include_router(metrics.router)
 
 
 @app.get("/", tags=["health"])
@@ -53,9 +108,20 @@ async def health():
     }
 
 
+@app.get(
+    "/ready",
+    tags=["health"],
+    responses={503: {"description": "Still starting up (or warming up, with READY_AFTER_WARMUP)"}}
+)
+async def ready():
+    """Readiness probe with per-phase startup timings"""
+    report = startup_service.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
-    logger.info(f"Starting {config.API_TITLE} v{config.API_VERSION}")
+    logger.info("Starting server", extra={"title": config.API_TITLE, "version": config.API_VERSION})
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
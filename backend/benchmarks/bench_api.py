@@ -0,0 +1,458 @@
+"""
+Load benchmark: API latency, throughput and memory under concurrency
+
+Drives a seeded mix of dataset list, dataset fields and explore query
+calls against the app on the local engine, either in-process (ASGI
+transport, no network) or over a local uvicorn server, with a fixed
+number of concurrent clients. Reports p50/p95/p99 latency per call kind,
+throughput and peak RSS, and writes the results as JSON.
+
+Every run is compared against a baseline result file (by default the
+committed benchmarks/baseline.json) and the script exits with status 1 if
+p95/p99 latency or throughput regress by more than the thresholds, if the
+error rate is too high, or if the baseline has no result for a mode that
+was run.
+
+The committed baseline was recorded with the default options on the
+machine named in its header. The script sets its own environment
+(BENCH_ENV); run it with no other backend settings exported, e.g. no
+ROLLUPS_ENABLED or PARTIAL_CACHE_ENABLED overrides. On other hardware,
+record a local baseline first and compare against that.
+
+Run from the backend directory:
+    python benchmarks/bench_api.py --mode both
+    python benchmarks/bench_api.py --mode both --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_api.py --mode inprocess --baseline /tmp/local-baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Measure the serving path, not per-request log lines or token buckets.
+# All concurrent clients share one share token, so it may use the whole
+# wait queue instead of getting 503s past the per-token cap.
+BENCH_ENV = {
+    "LOG_LEVEL": "WARNING",
+    "RATE_LIMIT_ENABLED": "False",
+    "QUERY_MAX_QUEUE_PER_TOKEN": "32",
+    "DEFAULT_QUERY_BACKEND": "bigquery",
+    # The server warms its tables before reporting ready; hot query
+    # pre-caching would hide the cold queries being measured
+    "WARMUP_QUERIES": "[]",
+    "READY_AFTER_WARMUP": "True",
+    # A fresh shared result cache per run, so results of earlier runs never hit
+    "SHARED_CACHE_PATH": os.path.join(tempfile.mkdtemp(prefix="bench-"), "result_cache.sqlite"),
+}
+os.environ.update(BENCH_ENV)
+
+import httpx  # noqa: E402
+
+from constants.datasets import DATASETS_REGISTRY  # noqa: E402
+
+TOKEN = "demo_token_123"
+
+# Reference results, recorded with the default options
+DEFAULT_BASELINE = BACKEND_DIR / "benchmarks" / "baseline.json"
+
+# Share of each call kind in the request mix
+DEFAULT_MIX = {"datasets": 0.15, "fields": 0.15, "query": 0.7}
+
+# Regression thresholds (percent worse than baseline) and error budget
+DEFAULT_MAX_LATENCY_REGRESSION = 20.0
+DEFAULT_MAX_THROUGHPUT_REGRESSION = 15.0
+DEFAULT_MAX_ERROR_RATE = 0.01
+# Latency changes smaller than this are noise, whatever their percentage
+DEFAULT_MIN_LATENCY_DELTA_MS = 2.0
+
+
+def build_workload(num_requests: int, mix: dict[str, float], seed: int) -> list[tuple[str, str, str, Optional[dict]]]:
+    """
+    Deterministic request sequence
+
+    Query date windows and fields are drawn from the registry so the run
+    mixes result cache hits with fresh executions.
+
+    Args:
+        num_requests: Number of requests
+        mix: Call kind -> share of requests
+        seed: Random seed
+
+    Returns:
+        List of (kind, method, path, json body) tuples
+    """
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    dataset_ids = list(DATASETS_REGISTRY)
+    today = date.today()
+
+    workload = []
+    for kind in rng.choices(kinds, weights=weights, k=num_requests):
+        dataset_id = rng.choice(dataset_ids)
+        if kind == "datasets":
+            workload.append((kind, "GET", f"/share/{TOKEN}/datasets", None))
+        elif kind == "fields":
+            workload.append((kind, "GET", f"/share/{TOKEN}/dataset/{dataset_id}/fields", None))
+        else:
+            dataset = DATASETS_REGISTRY[dataset_id]
+            date_to = today - timedelta(days=rng.randint(1, 60))
+            date_from = date_to - timedelta(days=rng.choice([6, 29, 89, 364]))
+            workload.append((kind, "POST", f"/share/{TOKEN}/query", {
+                "dataset_id": dataset_id,
+                "dimension": rng.choice(list(dataset["dimensions"])),
+                "measure": rng.choice(list(dataset["measures"])),
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+            }))
+    return workload
+
+
+def build_warmup() -> list[tuple[str, str, str, Optional[dict]]]:
+    """
+    One query per dataset and dimension, outside the measured date windows
+
+    Loads every local table and rollup before measuring without warming
+    the result or partial caches for the measured requests.
+    """
+    day = (date.today() - timedelta(days=400)).isoformat()
+    return [
+        ("warmup", "POST", f"/share/{TOKEN}/query", {
+            "dataset_id": dataset_id,
+            "dimension": dimension,
+            "measure": next(iter(dataset["measures"])),
+            "date_from": day,
+            "date_to": day,
+        })
+        for dataset_id, dataset in DATASETS_REGISTRY.items()
+        for dimension in dataset["dimensions"]
+    ]
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """Latency percentiles (ms), throughput and error rate of one group"""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+async def drive(client: httpx.AsyncClient, workload: list, concurrency: int) -> dict:
+    """
+    Send the workload with a fixed number of concurrent clients
+
+    Args:
+        client: Client bound to the app or the server
+        workload: Requests from build_workload
+        concurrency: Number of requests in flight
+
+    Returns:
+        Summary overall and per call kind
+    """
+    results: list[tuple[str, float, bool]] = []
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < len(workload):
+            kind, method, path, body = workload[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            results.append((kind, time.perf_counter() - started, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    summary = {"overall": summarize([r[1] for r in results], sum(not r[2] for r in results), elapsed)}
+    for kind in sorted({r[0] for r in results}):
+        group = [r for r in results if r[0] == kind]
+        summary[kind] = summarize([r[1] for r in group], sum(not r[2] for r in group), elapsed)
+    summary["elapsed_s"] = round(elapsed, 2)
+    return summary
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """
+    Peak resident set size of this process or of a child process
+
+    Args:
+        pid: Process to inspect (None for this process)
+
+    Returns:
+        Peak RSS in MiB, or None where it cannot be read
+    """
+    if pid is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+async def run_inprocess(workload: list, concurrency: int) -> dict:
+    """Benchmark the app through the ASGI transport (no network, no server)"""
+    from app import app
+    from services.partial_aggregate_service import partial_aggregate_service
+    from services.query_service import result_cache
+
+    # Every round starts cold, like a freshly started server
+    result_cache.clear()
+    partial_aggregate_service.cache.clear()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await drive(client, build_warmup(), concurrency)
+        summary = await drive(client, workload, concurrency)
+    summary["peak_rss_mb"] = peak_rss_mb()
+    return summary
+
+
+def _free_port() -> int:
+    """An unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(workload: list, concurrency: int, workers: int) -> dict:
+    """Benchmark a local uvicorn server over HTTP"""
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **BENCH_ENV},
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not become ready")
+                await asyncio.sleep(0.2)
+
+            await drive(client, build_warmup(), concurrency)
+            summary = await drive(client, workload, concurrency)
+        # With several workers the children hold the data; report the largest
+        pids = [server.pid] + _children(server.pid)
+        peaks = [p for p in (peak_rss_mb(pid) for pid in pids) if p is not None]
+        summary["peak_rss_mb"] = max(peaks) if peaks else None
+        return summary
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def _children(pid: int) -> list[int]:
+    """Direct child process IDs (Linux)"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    max_latency: float,
+    min_latency_delta: float,
+    max_throughput: float,
+    max_error_rate: float
+) -> list[str]:
+    """
+    Check a run against a baseline
+
+    Args:
+        results: Current run (mode -> summary)
+        baseline: Stored run in the same format
+        max_latency: Allowed p95/p99 increase in percent
+        min_latency_delta: Latency increases below this many ms always pass
+        max_throughput: Allowed throughput drop in percent
+        max_error_rate: Allowed error rate per mode
+
+    Returns:
+        Human-readable failures (empty if the run passes)
+    """
+    failures = []
+    for mode, summary in results["modes"].items():
+        overall = summary["overall"]
+        if overall["error_rate"] > max_error_rate:
+            failures.append(f"{mode}: error rate {overall['error_rate']:.2%} > {max_error_rate:.2%}")
+
+        base_mode = baseline.get("modes", {}).get(mode)
+        if base_mode is None:
+            failures.append(f"{mode}: no baseline result for this mode")
+            continue
+        for kind, current in summary.items():
+            base = base_mode.get(kind)
+            if not isinstance(current, dict) or not isinstance(base, dict):
+                continue
+            for metric in ("p95_ms", "p99_ms"):
+                limit = max(base[metric] * (1 + max_latency / 100), base[metric] + min_latency_delta)
+                if base[metric] and current[metric] > limit:
+                    failures.append(
+                        f"{mode}/{kind}: {metric} {current[metric]} > baseline {base[metric]} +{max_latency:g}%"
+                    )
+        base_rps = base_mode["overall"]["throughput_rps"]
+        if base_rps and overall["throughput_rps"] < base_rps * (1 - max_throughput / 100):
+            failures.append(
+                f"{mode}: throughput {overall['throughput_rps']} rps < baseline {base_rps} -{max_throughput:g}%"
+            )
+    return failures
+
+
+def print_summary(results: dict) -> None:
+    """Print one table per mode"""
+    for mode, summary in results["modes"].items():
+        print(f"\n[{mode}] {summary['elapsed_s']}s, peak RSS {summary['peak_rss_mb']} MiB")
+        print(f"{'kind':>10} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for kind, s in summary.items():
+            if isinstance(s, dict):
+                print(
+                    f"{kind:>10} {s['requests']:>6} {s['errors']:>5} {s['throughput_rps']:>8} "
+                    f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8}"
+                )
+
+
+def parse_args() -> argparse.Namespace:
+    """Command line options"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--rounds", type=int, default=3, help="runs per mode; the median run is reported")
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="compare against this result file")
+    parser.add_argument("--no-baseline", action="store_true", help="skip the baseline comparison")
+    parser.add_argument("--save-baseline", help="also write the results to this path")
+    parser.add_argument("--max-latency-regression", type=float, default=DEFAULT_MAX_LATENCY_REGRESSION)
+    parser.add_argument("--min-latency-delta-ms", type=float, default=DEFAULT_MIN_LATENCY_DELTA_MS)
+    parser.add_argument("--max-throughput-regression", type=float, default=DEFAULT_MAX_THROUGHPUT_REGRESSION)
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    return parser.parse_args()
+
+
+def main() -> int:
+    """Run the benchmark, save results and check the baseline"""
+    args = parse_args()
+    # Read before running, since --save-baseline may overwrite the same file
+    baseline = None if args.no_baseline else json.loads(Path(args.baseline).read_text())
+    workload = build_workload(args.requests, DEFAULT_MIX, args.seed)
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "seed": args.seed,
+            "rounds": args.rounds,
+            "mix": DEFAULT_MIX,
+        },
+        "modes": {},
+    }
+    for mode in modes:
+        rounds = []
+        for _ in range(args.rounds):
+            if mode == "inprocess":
+                rounds.append(asyncio.run(run_inprocess(workload, args.concurrency)))
+            else:
+                rounds.append(asyncio.run(run_uvicorn(workload, args.concurrency, args.workers)))
+        # Keep the round with the median overall p95 to damp machine noise
+        rounds.sort(key=lambda summary: summary["overall"]["p95_ms"])
+        results["modes"][mode] = rounds[len(rounds) // 2]
+
+    print_summary(results)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nSaved results to {path}")
+
+    if baseline is not None:
+        if baseline.get("config") != results["config"]:
+            print("Warning: baseline was recorded with a different configuration")
+        if any(baseline.get(field) != results[field] for field in ("python", "machine", "cpus")):
+            print(
+                f"Warning: baseline was recorded on other hardware "
+                f"({baseline.get('machine')}, {baseline.get('cpus')} CPUs, Python {baseline.get('python')})"
+            )
+        failures = compare(
+            results,
+            baseline,
+            args.max_latency_regression,
+            args.min_latency_delta_ms,
+            args.max_throughput_regression,
+            args.max_error_rate
+        )
+        if failures:
+            print("\nREGRESSION against baseline:")
+            for failure in failures:
+                print(f"  - {failure}")
+            return 1
+        print("\nNo regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
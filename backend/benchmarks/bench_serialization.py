@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: query response serialization CPU per request
+
+Compares the previous path (QueryResponse + FastAPI response_model
+validation + JSONResponse) with the fast path (trusted rows rendered by
+utils.json_response) for 500 and 5000 row results.
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py
+"""
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from schemas.query_schema import QueryResponse
+from utils.columnar import to_rows
+from utils.json_response import FastJSONResponse, dumps, orjson
+
+ROW_COUNTS = [500, 5000]
+ITERATIONS = 200
+
+RESPONSE_FIELD = create_response_field(name="Response_execute_query", type_=QueryResponse)
+
+
+def make_result(num_rows: int) -> dict:
+    """Columnar result shaped like a dt x revenue explore"""
+    start = date(2015, 1, 1)
+    return {
+        "columns": ["dt", "revenue"],
+        "data": [
+            [(start + timedelta(days=i)).isoformat() for i in range(num_rows)],
+            [round(1000 + i * 1.37, 2) for i in range(num_rows)],
+        ],
+    }
+
+
+async def before(result: dict) -> bytes:
+    """Previous path: model construction, response_model validation, json"""
+    response = QueryResponse(rows=to_rows(result))
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=response)
+    return JSONResponse(content=content).body
+
+
+async def after(result: dict) -> bytes:
+    """Fast path: trusted rows rendered straight to bytes"""
+    return FastJSONResponse(content=dumps({"rows": to_rows(result)})).body
+
+
+def measure(fn, result: dict) -> float:
+    """CPU microseconds per call, averaged over ITERATIONS"""
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(fn(result))  # warm up
+        started = time.process_time()
+        for _ in range(ITERATIONS):
+            loop.run_until_complete(fn(result))
+        return (time.process_time() - started) / ITERATIONS * 1e6
+    finally:
+        loop.close()
+
+
+def main():
+    """Run benchmark and print a comparison table"""
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    print(f"{'rows':>6} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+
+    for num_rows in ROW_COUNTS:
+        result = make_result(num_rows)
+        assert asyncio.run(before(result)) == asyncio.run(after(result))
+
+        cpu_before = measure(before, result)
+        cpu_after = measure(after, result)
+        print(f"{num_rows:>6} {cpu_before:>12.0f} {cpu_after:>12.0f} {cpu_before / cpu_after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """
 Configuration settings for the backend application
 """
+import json
 import os
 from typing import Optional
 # FastAPI Config
@@ -12,7 +13,36 @@ API_VERSION: str = "1.0.0"
 GCP_PROJECT_ID: str = os.getenv("GCP_PROJECT_ID", "your-project-id")
 BIGQUERY_DATASET: str = os.getenv("BIGQUERY_DATASET", "your-dataset")
 
+# Local Engine Config (synthetic columnar data used until BigQuery is wired up)
+LOCAL_ENGINE_ROWS_PER_DAY: int = int(os.getenv("LOCAL_ENGINE_ROWS_PER_DAY", "200"))
+LOCAL_ENGINE_DAYS: int = int(os.getenv("LOCAL_ENGINE_DAYS", "1095"))
+LOCAL_ENGINE_SEED: int = int(os.getenv("LOCAL_ENGINE_SEED", "42"))
+
+# Query Backend Config (a dataset's "backend" registry key overrides the default)
+DEFAULT_QUERY_BACKEND: str = os.getenv("DEFAULT_QUERY_BACKEND", "bigquery")
+
+# Embedded SQLite Backend Config
+SQLITE_DATABASE_PATH: str = os.getenv("SQLITE_DATABASE_PATH", "data/explorer.sqlite")
+SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_STATEMENT_CACHE_SIZE: int = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+
+# Rollup Config (route queries to pre-aggregated day x dimension tables)
+ROLLUPS_ENABLED: bool = os.getenv("ROLLUPS_ENABLED", "True").lower() == "true"
+
+# Partial Aggregate Cache Config (per-day partials for SUM/COUNT measures
+# that no rollup covers; off by default, since merging partials costs more
+# than scanning the local engine and only pays off on a billed warehouse)
+PARTIAL_CACHE_ENABLED: bool = os.getenv("PARTIAL_CACHE_ENABLED", "False").lower() == "true"
+PARTIAL_CACHE_MAX_BYTES: int = int(os.getenv("PARTIAL_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+PARTIAL_CACHE_TTL: int = int(os.getenv("PARTIAL_CACHE_TTL", "86400"))
+
 # Auth Config
+# Optional per-token keys:
+#   max_bytes_billed: Dry-run byte budget per query (QUERY_MAX_BYTES_BILLED otherwise)
+#   over_budget: "reject" or "downgrade" (QUERY_OVER_BUDGET_ACTION otherwise)
+#   requests_per_minute: Token bucket refill rate (RATE_LIMIT_REQUESTS_PER_MINUTE otherwise)
+#   burst: Token bucket capacity (RATE_LIMIT_BURST otherwise)
+#   profiling: True to allow X-Profile: 1 request profiling
 SHARE_TOKENS: dict[str, dict] = {
     "demo_token_123": {"active": True, "label": "Demo Share Link"},
     "demo123": {"active": True, "label": "Demo Share Link (Short)"},
@@ -22,6 +52,77 @@ SHARE_TOKENS: dict[str, dict] = {
 # API Config
 MAX_QUERY_LIMIT: int = 5000
 DEFAULT_QUERY_LIMIT: int = 500
+MAX_BATCH_QUERIES: int = 50
+
+# Query Result Cache Config
+QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "True").lower() == "true"
+QUERY_CACHE_MAX_BYTES: int = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_DEFAULT_TTL: int = int(os.getenv("QUERY_CACHE_DEFAULT_TTL", "300"))
+
+# Shared Result Cache Config (SQLite file shared by the worker processes of
+# one host, checked after the in-process cache and before the backend)
+SHARED_CACHE_ENABLED: bool = os.getenv("SHARED_CACHE_ENABLED", "True").lower() == "true"
+SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "data/result_cache.sqlite")
+SHARED_CACHE_MAX_BYTES: int = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+SHARED_CACHE_BUSY_TIMEOUT_MS: int = int(os.getenv("SHARED_CACHE_BUSY_TIMEOUT_MS", "100"))
+
+# Query Executor Config (QUERY_MAX_QUEUE_PER_TOKEN caps the calls one share
+# token may have waiting; concurrent client requests beyond it get a 503,
+# while a single request's own fan-out, e.g. a batch, queues behind it)
+QUERY_MAX_WORKERS: int = int(os.getenv("QUERY_MAX_WORKERS", "8"))
+QUERY_MAX_QUEUE: int = int(os.getenv("QUERY_MAX_QUEUE", "32"))
+QUERY_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("QUERY_QUEUE_TIMEOUT_SECONDS", "10"))
+QUERY_MAX_QUEUE_PER_TOKEN: int = int(os.getenv("QUERY_MAX_QUEUE_PER_TOKEN", "8"))
+
+# Rate Limit Config (per share token token bucket)
+RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+RATE_LIMIT_REQUESTS_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE", "120"))
+RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "30"))
+
+# Query Cost Admission Config (0 disables the default per-query byte budget)
+QUERY_MAX_BYTES_BILLED: int = int(os.getenv("QUERY_MAX_BYTES_BILLED", str(10 * 1024 ** 3)))
+QUERY_OVER_BUDGET_ACTION: str = os.getenv("QUERY_OVER_BUDGET_ACTION", "reject")
+
+# Query Result HTTP Caching Config (max-age by range freshness; ETags carry
+# the dataset's data version, whose watermark is rechecked every N seconds)
+QUERY_RESULT_HISTORICAL_MAX_AGE: int = int(os.getenv("QUERY_RESULT_HISTORICAL_MAX_AGE", "86400"))
+QUERY_RESULT_RECENT_MAX_AGE: int = int(os.getenv("QUERY_RESULT_RECENT_MAX_AGE", "60"))
+DATA_VERSION_CHECK_SECONDS: float = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "30"))
+
+# Metrics Config (Prometheus text format at /metrics)
+METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+# Request Timing Config (Server-Timing header, opt-in sampled profiles for
+# tokens with "profiling": True)
+SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "True").lower() == "true"
+PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "True").lower() == "true"
+PROFILING_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))
+PROFILING_MAX_PROFILES: int = int(os.getenv("PROFILING_MAX_PROFILES", "50"))
+
+# Metadata Response Cache Config (Cache-Control max-age of /datasets and /fields)
+METADATA_CACHE_MAX_AGE: int = int(os.getenv("METADATA_CACHE_MAX_AGE", "300"))
+
+# Startup Warmup Config (load backend tables and rollups in the background
+# after startup; WARMUP_QUERIES is a JSON list of explore query payloads
+# whose results are pre-cached, with "days": N standing in for a date range
+# ending today). /ready reports ready right after startup unless
+# READY_AFTER_WARMUP is set.
+WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+WARMUP_QUERIES: list[dict] = json.loads(os.getenv("WARMUP_QUERIES", "[]"))
+READY_AFTER_WARMUP: bool = os.getenv("READY_AFTER_WARMUP", "False").lower() == "true"
+
+# Cursor Pagination Config (full results of paginated queries retained for
+# their later pages; queries without a limit retain at most MAX_ROWS rows)
+QUERY_CURSOR_MAX_BYTES: int = int(os.getenv("QUERY_CURSOR_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CURSOR_TTL: int = int(os.getenv("QUERY_CURSOR_TTL", "600"))
+QUERY_CURSOR_MAX_ROWS: int = int(os.getenv("QUERY_CURSOR_MAX_ROWS", "100000"))
+
+# Top-N Config (dimension value of the remainder row that include_other
+# appends after the top groups)
+QUERY_OTHER_LABEL: str = os.getenv("QUERY_OTHER_LABEL", "Other")
+
+# Streaming Config (rows per NDJSON chunk)
+QUERY_STREAM_CHUNK_ROWS: int = int(os.getenv("QUERY_STREAM_CHUNK_ROWS", "500"))
 
 # # CORS Config
 # CORS_ORIGINS: list[str] = [
@@ -44,3 +145,16 @@ CORS_ORIGINS = [o.strip() for o in CORS_ORIGINS if o.strip()]
 
 # Logging Config
 LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Share of INFO records kept (per request) for the high-volume loggers below
+LOG_INFO_SAMPLE_RATE: float = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+LOG_SAMPLED_LOGGERS: list[str] = [
+    name.strip() for name in os.getenv(
+        "LOG_SAMPLED_LOGGERS",
+        "services.query_service,services.bigquery_service,services.sqlite_service,"
+        "services.partial_aggregate_service,services.rollup_service,api.request_log"
+    ).split(",") if name.strip()
+]
@@ -1,6 +1,14 @@
 """
 Dataset registry and configuration
 All datasets are defined here as a whitelist for security
+
+Optional keys:
+    backend: Execution backend for the dataset ("bigquery" or "sqlite",
+        falls back to DEFAULT_QUERY_BACKEND)
+    cache_ttl: Seconds a query result for this dataset may be served
+        from the result cache (falls back to QUERY_CACHE_DEFAULT_TTL)
+    rollups: List of non-date dimension sets to pre-aggregate by day
+        (defaults to every dimension alone and with platform)
 """
 
 DATASETS_REGISTRY = {
@@ -16,6 +24,7 @@ DATASETS_REGISTRY = {
             "revenue": "SUM(revenue)",
             "orders": "COUNT(1)",
         },
+        "cache_ttl": 300,
     },
     "livestream": {
         "label": "Livestream (Fact)",
@@ -29,5 +38,6 @@ DATASETS_REGISTRY = {
             "revenue": "SUM(revenue)",
             "sessions": "COUNT(1)",
         },
+        "cache_ttl": 60,
     },
 }
@@ -3,19 +3,80 @@ Pydantic models for queries
 """
 from datetime import date
 from typing import Optional, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 class ExploreQuery(BaseModel):
     """Explore query request payload"""
     dataset_id: str = Field(..., description="Dataset ID")
-    dimension: str = Field(..., description="Dimension to group by")
-    measure: str = Field(..., description="Measure to aggregate")
+    dimension: Optional[str] = Field(None, description="Dimension to group by")
+    dimensions: Optional[list[str]] = Field(
+        None,
+        min_length=1,
+        description="Dimensions to group by as a composite key (instead of dimension)"
+    )
+    measure: Optional[str] = Field(None, description="Measure to aggregate")
+    measures: Optional[list[str]] = Field(
+        None,
+        min_length=1,
+        description="Measures to aggregate (instead of measure)"
+    )
     date_from: date = Field(..., description="Start date (YYYY-MM-DD)")
     date_to: date = Field(..., description="End date (YYYY-MM-DD)")
     platform: Optional[str] = Field(None, description="Optional platform filter")
     limit: int = Field(default=500, ge=1, le=5000, description="Max rows (1-5000)")
     order: Literal["asc", "desc"] = Field(default="asc", description="Sort order")
+    order_by: Optional[str] = Field(
+        None,
+        description=(
+            "Measure to sort groups by (ties broken by the dimension values); "
+            "with limit this returns the top or bottom N groups. Defaults to "
+            "sorting by the dimension values"
+        )
+    )
+    include_other: bool = Field(
+        default=False,
+        description=(
+            "Append a remainder row totalling the groups cut off by limit, with "
+            "every dimension set to QUERY_OTHER_LABEL (SUM and COUNT measures only)"
+        )
+    )
+    page_size: Optional[int] = Field(
+        None,
+        ge=1,
+        le=5000,
+        description=(
+            "Rows per page (1-5000); enables cursor pagination. The rows of all "
+            "pages are capped by limit if given, by QUERY_CURSOR_MAX_ROWS otherwise"
+        )
+    )
+    cursor: Optional[str] = Field(
+        None,
+        description="next_cursor of the previous page (send the same query with it)"
+    )
+
+    @model_validator(mode="after")
+    def normalize_fields(self) -> "ExploreQuery":
+        """Accept either the single or the list form and fill in both"""
+        for single, plural in (("dimension", "dimensions"), ("measure", "measures")):
+            value, values = getattr(self, single), getattr(self, plural)
+            if value is not None and values is not None:
+                raise ValueError(f"Use either '{single}' or '{plural}', not both")
+            if values is None:
+                if value is None:
+                    raise ValueError(f"'{single}' or '{plural}' is required")
+                values = [value]
+            if len(set(values)) != len(values):
+                raise ValueError(f"'{plural}' must not contain duplicates")
+            setattr(self, plural, values)
+            setattr(self, single, values[0])
+        if set(self.dimensions) & set(self.measures):
+            raise ValueError("A field cannot be both a dimension and a measure")
+        if self.order_by is not None and self.order_by not in self.measures:
+            raise ValueError("'order_by' must be one of the query's measures")
+        if self.cursor is not None and self.page_size is None:
+            raise ValueError("'cursor' requires 'page_size'")
+        return self
 
     class Config:
         json_schema_extra = {
@@ -40,6 +101,11 @@ class QueryRow(BaseModel):
 class QueryResponse(BaseModel):
     """Explore query response"""
     rows: list[dict]
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor of the next page (paginated queries; null on the last page)"
+    )
+    total_rows: Optional[int] = Field(None, description="Rows across all pages (paginated queries)")
 
     class Config:
         json_schema_extra = {
@@ -50,3 +116,56 @@ class QueryResponse(BaseModel):
                 ]
             }
         }
+
+
+class ColumnarQueryResponse(BaseModel):
+    """Explore query response in compact columnar form"""
+    columns: list[str]
+    data: list[list]
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor of the next page (paginated queries; null on the last page)"
+    )
+    total_rows: Optional[int] = Field(None, description="Rows across all pages (paginated queries)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "columns": ["dt", "revenue"],
+                "data": [
+                    ["2025-01-01", "2025-01-02"],
+                    [1000, 1500],
+                ]
+            }
+        }
+
+
+class QueryError(BaseModel):
+    """Error for a single query inside a batch"""
+    status_code: int
+    detail: str
+
+
+class BatchQueryResult(BaseModel):
+    """Result of a single query inside a batch (rows or error)"""
+    rows: Optional[list[dict]] = None
+    error: Optional[QueryError] = None
+    date_from: Optional[date] = Field(
+        None,
+        description="Start date actually served, set when the query was downgraded to fit the byte budget"
+    )
+
+
+class BatchQueryResponse(BaseModel):
+    """Batch query response, one result per query in request order"""
+    results: list[BatchQueryResult]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "results": [
+                    {"rows": [{"dt": "2025-01-01", "revenue": 1000}]},
+                    {"error": {"status_code": 400, "detail": "Invalid measure 'x'"}},
+                ]
+            }
+        }
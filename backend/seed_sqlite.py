@@ -0,0 +1,72 @@
+"""
+Create the embedded SQLite database from the local engine's synthetic data
+
+Writes one fact table per registry dataset (named after the last part of
+its qualified table name) plus an index on the date expression, so the
+SQLite backend can serve the same explore API in CI or on-prem demos.
+
+Usage:
+    python seed_sqlite.py [path]    # defaults to SQLITE_DATABASE_PATH
+"""
+from datetime import date
+import os
+import re
+import sqlite3
+import sys
+
+import config
+from constants.datasets import DATASETS_REGISTRY
+from services.local_engine import local_engine
+from services.query_plan import COMPILED_DATASETS
+
+
+def seed(path: str) -> None:
+    """
+    Write every registry fact table to a fresh SQLite file
+
+    The file is built next to the target and renamed over it, so a running
+    server never opens a half-written database; it notices the new file
+    and reopens its connections.
+
+    Args:
+        path: SQLite database file to (re)create
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = f"{path}.seeding"
+    if os.path.exists(staging):
+        os.remove(staging)
+
+    connection = sqlite3.connect(staging)
+    for dataset_id, dataset in DATASETS_REGISTRY.items():
+        compiled = COMPILED_DATASETS[dataset_id]
+        table = local_engine.get_table(dataset["table"])
+        name = dataset["table"].rsplit(".", 1)[-1]
+
+        # dt is an expression such as DATE(order_ts) over a timestamp column
+        date_column = re.search(r"\((\w+)\)", compiled.date_sql).group(1)
+        dimensions = list(table.dimensions)
+        measures = list(table.measures)
+        columns = [date_column, *dimensions, *measures]
+
+        connection.execute(f"CREATE TABLE {name} ({', '.join(columns)})")
+        values = [
+            [date.fromordinal(int(day)).isoformat() for day in table.days],
+            *(table.dimensions[d][1][table.dimensions[d][0]].tolist() for d in dimensions),
+            *(table.measures[m].tolist() for m in measures),
+        ]
+        connection.executemany(
+            f"INSERT INTO {name} VALUES ({', '.join('?' for _ in columns)})",
+            zip(*values)
+        )
+        connection.execute(f"CREATE INDEX {name}_dt ON {name} ({compiled.date_sql})")
+        print(f"{name}: {table.num_rows} rows")
+
+    connection.commit()
+    connection.execute("ANALYZE")
+    connection.close()
+    os.replace(staging, path)
+
+
+if __name__ == "__main__":
+    seed(sys.argv[1] if len(sys.argv) > 1 else config.SQLITE_DATABASE_PATH)
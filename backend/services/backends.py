@@ -0,0 +1,29 @@
+"""
+Execution backend registry
+"""
+from services.bigquery_service import bigquery_service
+from services.query_backend import QueryBackend
+from services.sqlite_service import sqlite_service
+
+BACKENDS: dict[str, QueryBackend] = {
+    backend.name: backend for backend in (bigquery_service, sqlite_service)
+}
+
+
+def get_backend(name: str) -> QueryBackend:
+    """
+    Look up an execution backend by registry name
+
+    Args:
+        name: Backend name (a CompiledDataset's backend)
+
+    Returns:
+        The backend singleton
+
+    Raises:
+        ValueError: If no backend has this name
+    """
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown query backend '{name}'. Valid options: {list(BACKENDS)}")
+    return backend
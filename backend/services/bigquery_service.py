@@ -1,157 +1,207 @@
 """
 BigQuery service for database operations
 """
-from datetime import date, timedelta
-from typing import Optional
+from typing import Iterator, Optional
 import logging
-import re
-from random import randint, choice
+import threading
+
+from services.local_engine import local_engine
+from services.query_backend import QueryBackend
+from services.query_plan import QueryPlan
+from utils.cost_tracker import cost_tracker
 
 logger = logging.getLogger(__name__)
 
 
-class BigQueryService:
+class BigQueryService(QueryBackend):
     """Service for BigQuery operations"""
     
+    name = "bigquery"
+    
+    # Rollups are materialized next to the fact tables in the local engine
+    supports_rollups = True
+    
     def __init__(self):
-        """Initialize BigQuery client"""
-        # TODO: Initialize real BigQuery client
-        # from google.cloud import bigquery
-        # self.client = bigquery.Client()
-        pass
+        """Initialize service (the client is created on first use)"""
+        self._client = None
+        self._lock = threading.Lock()
     
-    @staticmethod
-    def _generate_mock_data(
-        date_from: date,
-        date_to: date,
-        platform: Optional[str] = None
-    ) -> list[dict]:
+    @property
+    def client(self):
+        """BigQuery client, imported and created on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # TODO: Initialize real BigQuery client
+                    # from google.cloud import bigquery
+                    # self._client = bigquery.Client()
+                    # Until then a local fake answers dry runs and bytes processed.
+                    # Imported here so the client library stays off the startup path
+                    from services.bigquery_client import FakeBigQueryClient
+                    self._client = FakeBigQueryClient()
+        return self._client
+    
+    def warmup(self, tables: list[str]) -> None:
         """
-        Generate realistic mock data for testing
+        Create the client and load the tables the first queries will scan
         
         Args:
-            date_from: Start date
-            date_to: End date
-            platform: Optional platform filter
+            tables: Fully qualified table names
+        """
+        # First access imports the client library and creates the client
+        _ = self.client
+        for table in tables:
+            local_engine.get_table(table)
+    
+    def estimate_bytes(self, plan: QueryPlan) -> int:
+        """
+        Estimate the bytes a plan would process (dry run)
+        
+        Args:
+            plan: Compiled query plan
         
         Returns:
-            List of mock data rows
+            Estimated bytes processed
         """
-        platforms = ["tiktok", "instagram", "facebook", "youtube"]
-        if platform:
-            platforms = [platform]
-        
-        data = []
-        current_date = date_from
+        # With the real client: QueryJobConfig(dry_run=True, use_query_cache=False)
+        # and job.total_bytes_processed
+        return self.client.dry_run(plan)
+    
+    def data_version(self, table: str) -> Optional[str]:
+        """
+        Watermark of a table's contents
         
-        while current_date <= date_to:
-            for plat in platforms:
-                # Generate realistic revenue (1000-10000)
-                revenue = randint(1000, 10000) * (1 + randint(-50, 50) / 100)
-                revenue = round(revenue, 2)
-                
-                data.append({
-                    "dt": current_date.isoformat(),
-                    "platform": plat,
-                    "revenue": revenue,
-                    "orders": randint(10, 100),
-                    "sessions": randint(50, 500),
-                    "hosts": choice(["host_a", "host_b", "host_c"]),
-                    "product_name": choice(["Product A", "Product B", "Product C", "Product D"]),
-                })
-            
-            current_date += timedelta(days=1)
+        Args:
+            table: Fully qualified table name
         
-        return data
+        Returns:
+            Last-modified time of the table as a version string
+        """
+        # With the real client: client.get_table(table).modified
+        return repr(self.client.last_modified(table))
     
-    def execute_query(
-        self,
-        sql: str,
-        date_from: date,
-        date_to: date,
-        platform: Optional[str] = None,
-    ) -> list[dict]:
+    def _record_cost(self, *plans: QueryPlan) -> None:
+        """Record the bytes processed by plans executed as one scan"""
+        cost_tracker.record_actual(plans[0].source.dataset_id, self.client.bytes_processed(*plans))
+    
+    def execute_columns(self, plan: QueryPlan) -> dict:
         """
-        Execute BigQuery query with parameters
+        Execute BigQuery query and return the result column-wise
         
         Args:
-            sql: SQL query with @parameters
-            date_from: Start date parameter
-            date_to: End date parameter
-            platform: Optional platform filter
+            plan: Compiled query plan
         
         Returns:
-            List of result rows as dictionaries
+            Dict with "columns" (names) and "data" (one value list per column)
         
         Raises:
             Exception: If BigQuery query fails
         """
         try:
-            logger.info(f"Executing query for period {date_from} to {date_to}, platform={platform}")
+            logger.info("Executing backend query", extra={
+                "table": plan.table, "date_from": plan.date_from, "date_to": plan.date_to, "filters": plan.filters
+            })
             
-            # Generate mock data
-            all_data = self._generate_mock_data(date_from, date_to, platform)
+            result = local_engine.aggregate_columns(
+                table_name=plan.table,
+                dimensions=plan.dimension_names,
+                measures=plan.measure_specs,
+                date_from=plan.date_from,
+                date_to=plan.date_to,
+                filters=plan.filters or None,
+                order=plan.order,
+                limit=plan.limit,
+                order_by=plan.order_by,
+                other=plan.other
+            )
             
-            # Parse SQL to determine what fields to return
-            # In real scenario, this would query BigQuery
-            # For mock, we'll parse the SQL and extract dimension/measure
-            lines = sql.split('\n')
-            select_line = [l for l in lines if 'SELECT' in l.upper()]
+            self._record_cost(plan)
+            logger.info("Backend query returned", extra={"rows": len(result["data"][0])})
+            return result
             
-            # Parse SQL to extract SELECT fields
-            sql_clean = ' '.join(sql.split())  # Remove all whitespace/newlines
-            select_match = re.search(r'SELECT\s+(.*?)\s+FROM', sql_clean, re.IGNORECASE)
+        except Exception as e:
+            logger.error("BigQuery error", extra={"error": str(e)})
+            raise
+    
+    def execute_many(self, plans: list[QueryPlan]) -> list[dict]:
+        """
+        Execute several queries over the same table and parameters as one scan
+        
+        Args:
+            plans: Query plans that all share one scan_key
+        
+        Returns:
+            One columnar result per query, in the same order
+        
+        Raises:
+            ValueError: If the plans do not share a scan
+            Exception: If BigQuery query fails
+        """
+        try:
+            if len({plan.scan_key for plan in plans}) != 1:
+                raise ValueError("Shared scan queries must read the same rows")
             
-            if select_match:
-                select_part = select_match.group(1)
-                # Extract field names after AS keyword
-                fields = []
-                for field in select_part.split(','):
-                    if ' AS ' in field:
-                        field_name = field.split(' AS ')[-1].strip()
-                        fields.append(field_name)
-                    elif field.strip():
-                        fields.append(field.strip())
-            else:
-                fields = ["dimension", "measure"]
+            scan = plans[0]
+            logger.info("Executing shared scan", extra={
+                "table": scan.table, "date_from": scan.date_from, "date_to": scan.date_to,
+                "filters": scan.filters, "queries": len(plans)
+            })
             
-            # Filter and group mock data based on SQL
-            result = {}
-            for row in all_data:
-                # Build a key for grouping
-                if fields:
-                    group_key = str(row.get(fields[0], ""))
-                else:
-                    group_key = str(row.get("dt", ""))
-                
-                if group_key not in result:
-                    result[group_key] = {fields[0] if fields else "dt": row.get(fields[0] if fields else "dt")}
-                
-                # Aggregate measures
-                if len(fields) > 1:
-                    measure_field = fields[1]
-                    if measure_field not in result[group_key]:
-                        result[group_key][measure_field] = 0
-                    
-                    # Handle SUM (revenue, orders)
-                    if measure_field in ["revenue", "orders", "sessions"]:
-                        result[group_key][measure_field] += row.get(measure_field, 0)
-                    else:
-                        result[group_key][measure_field] = row.get(measure_field, 0)
+            # With the real client this maps to one GROUPING SETS query
+            results = local_engine.aggregate_columns_many(
+                table_name=scan.table,
+                specs=[
+                    (plan.dimension_names, plan.measure_specs, plan.order, plan.limit, plan.order_by, plan.other)
+                    for plan in plans
+                ],
+                date_from=scan.date_from,
+                date_to=scan.date_to,
+                filters=scan.filters or None
+            )
+            self._record_cost(*plans)
+            return results
             
-            # Convert to list and round values
-            mock_result = []
-            for key, value in sorted(result.items()):
-                # Round revenue to 2 decimals
-                if "revenue" in value:
-                    value["revenue"] = round(value["revenue"], 2)
-                mock_result.append(value)
+        except Exception as e:
+            logger.error("BigQuery error", extra={"error": str(e)})
+            raise
+    
+    def iter_query(self, plan: QueryPlan, chunk_size: int = 500) -> Iterator[list[dict]]:
+        """
+        Execute BigQuery query and yield result rows page by page
+        
+        Args:
+            plan: Compiled query plan
+            chunk_size: Rows per yielded page
+        
+        Yields:
+            Lists of result rows as dictionaries
+        
+        Raises:
+            Exception: If BigQuery query fails
+        """
+        try:
+            logger.info("Streaming backend query", extra={
+                "table": plan.table, "date_from": plan.date_from, "date_to": plan.date_to, "filters": plan.filters
+            })
             
-            logger.info(f"Returned {len(mock_result)} rows")
-            return mock_result
+            # With the real client this maps to iterating result pages
+            self._record_cost(plan)
+            yield from local_engine.iter_aggregate(
+                table_name=plan.table,
+                dimensions=plan.dimension_names,
+                measures=plan.measure_specs,
+                date_from=plan.date_from,
+                date_to=plan.date_to,
+                filters=plan.filters or None,
+                order=plan.order,
+                limit=plan.limit,
+                chunk_size=chunk_size,
+                order_by=plan.order_by,
+                other=plan.other
+            )
             
         except Exception as e:
-            logger.error(f"BigQuery error: {str(e)}")
+            logger.error("BigQuery error", extra={"error": str(e)})
             raise
 
 
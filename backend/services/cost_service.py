@@ -0,0 +1,183 @@
+"""
+Cost-aware query admission
+
+Before a query that misses the result cache runs, its plan is dry-run on
+the backend (like BigQuery's dry_run / maximumBytesBilled). Queries whose
+estimate exceeds the share token's per-query byte budget are rejected or,
+if the token is configured to downgrade, narrowed to the most recent days
+that fit the budget. Estimates are recorded next to the actual bytes the
+backends report so the two can be compared for capacity planning.
+"""
+from datetime import timedelta
+from typing import Optional, Union
+import logging
+
+from fastapi import HTTPException, status
+
+import config
+from schemas.query_schema import ExploreQuery
+from services.backends import get_backend
+from services.query_backend import QueryBackend
+from services.query_service import QueryService, result_cache
+from utils.cost_tracker import cost_tracker
+from utils.tracing import stage
+
+logger = logging.getLogger(__name__)
+
+# Attempts at narrowing the date range before giving up on a downgrade
+MAX_DOWNGRADE_ATTEMPTS = 3
+
+
+class Admission:
+    """Outcome of admitting a query: the query to run and its cost"""
+
+    def __init__(self, query: ExploreQuery, estimated_bytes: Optional[int], downgraded: bool = False):
+        """
+        Initialize admission
+
+        Args:
+            query: Query to execute (narrowed if downgraded)
+            estimated_bytes: Dry-run estimate, or None if not estimated
+            downgraded: Whether the date range was narrowed to fit the budget
+        """
+        self.query = query
+        self.estimated_bytes = estimated_bytes
+        self.downgraded = downgraded
+
+    def headers(self) -> dict[str, str]:
+        """Response headers describing the estimate and any downgrade"""
+        headers = {}
+        if self.estimated_bytes is not None:
+            headers["X-Bytes-Estimated"] = str(self.estimated_bytes)
+        if self.downgraded:
+            headers["X-Query-Downgraded"] = f"date_from={self.query.date_from.isoformat()}"
+        return headers
+
+
+class CostService:
+    """Admits queries against per-token byte budgets"""
+
+    @staticmethod
+    def budget(token: str) -> tuple[Optional[int], str]:
+        """
+        Per-query byte budget and over-budget action of a share token
+
+        Args:
+            token: Verified share token
+
+        Returns:
+            Tuple of (max bytes or None for unlimited, "reject" or "downgrade")
+        """
+        token_info = config.SHARE_TOKENS.get(token, {})
+        max_bytes = token_info.get("max_bytes_billed", config.QUERY_MAX_BYTES_BILLED) or None
+        action = token_info.get("over_budget", config.QUERY_OVER_BUDGET_ACTION)
+        return max_bytes, action
+
+    @staticmethod
+    def _downgrade(
+        query: ExploreQuery,
+        backend: QueryBackend,
+        estimated_bytes: int,
+        max_bytes: int
+    ) -> Optional[tuple[ExploreQuery, int]]:
+        """Narrow the date range to the latest days that fit the budget"""
+        days = (query.date_to - query.date_from).days + 1
+        for _ in range(MAX_DOWNGRADE_ATTEMPTS):
+            # Scanned bytes grow roughly linearly with the number of days
+            days = min(days - 1, int(days * max_bytes / estimated_bytes))
+            if days < 1:
+                return None
+            candidate = query.model_copy(
+                update={"date_from": query.date_to - timedelta(days=days - 1)}
+            )
+            with stage("estimate"):
+                estimated_bytes = backend.estimate_bytes(QueryService.plan(candidate))
+            if estimated_bytes <= max_bytes:
+                return candidate, estimated_bytes
+        return None
+
+    @staticmethod
+    def admit(query: ExploreQuery, token: str) -> Admission:
+        """
+        Estimate a query's cost and admit, downgrade or reject it
+
+        Cached results cost nothing and are always admitted.
+
+        Args:
+            query: ExploreQuery request payload
+            token: Verified share token
+
+        Returns:
+            Admission with the query to execute
+
+        Raises:
+            HTTPException: If validation fails, or 400 if the query is
+                over the token's byte budget and cannot be downgraded
+        """
+        if config.QUERY_CACHE_ENABLED:
+            if result_cache.get(QueryService.cache_key(query), record_stats=False) is not None:
+                return Admission(query, None)
+
+        QueryService.validate(query)
+        plan = QueryService.plan(query)
+        backend = get_backend(plan.source.backend)
+
+        with stage("estimate"):
+            estimated_bytes = backend.estimate_bytes(plan)
+        if estimated_bytes is None:
+            return Admission(query, None)
+
+        max_bytes, action = CostService.budget(token)
+        if max_bytes is None or estimated_bytes <= max_bytes:
+            cost_tracker.record_estimate(query.dataset_id, token, estimated_bytes, "admitted")
+            return Admission(query, estimated_bytes)
+
+        if action == "downgrade":
+            downgraded = CostService._downgrade(query, backend, estimated_bytes, max_bytes)
+            if downgraded is not None:
+                narrowed, narrowed_bytes = downgraded
+                logger.info("Downgraded query over budget", extra={
+                    "dataset": query.dataset_id,
+                    "estimated_bytes": estimated_bytes,
+                    "narrowed_bytes": narrowed_bytes,
+                    "date_from": query.date_from,
+                    "narrowed_date_from": narrowed.date_from,
+                })
+                cost_tracker.record_estimate(query.dataset_id, token, narrowed_bytes, "downgraded")
+                return Admission(narrowed, narrowed_bytes, downgraded=True)
+
+        logger.info("Rejected query over budget", extra={
+            "dataset": query.dataset_id, "estimated_bytes": estimated_bytes, "max_bytes": max_bytes
+        })
+        cost_tracker.record_estimate(query.dataset_id, token, estimated_bytes, "rejected")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"Query would process about {estimated_bytes} bytes, over this share "
+                f"link's limit of {max_bytes} bytes. Narrow the date range or add filters."
+            )
+        )
+
+    @staticmethod
+    def admit_many(queries: list[ExploreQuery], token: str) -> list[Union[Admission, HTTPException]]:
+        """
+        Admit every query of a batch independently
+
+        Args:
+            queries: Batch of ExploreQuery payloads
+            token: Verified share token
+
+        Returns:
+            Admission or the HTTPException that rejected it, per query
+        """
+        admissions: list[Union[Admission, HTTPException]] = []
+        for query in queries:
+            try:
+                admissions.append(CostService.admit(query, token))
+            except HTTPException as e:
+                admissions.append(e)
+        return admissions
+
+
+# Singleton instance
+cost_service = CostService()
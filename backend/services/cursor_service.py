@@ -0,0 +1,261 @@
+"""
+Cursor pagination over retained query results
+
+The first page of a paginated query runs the query once and retains its
+full sorted result under a random result ID; every page returns a slice
+and an opaque cursor (result ID, offset and a digest of the query's
+result cache key) for the next one, so later pages are served without
+touching the backend. Retained results live in an LRU cache with a byte
+budget and a TTL.
+
+The cache key includes the dataset's data version, so a cursor stops
+matching its query once new data is loaded and is rejected with 410. A
+cursor whose result is gone (expired, evicted, or retained by another
+worker process) but whose data version still matches is served by running
+the query again: results are totally ordered, so the same data yields the
+same rows at the cursor's offset. Without a data version that cannot be
+told, and the cursor is rejected.
+
+Full results can hold up to QUERY_CURSOR_MAX_ROWS rows, so they are kept
+only here, under the retention budget, and never written to the result
+cache or the shared result cache where one of them could evict the whole
+working set.
+"""
+from typing import Optional
+import base64
+import binascii
+import hashlib
+import secrets
+
+from fastapi import HTTPException, status
+
+import config
+from schemas.query_schema import ExploreQuery
+from services.cost_service import cost_service
+from services.data_version_service import data_version_service
+from services.query_service import QueryService
+from utils.cache import LRUCache
+
+
+class RetainedResult:
+    """Full sorted result of a paginated query"""
+
+    def __init__(self, result_id: str, key: tuple, result: dict, headers: dict[str, str]):
+        """
+        Initialize retained result
+
+        Args:
+            result_id: Random ID carried by the cursors
+            key: Result cache key of the full query
+            result: Columnar result of the full query
+            headers: Admission headers of the run that produced it
+        """
+        self.id = result_id
+        self.key = key
+        self.result = result
+        self.headers = headers
+
+    @property
+    def total_rows(self) -> int:
+        """Rows across all pages"""
+        data = self.result["data"]
+        return len(data[0]) if data else 0
+
+    def page(self, offset: int, page_size: int) -> dict:
+        """
+        Slice one page
+
+        Args:
+            offset: First row of the page
+            page_size: Maximum rows in the page
+
+        Returns:
+            Columnar result holding the page's rows
+        """
+        return {
+            "columns": self.result["columns"],
+            "data": [column[offset:offset + page_size] for column in self.result["data"]],
+        }
+
+
+class CursorService:
+    """Retains paginated results and encodes cursors into them"""
+
+    def __init__(self, max_bytes: int, ttl: float, max_rows: int):
+        """
+        Initialize service
+
+        Args:
+            max_bytes: Memory budget of all retained results
+            ttl: Seconds a result is retained after its first page
+            max_rows: Rows retained per query when it sets no limit
+        """
+        self.max_rows = max_rows
+        self._results = LRUCache(max_bytes=max_bytes, default_ttl=ttl)
+
+    def full_query(self, query: ExploreQuery) -> ExploreQuery:
+        """
+        The query whose result is paginated: all pages, no paging fields
+
+        Args:
+            query: Paginated ExploreQuery
+
+        Returns:
+            ExploreQuery limited to the rows of all pages
+        """
+        limit = query.limit if "limit" in query.model_fields_set else self.max_rows
+        # model_copy skips validation, so limit may exceed the single-page maximum
+        return query.model_copy(update={"limit": limit, "page_size": None, "cursor": None})
+
+    @staticmethod
+    def digest(key: tuple) -> str:
+        """Short fingerprint of a result cache key, carried by cursors"""
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def encode(result_id: str, offset: int, key: tuple) -> str:
+        """
+        Opaque cursor pointing at a row of a query's result
+
+        Args:
+            result_id: ID the result is retained under
+            offset: First row of the page the cursor points at
+            key: Result cache key of the full query
+
+        Returns:
+            Cursor string
+        """
+        cursor = f"{result_id}.{offset}.{CursorService.digest(key)}"
+        return base64.urlsafe_b64encode(cursor.encode("ascii")).decode("ascii")
+
+    @staticmethod
+    def decode(cursor: str) -> tuple[str, int, str]:
+        """
+        Split a cursor into result ID, offset and key digest
+
+        Args:
+            cursor: Cursor from a previous page
+
+        Returns:
+            Tuple of (result ID, offset, key digest)
+
+        Raises:
+            HTTPException: 400 if the cursor is malformed
+        """
+        try:
+            result_id, offset, digest = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(".")
+            offset = int(offset)
+        except (ValueError, UnicodeError, binascii.Error):
+            offset = -1
+        if offset < 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        return result_id, offset, digest
+
+    @staticmethod
+    def _expired() -> HTTPException:
+        """Build the 410 raised for a cursor that can no longer be served"""
+        return HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Cursor expired, restart pagination without a cursor"
+        )
+
+    def get(self, token: str, result_id: str, key: tuple) -> Optional[RetainedResult]:
+        """
+        Look up a retained result for a later page
+
+        Args:
+            token: Share token the result was retained for
+            result_id: Result ID from the cursor
+            key: Result cache key of the request's full query
+
+        Returns:
+            RetainedResult, or None if not retained (for this query)
+        """
+        entry = self._results.get((token, result_id))
+        if entry is None or entry[0] != key:
+            return None
+        return RetainedResult(result_id, *entry)
+
+    def retain(
+        self,
+        token: str,
+        key: tuple,
+        result: dict,
+        headers: dict[str, str],
+        result_id: Optional[str] = None
+    ) -> RetainedResult:
+        """
+        Retain a full result for its later pages
+
+        Args:
+            token: Share token the result is served to
+            key: Result cache key of the full query
+            result: Columnar result of the full query
+            headers: Admission headers to repeat on every page
+            result_id: ID of a cursor whose result was gone, to retain
+                under again, or None for a new one
+
+        Returns:
+            RetainedResult (served even if too large to retain)
+        """
+        retained = RetainedResult(result_id or secrets.token_urlsafe(12), key, result, headers)
+        # Stored as a tuple so LRUCache accounts for the result's size
+        self._results.set((token, retained.id), (key, result, headers))
+        return retained
+
+    def execute_page(self, query: ExploreQuery, token: str) -> tuple[dict, RetainedResult, Optional[str]]:
+        """
+        Serve one page of a paginated query
+
+        Args:
+            query: Paginated ExploreQuery (page_size set, cursor optional)
+            token: Verified share token
+
+        Returns:
+            Tuple of (page as a columnar result, retained result, next
+            cursor or None on the last page)
+
+        Raises:
+            HTTPException: 400 if the cursor is malformed, 410 if it belongs
+                to another query or data version, or its result is gone and
+                cannot be reproduced; or if admission or execution fails
+        """
+        full_query = self.full_query(query)
+        key = QueryService.cache_key(full_query)
+
+        result_id, offset = None, 0
+        retained = None
+        if query.cursor is not None:
+            result_id, offset, digest = self.decode(query.cursor)
+            if digest != self.digest(key):
+                # Another query, or new data loaded since the first page
+                raise self._expired()
+            retained = self.get(token, result_id, key)
+            if retained is None and data_version_service.version(query.dataset_id) is None:
+                # A re-run could differ from the result the cursor's offset refers to
+                raise self._expired()
+
+        if retained is None:
+            # First page, or a cursor whose result is no longer retained here
+            admission = cost_service.admit(full_query, token)
+            result = QueryService.execute_columns(admission.query, store=False)
+            retained = self.retain(token, key, result, admission.headers(), result_id)
+
+        end = offset + query.page_size
+        next_cursor = self.encode(retained.id, end, key) if end < retained.total_rows else None
+        return retained.page(offset, query.page_size), retained, next_cursor
+
+    def stats(self) -> dict:
+        """Retention cache counters (see LRUCache.stats)"""
+        return self._results.stats()
+
+
+# Singleton instance
+cursor_service = CursorService(
+    max_bytes=config.QUERY_CURSOR_MAX_BYTES,
+    ttl=config.QUERY_CURSOR_TTL,
+    max_rows=config.QUERY_CURSOR_MAX_ROWS
+)
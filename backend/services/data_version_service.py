@@ -0,0 +1,73 @@
+"""
+Per-dataset data versions
+
+A dataset's version is its execution backend's watermark for the fact
+table (last-modified time, file stamp). Result cache keys, partial
+aggregate keys and query result ETags include it, so cached results and
+a client's copy of a result stay valid until new data is loaded.
+Watermarks are rechecked at most every DATA_VERSION_CHECK_SECONDS so that
+revalidating a request stays cheap.
+"""
+from typing import Optional
+import threading
+import time
+
+import config
+from services.backends import get_backend
+from services.query_plan import COMPILED_DATASETS
+
+
+class DataVersionService:
+    """Caches backend watermarks per dataset"""
+
+    def __init__(self, check_interval: float):
+        """
+        Initialize with no known versions
+
+        Args:
+            check_interval: Seconds a watermark is trusted before rechecking
+        """
+        self.check_interval = check_interval
+        self._versions: dict[str, tuple[float, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def version(self, dataset_id: str) -> Optional[str]:
+        """
+        Current data version of a dataset
+
+        Args:
+            dataset_id: Registered dataset ID
+
+        Returns:
+            Opaque version string, or None if the backend cannot tell or
+            the dataset does not exist
+        """
+        now = time.monotonic()
+        cached = self._versions.get(dataset_id)
+        if cached is not None and now - cached[0] < self.check_interval:
+            return cached[1]
+
+        source = COMPILED_DATASETS.get(dataset_id)
+        if source is None:
+            return None
+        version = get_backend(source.backend).data_version(source.table)
+        with self._lock:
+            self._versions[dataset_id] = (now, version)
+        return version
+
+    def invalidate(self, dataset_id: Optional[str] = None) -> None:
+        """
+        Forget cached watermarks (e.g. right after a data load)
+
+        Args:
+            dataset_id: Dataset to forget, or None for all
+        """
+        with self._lock:
+            if dataset_id is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(dataset_id, None)
+
+
+# Singleton instance
+data_version_service = DataVersionService(config.DATA_VERSION_CHECK_SECONDS)
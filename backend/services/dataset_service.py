@@ -1,13 +1,24 @@
 """
 Dataset business logic service
 """
+from typing import Optional
+import threading
+
 from constants.datasets import DATASETS_REGISTRY
 from schemas.dataset_schema import DatasetItem, DatasetFields
+from utils.http_cache import PrecomputedResponse
+from utils.json_response import dumps
 
 
 class DatasetService:
     """Service for dataset operations"""
     
+    def __init__(self):
+        """Initialize with no precomputed responses (built on first use)"""
+        self._datasets_response: Optional[PrecomputedResponse] = None
+        self._fields_responses: dict[str, PrecomputedResponse] = {}
+        self._lock = threading.Lock()
+    
     @staticmethod
     def get_all_datasets() -> list[DatasetItem]:
         """
@@ -44,6 +55,45 @@ class DatasetService:
             dimensions=list(dataset["dimensions"].keys()),
             measures=list(dataset["measures"].keys())
         )
+    
+    def _build_responses(self) -> None:
+        """Serialize every metadata response (the registry is fixed at import)"""
+        datasets = PrecomputedResponse(
+            dumps([item.model_dump() for item in self.get_all_datasets()])
+        )
+        fields = {
+            dataset_id: PrecomputedResponse(dumps(self.get_dataset_fields(dataset_id).model_dump()))
+            for dataset_id in DATASETS_REGISTRY
+        }
+        with self._lock:
+            self._datasets_response = datasets
+            self._fields_responses = fields
+    
+    def datasets_response(self) -> PrecomputedResponse:
+        """
+        Serialized dataset list with its ETag
+        
+        Returns:
+            PrecomputedResponse for the datasets endpoint
+        """
+        if self._datasets_response is None:
+            self._build_responses()
+        return self._datasets_response
+    
+    def fields_response(self, dataset_id: str) -> Optional[PrecomputedResponse]:
+        """
+        Serialized fields of a dataset with their ETag
+        
+        Args:
+            dataset_id: Dataset ID
+        
+        Returns:
+            PrecomputedResponse for the fields endpoint, or None if the
+            dataset does not exist
+        """
+        if self._datasets_response is None:
+            self._build_responses()
+        return self._fields_responses.get(dataset_id)
 
 
 # Singleton instance
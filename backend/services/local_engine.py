@@ -0,0 +1,687 @@
+"""
+Local columnar execution engine
+
+Serves explore queries from synthetic in-memory fact tables when no real
+warehouse is attached (local dev, staging, load tests). Tables are stored
+as NumPy column arrays with dictionary-encoded dimensions, rows sorted by
+day, and queries are answered with vectorized group-by/aggregate.
+"""
+from datetime import date
+from typing import Iterator, Optional
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+import config
+from constants.datasets import DATASETS_REGISTRY
+from utils.tracing import stage
+
+logger = logging.getLogger(__name__)
+
+# Value vocabularies for generated categorical columns
+MOCK_VALUES: dict[str, list[str]] = {
+    "platform": ["tiktok", "instagram", "facebook", "youtube"],
+    "product_name": [f"Product {i:03d}" for i in range(1, 201)],
+    "host": [f"host_{i:02d}" for i in range(1, 41)],
+}
+
+_AGGREGATE_RE = re.compile(r"^\s*(SUM|COUNT|AVG)\s*\(\s*([\w*]+)\s*\)\s*$", re.IGNORECASE)
+_DATE_DIMENSION = "dt"
+
+
+def parse_aggregate(expr: str) -> tuple[str, Optional[str]]:
+    """
+    Parse a whitelisted measure expression such as SUM(revenue) or COUNT(1)
+
+    Args:
+        expr: Measure SQL expression
+
+    Returns:
+        Tuple of (function, column); column is None for COUNT
+
+    Raises:
+        ValueError: If the expression is not a supported aggregate
+    """
+    match = _AGGREGATE_RE.match(expr)
+    if not match:
+        raise ValueError(f"Unsupported measure expression '{expr}'")
+
+    func, column = match.group(1).upper(), match.group(2)
+    if func == "COUNT":
+        return func, None
+    return func, column
+
+
+class ColumnarTable:
+    """In-memory fact table stored as column arrays, sorted by day"""
+
+    def __init__(
+        self,
+        name: str,
+        days: np.ndarray,
+        dimensions: dict[str, tuple[np.ndarray, np.ndarray]],
+        measures: dict[str, np.ndarray],
+        loaded_at: Optional[float] = None
+    ):
+        """
+        Initialize table
+
+        Args:
+            name: Fully qualified table name
+            days: Sorted day ordinals (date.toordinal()) per row
+            dimensions: Column name -> (codes, sorted categories)
+            measures: Column name -> numeric values
+            loaded_at: Last-modified watermark (defaults to now)
+        """
+        self.name = name
+        self.days = days
+        self.dimensions = dimensions
+        self.measures = measures
+        self.num_rows = len(days)
+        # Load time, reported as the table's last-modified watermark
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+
+    def day_range(self, date_from: date, date_to: date) -> slice:
+        """
+        Row slice covering an inclusive date range (binary search on days)
+
+        Args:
+            date_from: Start date
+            date_to: End date
+
+        Returns:
+            Slice of rows with date_from <= day <= date_to
+        """
+        start = np.searchsorted(self.days, date_from.toordinal(), side="left")
+        stop = np.searchsorted(self.days, date_to.toordinal(), side="right")
+        return slice(int(start), int(stop))
+
+
+class LocalEngine:
+    """Vectorized aggregate engine over ColumnarTable instances"""
+
+    def __init__(self, rows_per_day: int, days: int, seed: int):
+        """
+        Initialize engine (tables are generated lazily on first use)
+
+        Args:
+            rows_per_day: Fact rows generated per day per table
+            days: Number of days of history, ending today
+            seed: Random seed so generated data is reproducible
+        """
+        self.rows_per_day = rows_per_day
+        self.days = days
+        self.seed = seed
+        self._tables: dict[str, ColumnarTable] = {}
+        self._lock = threading.Lock()
+
+    def get_table(self, table_name: str) -> ColumnarTable:
+        """
+        Get (building on first use) the table with the given name
+
+        Args:
+            table_name: Fully qualified table name from DATASETS_REGISTRY
+
+        Returns:
+            ColumnarTable
+
+        Raises:
+            ValueError: If no dataset uses this table
+        """
+        table = self._tables.get(table_name)
+        if table is not None:
+            return table
+
+        with self._lock:
+            table = self._tables.get(table_name)
+            if table is None:
+                table = self._build_table(table_name)
+                self._tables[table_name] = table
+            return table
+
+    def _build_table(self, table_name: str) -> ColumnarTable:
+        """Generate a synthetic fact table matching a registry entry"""
+        dataset = next(
+            (d for d in DATASETS_REGISTRY.values() if d["table"] == table_name),
+            None
+        )
+        if dataset is None:
+            raise ValueError(f"Unknown table '{table_name}'")
+
+        rng = np.random.default_rng([self.seed, sum(table_name.encode())])
+        last_day = date.today().toordinal()
+        first_day = last_day - self.days + 1
+        num_rows = self.days * self.rows_per_day
+
+        days = np.repeat(
+            np.arange(first_day, last_day + 1, dtype=np.int32),
+            self.rows_per_day
+        )
+
+        dimensions = {}
+        for name in dataset["dimensions"]:
+            if name == _DATE_DIMENSION:
+                continue
+            values = MOCK_VALUES.get(name, [f"{name}_{i}" for i in range(10)])
+            categories = np.array(sorted(values), dtype=object)
+            # Skewed popularity so top values stand out like real data
+            weights = 1.0 / np.arange(1, len(categories) + 1)
+            rng.shuffle(weights)
+            codes = rng.choice(
+                len(categories),
+                size=num_rows,
+                p=weights / weights.sum()
+            ).astype(np.int32)
+            dimensions[name] = (codes, categories)
+
+        measures = {}
+        for expr in dataset["measures"].values():
+            _, column = parse_aggregate(expr)
+            if column is not None and column not in measures:
+                measures[column] = np.round(rng.gamma(2.0, 60.0, size=num_rows), 2)
+
+        logger.info("Built local table", extra={"table": table_name, "rows": num_rows})
+        # The data only depends on the seed and its last day, so every worker
+        # process reports the same watermark (and shares cached results)
+        loaded_at = time.mktime(date.fromordinal(last_day).timetuple())
+        return ColumnarTable(table_name, days, dimensions, measures, loaded_at)
+
+    @staticmethod
+    def _group_codes(
+        table: ColumnarTable,
+        rows: np.ndarray,
+        dimension: str,
+        first_day: int,
+        num_days: int
+    ) -> tuple[np.ndarray, int]:
+        """Dictionary codes and cardinality of one group-by column"""
+        if dimension == _DATE_DIMENSION:
+            return table.days[rows] - first_day, num_days
+        if dimension not in table.dimensions:
+            raise ValueError(f"Unknown column '{dimension}' in {table.name}")
+        codes, categories = table.dimensions[dimension]
+        return codes[rows], len(categories)
+
+    @staticmethod
+    def _decode(
+        table: ColumnarTable,
+        dimension: str,
+        codes: np.ndarray,
+        first_day: int
+    ) -> list:
+        """Turn group codes back into output values"""
+        if dimension == _DATE_DIMENSION:
+            return [date.fromordinal(first_day + int(c)).isoformat() for c in codes]
+        return table.dimensions[dimension][1][codes].tolist()
+
+    def register_table(self, table: ColumnarTable) -> None:
+        """
+        Add or replace a derived table (e.g. a rollup) by name
+
+        Args:
+            table: Table to register under table.name
+        """
+        with self._lock:
+            self._tables[table.name] = table
+
+    @staticmethod
+    def _scan(
+        table: ColumnarTable,
+        date_from: date,
+        date_to: date,
+        filters: Optional[dict[str, str]] = None
+    ) -> Optional[tuple[slice, Optional[np.ndarray]]]:
+        """
+        Resolve the rows a query reads: a date window plus a filter mask
+
+        Returns:
+            (rows, mask) where mask is None without filters, or None if a
+            filter value does not exist in the table
+        """
+        rows = table.day_range(date_from, date_to)
+
+        # Filters become a mask over the date window so columns are never gathered
+        mask = None
+        for column, value in (filters or {}).items():
+            if column not in table.dimensions:
+                raise ValueError(f"Unknown column '{column}' in {table.name}")
+            codes, categories = table.dimensions[column]
+            position = np.searchsorted(categories, value)
+            if position >= len(categories) or categories[position] != value:
+                return None
+            matches = codes[rows] == position
+            mask = matches if mask is None else mask & matches
+
+        return rows, mask
+
+    def _group(
+        self,
+        table: ColumnarTable,
+        scan: Optional[tuple[slice, Optional[np.ndarray]]],
+        dimensions: list[str],
+        measures: list[tuple[str, str, Optional[str]]],
+        date_from: date,
+        date_to: date
+    ) -> Optional[tuple[np.ndarray, list[int], dict[str, np.ndarray]]]:
+        """
+        Vectorized group-by over scanned rows, shared by queries and rollup builds
+
+        Returns:
+            (group_keys, cardinalities, aggregates) with group keys in
+            ascending order, or None if no rows match
+        """
+        if scan is None:
+            return None
+        rows, mask = scan
+
+        first_day = date_from.toordinal()
+        num_days = date_to.toordinal() - first_day + 1
+
+        # Composite group key: row-major index over all group columns, so
+        # ascending key order equals lexicographic order of the values
+        keys = None
+        cardinalities = []
+        for dimension in dimensions:
+            codes, cardinality = self._group_codes(table, rows, dimension, first_day, num_days)
+            keys = codes.astype(np.intp) if keys is None else keys * cardinality + codes
+            cardinalities.append(cardinality)
+
+        if keys is None or len(keys) == 0:
+            return None
+
+        num_groups = int(np.prod(cardinalities, dtype=np.int64))
+        if num_groups <= max(4 * len(keys), 1 << 16):
+            if mask is not None:
+                # Filtered-out rows land in an overflow bucket that is dropped
+                keys = np.where(mask, keys, num_groups)
+            counts = np.bincount(keys, minlength=num_groups + 1)[:num_groups]
+            group_keys = np.flatnonzero(counts)
+            group_counts = counts[group_keys]
+
+            def group_sums(values: np.ndarray) -> np.ndarray:
+                return np.bincount(keys, weights=values, minlength=num_groups + 1)[group_keys]
+        else:
+            # Sparse key space: compact keys before aggregating
+            if mask is not None:
+                keys = keys[mask]
+            group_keys, inverse = np.unique(keys, return_inverse=True)
+            group_counts = np.bincount(inverse, minlength=len(group_keys))
+
+            def group_sums(values: np.ndarray) -> np.ndarray:
+                if mask is not None:
+                    values = values[mask]
+                return np.bincount(inverse, weights=values, minlength=len(group_keys))
+
+        if len(group_keys) == 0:
+            return None
+
+        aggregates = {}
+        for alias, func, column in measures:
+            if func == "COUNT":
+                aggregates[alias] = group_counts
+                continue
+            if column not in table.measures:
+                raise ValueError(f"Unknown column '{column}' in {table.name}")
+            values = table.measures[column]
+            totals = group_sums(values[rows])
+            if func == "AVG":
+                totals = totals / group_counts
+            elif np.issubdtype(values.dtype, np.integer):
+                totals = np.rint(totals).astype(np.int64)
+            aggregates[alias] = totals
+
+        return group_keys, cardinalities, aggregates
+
+    def iter_columns(
+        self,
+        table_name: str,
+        dimensions: list[str],
+        measures: list[tuple[str, str, Optional[str]]],
+        date_from: date,
+        date_to: date,
+        filters: Optional[dict[str, str]] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        order_by: Optional[str] = None,
+        other: bool = False
+    ) -> Iterator[list[list]]:
+        """
+        Run a grouped aggregate and yield the result column-wise in chunks
+
+        Aggregation happens up front on column arrays; output values are
+        only decoded one chunk at a time.
+
+        Args:
+            table_name: Fully qualified table name
+            dimensions: Columns to group by, in order
+            measures: (alias, function, column) triples as returned by
+                parse_aggregate, e.g. ("revenue", "SUM", "revenue")
+            date_from: Start date (inclusive)
+            date_to: End date (inclusive)
+            filters: Optional equality filters on dimension columns
+            order: Sort order of the group keys ("asc" or "desc")
+            limit: Optional maximum number of groups returned
+            chunk_size: Rows per chunk (None for a single chunk)
+            order_by: Measure alias to sort by instead of the group keys
+                (ties in ascending group key order)
+            other: Append a remainder row totalling the groups cut off
+                by limit (SUM and COUNT measures only)
+
+        Yields:
+            One value list per output column (dimensions, then measures),
+            sorted by group key or order_by
+
+        Raises:
+            ValueError: If a column or expression is not supported
+        """
+        table = self.get_table(table_name)
+        with stage("scan"):
+            scan = self._scan(table, date_from, date_to, filters)
+            grouped = self._group(table, scan, dimensions, measures, date_from, date_to)
+        yield from self._emit(
+            table, grouped, dimensions, measures, date_from, order, limit, chunk_size, order_by, other
+        )
+
+    def _emit(
+        self,
+        table: ColumnarTable,
+        grouped: Optional[tuple[np.ndarray, list[int], dict[str, np.ndarray]]],
+        dimensions: list[str],
+        measures: list[tuple[str, str, Optional[str]]],
+        date_from: date,
+        order: str,
+        limit: Optional[int],
+        chunk_size: Optional[int],
+        order_by: Optional[str] = None,
+        other: bool = False
+    ) -> Iterator[list[list]]:
+        """Apply order and limit to grouped aggregates and decode them in chunks"""
+        if grouped is None:
+            return
+        group_keys, cardinalities, aggregates = grouped
+
+        with stage("postprocess"):
+            if order_by is None:
+                selected = np.arange(len(group_keys))
+                if order == "desc":
+                    selected = selected[::-1]
+                if limit is not None:
+                    selected = selected[:limit]
+            else:
+                selected = self._top(aggregates[order_by], order, limit)
+            remainder = self._remainder(measures, aggregates, selected, len(group_keys)) if other else None
+
+        first_day = date_from.toordinal()
+        chunk_size = chunk_size or max(len(selected), 1)
+
+        for start in range(0, len(selected), chunk_size):
+            chunk = selected[start:start + chunk_size]
+
+            with stage("postprocess"):
+                measure_values = []
+                for alias, *_ in measures:
+                    values = aggregates[alias][chunk]
+                    if np.issubdtype(values.dtype, np.floating):
+                        values = np.round(values, 2)
+                    measure_values.append(values.tolist())
+
+                dimension_values = []
+                remaining = group_keys[chunk]
+                for dimension, cardinality in reversed(list(zip(dimensions, cardinalities))):
+                    dimension_values.insert(0, self._decode(table, dimension, remaining % cardinality, first_day))
+                    remaining = remaining // cardinality
+
+                if remainder is not None and start + chunk_size >= len(selected):
+                    # The remainder row closes the last chunk
+                    for values in dimension_values:
+                        values.append(config.QUERY_OTHER_LABEL)
+                    for values, total in zip(measure_values, remainder):
+                        values.append(total)
+
+            yield dimension_values + measure_values
+
+    @staticmethod
+    def _top(values: np.ndarray, order: str, limit: Optional[int]) -> np.ndarray:
+        """
+        Indices of the groups ranked first by a measure, in rank order
+
+        With a limit, np.partition finds the cutoff value in linear time
+        and only the groups up to it are sorted, instead of all groups.
+        Ties rank by group index, i.e. by ascending group key.
+
+        Args:
+            values: Measure value per group
+            order: "asc" ranks the smallest values first, "desc" the largest
+            limit: Optional number of groups to select
+
+        Returns:
+            Selected group indices
+        """
+        ranked = -values if order == "desc" else values
+        candidates = np.arange(len(ranked))
+        if limit is not None and limit < len(ranked):
+            cutoff = np.partition(ranked, limit - 1)[limit - 1]
+            below = np.flatnonzero(ranked < cutoff)
+            tied = np.flatnonzero(ranked == cutoff)[:limit - len(below)]
+            candidates = np.concatenate([below, tied])
+        # lexsort sorts by its last key first
+        return candidates[np.lexsort((candidates, ranked[candidates]))]
+
+    @staticmethod
+    def _remainder(
+        measures: list[tuple[str, str, Optional[str]]],
+        aggregates: dict[str, np.ndarray],
+        selected: np.ndarray,
+        num_groups: int
+    ) -> Optional[list]:
+        """
+        Measure totals over the groups that were not selected
+
+        Returns:
+            One total per measure, or None if every group was selected
+
+        Raises:
+            ValueError: If a measure is not a SUM or COUNT
+        """
+        if len(selected) == num_groups:
+            return None
+        rest = np.ones(num_groups, dtype=bool)
+        rest[selected] = False
+
+        totals = []
+        for alias, func, _ in measures:
+            if func not in ("SUM", "COUNT"):
+                raise ValueError(f"A remainder row needs SUM or COUNT measures, not {func}")
+            total = aggregates[alias][rest].sum()
+            totals.append(round(float(total), 2) if np.issubdtype(total.dtype, np.floating) else int(total))
+        return totals
+
+    def aggregate_columns(
+        self,
+        table_name: str,
+        dimensions: list[str],
+        measures: list[tuple[str, str, Optional[str]]],
+        date_from: date,
+        date_to: date,
+        filters: Optional[dict[str, str]] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+        order_by: Optional[str] = None,
+        other: bool = False
+    ) -> dict:
+        """
+        Run a grouped aggregate and return a columnar result
+
+        Args:
+            table_name: Fully qualified table name
+            dimensions: Columns to group by, in order
+            measures: (alias, function, column) triples as returned by
+                parse_aggregate, e.g. ("revenue", "SUM", "revenue")
+            date_from: Start date (inclusive)
+            date_to: End date (inclusive)
+            filters: Optional equality filters on dimension columns
+            order: Sort order of the group keys ("asc" or "desc")
+            limit: Optional maximum number of groups returned
+            order_by: Measure alias to sort by instead of the group keys
+            other: Append a remainder row for the groups cut off by limit
+
+        Returns:
+            Dict with "columns" (names) and "data" (one value list per column)
+
+        Raises:
+            ValueError: If a column or expression is not supported
+        """
+        names = list(dimensions) + [alias for alias, *_ in measures]
+        data = next(
+            self.iter_columns(
+                table_name, dimensions, measures, date_from, date_to, filters, order, limit, None, order_by, other
+            ),
+            [[] for _ in names]
+        )
+        return {"columns": names, "data": data}
+
+    def aggregate_columns_many(
+        self,
+        table_name: str,
+        specs: list[tuple[list[str], list[tuple[str, str, Optional[str]]], str, Optional[int], Optional[str], bool]],
+        date_from: date,
+        date_to: date,
+        filters: Optional[dict[str, str]] = None
+    ) -> list[dict]:
+        """
+        Answer several group-bys over the same rows with one shared scan
+
+        The date window and filter mask are resolved once; each spec then
+        only pays for its own grouping.
+
+        Args:
+            table_name: Fully qualified table name
+            specs: (dimensions, measures, order, limit, order_by, other) per
+                result
+            date_from: Start date (inclusive)
+            date_to: End date (inclusive)
+            filters: Optional equality filters on dimension columns
+
+        Returns:
+            One columnar result per spec, in the same order
+
+        Raises:
+            ValueError: If a column or expression is not supported
+        """
+        table = self.get_table(table_name)
+        with stage("scan"):
+            scan = self._scan(table, date_from, date_to, filters)
+
+        results = []
+        for dimensions, measures, order, limit, order_by, other in specs:
+            names = list(dimensions) + [alias for alias, *_ in measures]
+            with stage("scan"):
+                grouped = self._group(table, scan, dimensions, measures, date_from, date_to)
+            data = next(
+                self._emit(table, grouped, dimensions, measures, date_from, order, limit, None, order_by, other),
+                [[] for _ in names]
+            )
+            results.append({"columns": names, "data": data})
+        return results
+
+    def iter_aggregate(
+        self,
+        table_name: str,
+        dimensions: list[str],
+        measures: list[tuple[str, str, Optional[str]]],
+        date_from: date,
+        date_to: date,
+        filters: Optional[dict[str, str]] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        order_by: Optional[str] = None,
+        other: bool = False
+    ) -> Iterator[list[dict]]:
+        """
+        Run a grouped aggregate and yield result rows in chunks
+
+        Args:
+            Same as iter_columns
+
+        Yields:
+            Lists of result rows as dictionaries, sorted by group key or order_by
+
+        Raises:
+            ValueError: If a column or expression is not supported
+        """
+        names = list(dimensions) + [alias for alias, *_ in measures]
+        for data in self.iter_columns(
+            table_name, dimensions, measures, date_from, date_to, filters, order, limit, chunk_size, order_by, other
+        ):
+            yield [dict(zip(names, values)) for values in zip(*data)]
+
+    def build_rollup(
+        self,
+        source_name: str,
+        rollup_name: str,
+        dimensions: list[str],
+        measures: list[tuple[str, str, Optional[str]]]
+    ) -> ColumnarTable:
+        """
+        Pre-aggregate a table by day and dimensions and register the result
+
+        The rollup keeps the source's dictionary encoding and stays sorted
+        by day, so it can be queried exactly like a fact table.
+
+        Args:
+            source_name: Table to aggregate
+            rollup_name: Name to register the rollup under
+            dimensions: Non-date columns to keep (grouped together with dt)
+            measures: (column, function, source column) triples to pre-aggregate
+
+        Returns:
+            The registered rollup table
+        """
+        source = self.get_table(source_name)
+        first_day, last_day = int(source.days[0]), int(source.days[-1])
+        group_by = [_DATE_DIMENSION] + list(dimensions)
+
+        date_from, date_to = date.fromordinal(first_day), date.fromordinal(last_day)
+        group_keys, cardinalities, aggregates = self._group(
+            source,
+            self._scan(source, date_from, date_to),
+            group_by,
+            measures,
+            date_from,
+            date_to
+        )
+
+        codes = {}
+        remaining = group_keys
+        for dimension, cardinality in reversed(list(zip(group_by, cardinalities))):
+            codes[dimension] = (remaining % cardinality).astype(np.int32)
+            remaining = remaining // cardinality
+
+        rollup = ColumnarTable(
+            rollup_name,
+            days=codes.pop(_DATE_DIMENSION) + first_day,
+            dimensions={
+                name: (codes[name], source.dimensions[name][1])
+                for name in dimensions
+            },
+            measures=aggregates
+        )
+        self.register_table(rollup)
+
+        logger.info("Built rollup", extra={
+            "rollup": rollup_name, "rows": rollup.num_rows, "source_rows": source.num_rows
+        })
+        return rollup
+
+
+# Singleton instance
+local_engine = LocalEngine(
+    rows_per_day=config.LOCAL_ENGINE_ROWS_PER_DAY,
+    days=config.LOCAL_ENGINE_DAYS,
+    seed=config.LOCAL_ENGINE_SEED
+)
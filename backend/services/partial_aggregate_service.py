@@ -0,0 +1,198 @@
+"""
+Incremental date-partitioned aggregate cache
+
+Mergeable measures (SUM/COUNT) are cached as per-day partial aggregates
+keyed by (dataset, data version, dimensions, measures, platform, day). A
+query over a date range reuses every cached day, fetches only the missing
+days from the backend, and merges the partials into the final result.
+
+Merging happens in Python, so it only beats a scan that is itself
+expensive: queries a rollup covers are always answered by the rollup.
+"""
+from datetime import date, timedelta
+from typing import Optional
+import heapq
+import logging
+
+import config
+from schemas.query_schema import ExploreQuery
+from services.backends import get_backend
+from services.data_version_service import data_version_service
+from services.query_plan import COMPILED_DATASETS, QueryPlan
+from services.rollup_service import rollup_service, MERGEABLE_AGGREGATES
+from utils.cache import LRUCache
+from utils.tracing import stage
+
+logger = logging.getLogger(__name__)
+
+
+class PartialAggregateService:
+    """Answers mergeable queries from cached per-day partial aggregates"""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        """
+        Initialize service
+
+        Args:
+            max_bytes: Memory budget for cached day partials
+            ttl: Seconds a completed day's partials stay cached
+        """
+        self.cache = LRUCache(max_bytes=max_bytes, default_ttl=ttl)
+
+    @staticmethod
+    def supports(query: ExploreQuery) -> bool:
+        """
+        Whether a query should be answered from per-day partials
+
+        Args:
+            query: Validated ExploreQuery
+
+        Returns:
+            True if every measure is a SUM or COUNT and no rollup covers
+            the query (a rollup scan is cheaper than merging partials)
+        """
+        compiled = COMPILED_DATASETS[query.dataset_id]
+        if not all(compiled.measures[m].func in MERGEABLE_AGGREGATES for m in query.measures):
+            return False
+        source = rollup_service.route(
+            source=compiled,
+            dimensions=query.dimensions,
+            measures=query.measures,
+            platform=query.platform
+        )
+        return source is compiled
+
+    def _fetch_days(
+        self,
+        query: ExploreQuery,
+        date_from: date,
+        date_to: date
+    ) -> dict[str, dict]:
+        """Fetch per-day partials for a contiguous run of days"""
+        source = rollup_service.route(
+            source=COMPILED_DATASETS[query.dataset_id],
+            dimensions=query.dimensions,
+            measures=query.measures,
+            platform=query.platform
+        )
+        # One partial per day and dimension values, over the run only
+        plan = QueryPlan(
+            source=source,
+            dimensions=["dt", *(d for d in query.dimensions if d != "dt")],
+            measures=query.measures,
+            date_from=date_from,
+            date_to=date_to,
+            platform=query.platform
+        )
+
+        result = get_backend(source.backend).execute_columns(plan)
+
+        # Columns are dt, the other dimensions, then the measures
+        columns = dict(zip(result["columns"], result["data"]))
+        keys = zip(*(columns[d] for d in query.dimensions))
+        amounts = zip(*(columns[m] for m in query.measures))
+
+        partials: dict[str, dict] = {}
+        for day, key, values in zip(columns["dt"], keys, amounts):
+            partials.setdefault(day, {})[key] = values
+        return partials
+
+    def execute(self, query: ExploreQuery) -> dict:
+        """
+        Execute a validated query by merging per-day partial aggregates
+
+        Args:
+            query: Validated ExploreQuery
+
+        Returns:
+            Columnar result sorted by the dimension values or order_by,
+            with order, limit and the remainder row applied
+        """
+        # A data load may rewrite any day, so partials are keyed by data version
+        series = (
+            query.dataset_id,
+            data_version_service.version(query.dataset_id),
+            tuple(query.dimensions),
+            tuple(query.measures),
+            query.platform or None
+        )
+        # Today's partition is still being written, so only earlier days are cached
+        today = date.today()
+
+        days = []
+        current = query.date_from
+        while current <= query.date_to:
+            days.append(current)
+            current += timedelta(days=1)
+
+        partials: dict[date, dict] = {}
+        missing: list[date] = []
+        for day in days:
+            cached = self.cache.get(series + (day,)) if day < today else None
+            if cached is None:
+                missing.append(day)
+            else:
+                partials[day] = cached
+
+        # Fetch each contiguous run of missing days with one backend query
+        run_start: Optional[date] = None
+        for i, day in enumerate(missing):
+            if run_start is None:
+                run_start = day
+            if i + 1 < len(missing) and missing[i + 1] == day + timedelta(days=1):
+                continue
+
+            fetched = self._fetch_days(query, run_start, day)
+            current = run_start
+            while current <= day:
+                partial = fetched.get(current.isoformat(), {})
+                partials[current] = partial
+                if current < today:
+                    self.cache.set(series + (current,), partial)
+                current += timedelta(days=1)
+            run_start = None
+
+        if missing:
+            logger.info("Partial aggregates", extra={"cached_days": len(days) - len(missing), "fetched_days": len(missing)})
+
+        with stage("postprocess"):
+            totals: dict[tuple, list] = {}
+            for partial in partials.values():
+                for key, values in partial.items():
+                    total = totals.get(key)
+                    if total is None:
+                        totals[key] = list(values)
+                    else:
+                        for i, value in enumerate(values):
+                            total[i] += value
+
+            if query.order_by is None:
+                keys = sorted(totals, reverse=query.order == "desc")[:query.limit]
+            else:
+                # Heap selection keeps limit groups instead of sorting all of them;
+                # ties rank by ascending dimension values, like the backends
+                position = query.measures.index(query.order_by)
+                sign = -1 if query.order == "desc" else 1
+                keys = heapq.nsmallest(query.limit, totals, key=lambda key: (sign * totals[key][position], key))
+
+            rows = [totals[key] for key in keys]
+            if query.include_other and len(keys) < len(totals):
+                kept = set(keys)
+                rest = [values for key, values in totals.items() if key not in kept]
+                keys.append((config.QUERY_OTHER_LABEL,) * len(query.dimensions))
+                rows.append([sum(column) for column in zip(*rest)])
+
+            data = [list(column) for column in zip(*keys)] if keys else [[] for _ in query.dimensions]
+            for i in range(len(query.measures)):
+                data.append([
+                    round(values[i], 2) if isinstance(values[i], float) else values[i]
+                    for values in rows
+                ])
+        return {"columns": [*query.dimensions, *query.measures], "data": data}
+
+
+# Singleton instance
+partial_aggregate_service = PartialAggregateService(
+    max_bytes=config.PARTIAL_CACHE_MAX_BYTES,
+    ttl=config.PARTIAL_CACHE_TTL
+)
@@ -0,0 +1,91 @@
+"""
+Execution backend interface
+
+Every backend executes compiled QueryPlans. QueryService and the partial
+aggregate cache pick the backend of a plan's dataset (the registry's
+optional "backend" key, see services.backends) and never talk to a
+concrete backend directly.
+"""
+from typing import Iterator, Optional
+
+from services.query_plan import QueryPlan
+
+
+class QueryBackend:
+    """Base class for query execution backends"""
+
+    # Registry name of the backend
+    name: str = ""
+
+    # Whether the backend can read the rollup tables built by RollupService
+    supports_rollups: bool = False
+
+    def estimate_bytes(self, plan: QueryPlan) -> Optional[int]:
+        """
+        Estimate the bytes a plan would process without running it
+
+        Args:
+            plan: Compiled query plan
+
+        Returns:
+            Estimated bytes, or None if the backend cannot estimate cost
+        """
+        return None
+
+    def data_version(self, table: str) -> Optional[str]:
+        """
+        Watermark of a table's contents, changed by every data load
+
+        Args:
+            table: Fully qualified table name
+
+        Returns:
+            Opaque version string, or None if the backend cannot tell
+        """
+        return None
+
+    def warmup(self, tables: list[str]) -> None:
+        """
+        Open clients and load what the first queries on some tables would
+        otherwise pay for (called from the startup warmup, off the event loop)
+
+        Args:
+            tables: Fully qualified names of the tables served by this backend
+        """
+
+    def execute_columns(self, plan: QueryPlan) -> dict:
+        """
+        Execute a plan and return the result column-wise
+
+        Args:
+            plan: Compiled query plan
+
+        Returns:
+            Dict with "columns" (names) and "data" (one value list per column)
+        """
+        raise NotImplementedError
+
+    def execute_many(self, plans: list[QueryPlan]) -> list[dict]:
+        """
+        Execute plans that share one scan_key
+
+        Args:
+            plans: Query plans that all share one scan_key
+
+        Returns:
+            One columnar result per plan, in the same order
+        """
+        return [self.execute_columns(plan) for plan in plans]
+
+    def iter_query(self, plan: QueryPlan, chunk_size: int = 500) -> Iterator[list[dict]]:
+        """
+        Execute a plan and yield result rows page by page
+
+        Args:
+            plan: Compiled query plan
+            chunk_size: Rows per yielded page
+
+        Yields:
+            Lists of result rows as dictionaries
+        """
+        raise NotImplementedError
@@ -0,0 +1,249 @@
+"""
+Structured query plans
+
+Registry entries are compiled once into CompiledDataset objects holding
+typed dimension and measure expressions. A validated explore query is then
+turned into a QueryPlan that execution backends consume directly; SQL text
+is only rendered (QueryPlan.to_sql) for backends that actually need it.
+"""
+from datetime import date
+from typing import Optional
+
+import config
+from constants.datasets import DATASETS_REGISTRY
+from services.local_engine import parse_aggregate
+
+# Registry dimension holding the row date
+DATE_DIMENSION = "dt"
+
+
+class DimensionExpr:
+    """Whitelisted group-by expression"""
+
+    def __init__(self, name: str, sql: str):
+        """
+        Initialize dimension
+
+        Args:
+            name: Dimension key (output column and engine column name)
+            sql: SQL expression from the registry
+        """
+        self.name = name
+        self.sql = sql
+
+
+class MeasureExpr:
+    """Whitelisted aggregate expression, parsed once"""
+
+    def __init__(self, name: str, sql: str):
+        """
+        Initialize measure
+
+        Args:
+            name: Measure key (output column name)
+            sql: SQL aggregate expression from the registry
+
+        Raises:
+            ValueError: If the expression is not a supported aggregate
+        """
+        self.name = name
+        self.sql = sql
+        self.func, self.column = parse_aggregate(sql)
+
+    @property
+    def spec(self) -> tuple[str, str, Optional[str]]:
+        """(alias, function, column) triple consumed by the local engine"""
+        return self.name, self.func, self.column
+
+
+class CompiledDataset:
+    """Table and typed expressions of a dataset (or of one of its rollups)"""
+
+    def __init__(
+        self,
+        dataset_id: str,
+        table: str,
+        dimensions: dict[str, str],
+        measures: dict[str, str],
+        backend: str
+    ):
+        """
+        Compile dimension and measure expressions
+
+        Args:
+            dataset_id: Dataset the table belongs to
+            table: Fully qualified table name
+            dimensions: Dimension key -> SQL expression
+            measures: Measure key -> SQL aggregate expression
+            backend: Name of the backend that executes plans on this table
+        """
+        self.dataset_id = dataset_id
+        self.table = table
+        self.backend = backend
+        self.dimensions = {name: DimensionExpr(name, sql) for name, sql in dimensions.items()}
+        self.measures = {name: MeasureExpr(name, sql) for name, sql in measures.items()}
+        self.date_sql = dimensions[DATE_DIMENSION]
+
+
+class QueryPlan:
+    """Everything a backend needs to run one grouped aggregate"""
+
+    def __init__(
+        self,
+        source: CompiledDataset,
+        dimensions: list[str],
+        measures: list[str],
+        date_from: date,
+        date_to: date,
+        platform: Optional[str] = None,
+        order: str = "asc",
+        limit: Optional[int] = None,
+        order_by: Optional[str] = None,
+        other: bool = False
+    ):
+        """
+        Resolve the plan's expressions against the source table
+
+        Args:
+            source: Compiled dataset or rollup to read
+            dimensions: Dimension keys (the composite group key, in order)
+            measures: Measure keys
+            date_from: Start date (inclusive)
+            date_to: End date (inclusive)
+            platform: Optional platform filter
+            order: Sort order of the group keys ("asc" or "desc")
+            limit: Optional maximum number of groups returned
+            order_by: Measure key to sort by instead of the group keys
+                (ties in ascending group key order)
+            other: Append a remainder row totalling the groups cut off
+                by limit
+        """
+        self.source = source
+        self.dimensions = [source.dimensions[d] for d in dimensions]
+        self.measures = [source.measures[m] for m in measures]
+        self.date_from = date_from
+        self.date_to = date_to
+        self.filters = {"platform": platform} if platform else {}
+        self.order = order
+        self.limit = limit
+        self.order_by = order_by
+        self.other = other
+
+    @property
+    def table(self) -> str:
+        """Table the plan reads"""
+        return self.source.table
+
+    @property
+    def dimension_names(self) -> list[str]:
+        """Output names of the group-by columns"""
+        return [d.name for d in self.dimensions]
+
+    @property
+    def measure_specs(self) -> list[tuple[str, str, Optional[str]]]:
+        """(alias, function, column) triples of the measures"""
+        return [m.spec for m in self.measures]
+
+    @property
+    def scan_key(self) -> tuple:
+        """Rows the plan reads: plans sharing it can share one scan"""
+        return (self.table, self.date_from, self.date_to, tuple(sorted(self.filters.items())))
+
+    @property
+    def statement_key(self) -> tuple:
+        """Everything the rendered SQL depends on (parameters excluded)"""
+        return (
+            self.table,
+            tuple(self.dimension_names),
+            tuple(m.name for m in self.measures),
+            self.order,
+            self.limit,
+            self.order_by,
+            self.other,
+        )
+
+    @property
+    def pushes_remainder(self) -> bool:
+        """Whether to_sql appends the total columns the remainder row is built from"""
+        return self.other and self.limit is not None
+
+    @property
+    def key(self) -> tuple:
+        """Hashable identity of the plan's result"""
+        return self.scan_key + self.statement_key[1:]
+
+    def to_sql(self, table: Optional[str] = None) -> str:
+        """
+        Render the plan as parameterized SQL
+
+        Only whitelisted registry expressions are interpolated; dates and
+        the platform filter stay @parameters.
+
+        Top-N runs in the database: ORDER BY the measure with LIMIT lets it
+        keep only the top groups instead of sorting all of them. For the
+        remainder row, window totals over all groups (evaluated before
+        LIMIT) follow the measures as total_<measure> columns plus a
+        total_groups count; the remainder is those totals minus the
+        returned rows, so the cut-off groups never leave the database.
+
+        Args:
+            table: Table name to render (defaults to the plan's table)
+
+        Returns:
+            SQL query string
+        """
+        columns = (
+            [f"{d.sql} AS {d.name}" for d in self.dimensions]
+            + [f"{m.sql} AS {m.name}" for m in self.measures]
+        )
+        if self.pushes_remainder:
+            columns += [f"SUM({m.sql}) OVER () AS total_{m.name}" for m in self.measures]
+            columns.append("COUNT(*) OVER () AS total_groups")
+        select = ",\n            ".join(columns)
+        group_by = ", ".join(self.dimension_names)
+        if self.order_by is None:
+            order_by = ", ".join(f"{d.name} {self.order.upper()}" for d in self.dimensions)
+        else:
+            order_by = ", ".join(
+                [f"{self.order_by} {self.order.upper()}"] + [f"{d.name} ASC" for d in self.dimensions]
+            )
+
+        sql = f"""
+        SELECT
+            {select}
+        FROM `{table or self.table}`
+        WHERE {self.source.date_sql} BETWEEN @date_from AND @date_to
+            AND (@platform IS NULL OR platform = @platform)
+        GROUP BY {group_by}
+        ORDER BY {order_by}
+        """
+        if self.limit is not None:
+            sql += f"LIMIT {self.limit}\n"
+
+        return sql.strip()
+
+
+def compile_registry(registry: dict) -> dict[str, CompiledDataset]:
+    """
+    Compile every registry entry
+
+    Args:
+        registry: Dataset ID -> dataset configuration
+
+    Returns:
+        Dataset ID -> CompiledDataset
+    """
+    return {
+        dataset_id: CompiledDataset(
+            dataset_id,
+            dataset["table"],
+            dataset["dimensions"],
+            dataset["measures"],
+            dataset.get("backend", config.DEFAULT_QUERY_BACKEND)
+        )
+        for dataset_id, dataset in registry.items()
+    }
+
+
+# Compiled once at startup
+COMPILED_DATASETS = compile_registry(DATASETS_REGISTRY)
@@ -1,121 +1,423 @@
 """
 Query business logic service
 """
-from datetime import date
-from typing import Optional
+from typing import Generator, Union
 import logging
+import time
 
-from schemas.query_schema import ExploreQuery, QueryResponse
+from fastapi import HTTPException, status
+
+import config
+
+from schemas.query_schema import ExploreQuery
 from core.security import (
     validate_dataset_exists,
     validate_dimension,
     validate_measure,
     validate_query
 )
-from services.bigquery_service import bigquery_service
+from services.backends import get_backend
+from services.data_version_service import data_version_service
+from services.query_plan import COMPILED_DATASETS, QueryPlan
+from services.rollup_service import rollup_service, MERGEABLE_AGGREGATES
+from services.partial_aggregate_service import partial_aggregate_service
 from constants.datasets import DATASETS_REGISTRY
+from utils.cache import LRUCache
+from utils.columnar import iter_row_chunks
+from utils.metrics import QUERY_DURATION, QUERY_ERRORS, QUERY_ROWS
+from utils.shared_cache import SharedCache, TieredCache
+from utils.singleflight import SingleFlight
+from utils.tracing import stage
 
 logger = logging.getLogger(__name__)
 
+# Result cache shared by all requests in this process
+local_result_cache = LRUCache(
+    max_bytes=config.QUERY_CACHE_MAX_BYTES,
+    default_ttl=config.QUERY_CACHE_DEFAULT_TTL
+)
+
+# Host-wide cache behind it, shared with the other worker processes
+shared_result_cache = SharedCache(
+    path=config.SHARED_CACHE_PATH,
+    max_bytes=config.SHARED_CACHE_MAX_BYTES,
+    default_ttl=config.QUERY_CACHE_DEFAULT_TTL,
+    busy_timeout=config.SHARED_CACHE_BUSY_TIMEOUT_MS / 1000,
+    pool_size=config.QUERY_MAX_WORKERS
+) if config.SHARED_CACHE_ENABLED else None
+
+result_cache = (
+    TieredCache(local_result_cache, shared_result_cache)
+    if shared_result_cache is not None else local_result_cache
+)
+
+# Identical queries running at the same time share one execution
+inflight_queries = SingleFlight()
+
+
+class ScanGroup:
+    """Batch queries that can be answered by one shared scan"""
+    
+    def __init__(self, scan_key: tuple):
+        """
+        Initialize an empty group
+        
+        Args:
+            scan_key: QueryPlan.scan_key shared by every member
+        """
+        self.scan_key = scan_key
+        self.table = scan_key[0]
+        # cache key -> (plan, cache ttl, positions in the batch)
+        self.members: dict[tuple, tuple[QueryPlan, int, list[int]]] = {}
+
 
 class QueryService:
     """Service for query operations"""
     
     @staticmethod
-    def build_sql(
-        dataset_config: dict,
-        dimension: str,
-        measure: str,
-        date_from: date,
-        date_to: date,
-        platform: Optional[str] = None,
-        limit: int = 500,
-        order: str = "asc"
-    ) -> str:
-        """
-        Build safe SQL query from validated parameters
+    def cache_key(query: ExploreQuery) -> tuple:
+        """
+        Build normalized result cache key for a query
+        
+        The dataset's data version is part of the key, so results cached
+        before a data load are never served after it.
         
         Args:
-            dataset_config: Dataset configuration
-            dimension: Dimension key
-            measure: Measure key
-            date_from: Start date
-            date_to: End date
-            platform: Optional platform filter
-            limit: Row limit
-            order: Sort order
+            query: ExploreQuery request payload
         
         Returns:
-            SQL query string
-        """
-        dim_expr = dataset_config["dimensions"][dimension]
-        meas_expr = dataset_config["measures"][measure]
-        table = dataset_config["table"]
-        
-        # Build SQL safely (only using whitelisted expressions)
-        sql = f"""
-        SELECT
-            {dim_expr} AS {dimension},
-            {meas_expr} AS {measure}
-        FROM `{table}`
-        WHERE {dim_expr} BETWEEN @date_from AND @date_to
-            AND (@platform IS NULL OR platform = @platform)
-        GROUP BY {dimension}
-        ORDER BY {dimension} {order.upper()}
-        LIMIT {limit}
-        """
-        
-        return sql.strip()
+            Hashable tuple identifying the query result
+        """
+        return (
+            query.dataset_id,
+            data_version_service.version(query.dataset_id),
+            tuple(query.dimensions),
+            tuple(query.measures),
+            query.date_from,
+            query.date_to,
+            query.platform or None,
+            query.limit,
+            query.order,
+            query.order_by,
+            query.include_other,
+        )
     
     @staticmethod
-    def execute_query(query: ExploreQuery) -> QueryResponse:
+    def validate(query: ExploreQuery) -> dict:
         """
-        Execute a complete explore query
+        Validate a query against the dataset whitelist
         
         Args:
             query: ExploreQuery request payload
         
         Returns:
-            QueryResponse with result rows
+            Dataset configuration
         
         Raises:
             HTTPException: If validation fails
         """
-        # Validate query
-        validate_query(query)
+        with stage("validate"):
+            # Validate query
+            validate_query(query)
+            
+            # Validate dataset
+            dataset = validate_dataset_exists(query.dataset_id)
+            
+            # Validate every dimension and measure against the whitelist
+            for dimension in query.dimensions:
+                validate_dimension(dataset, dimension)
+            for measure in query.measures:
+                validate_measure(dataset, measure)
+            
+            # The remainder row adds up the cut-off groups' measures
+            if query.include_other:
+                compiled = COMPILED_DATASETS[query.dataset_id]
+                for measure in query.measures:
+                    if compiled.measures[measure].func not in MERGEABLE_AGGREGATES:
+                        raise HTTPException(
+                            status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"include_other needs SUM or COUNT measures; '{measure}' is not one"
+                        )
         
-        # Validate dataset
-        dataset = validate_dataset_exists(query.dataset_id)
+        return dataset
+    
+    @staticmethod
+    def plan(query: ExploreQuery) -> QueryPlan:
+        """
+        Plan a validated query against the cheapest table able to answer it
         
-        # Validate dimension and get safe expression
-        validate_dimension(dataset, query.dimension)
+        Args:
+            query: Validated ExploreQuery
         
-        # Validate measure and get safe expression
-        validate_measure(dataset, query.measure)
+        Returns:
+            QueryPlan over the compiled dataset or its smallest covering rollup
+        """
+        with stage("plan"):
+            source = rollup_service.route(
+                source=COMPILED_DATASETS[query.dataset_id],
+                dimensions=query.dimensions,
+                measures=query.measures,
+                platform=query.platform
+            )
         
-        # Build SQL
-        sql = QueryService.build_sql(
-            dataset_config=dataset,
-            dimension=query.dimension,
-            measure=query.measure,
+        return QueryPlan(
+            source=source,
+            dimensions=query.dimensions,
+            measures=query.measures,
             date_from=query.date_from,
             date_to=query.date_to,
             platform=query.platform,
+            order=query.order,
             limit=query.limit,
-            order=query.order
+            order_by=query.order_by,
+            other=query.include_other
         )
+    
+    @staticmethod
+    def execute_columns(query: ExploreQuery, store: bool = True) -> dict:
+        """
+        Execute a complete explore query and return the result column-wise
         
-        logger.info(f"Executing query for dataset={query.dataset_id}, dim={query.dimension}, meas={query.measure}")
+        Args:
+            query: ExploreQuery request payload
+            store: Whether to write the result to the result cache (False
+                for results kept elsewhere, such as paginated full results)
         
-        # Execute query
-        rows = bigquery_service.execute_query(
-            sql=sql,
-            date_from=query.date_from,
-            date_to=query.date_to,
-            platform=query.platform
+        Returns:
+            Dict with "columns" (names) and "data" (one value list per column)
+        
+        Raises:
+            HTTPException: If validation fails
+        """
+        # Only validated queries are ever stored, so a hit can skip validation
+        key = QueryService.cache_key(query)
+        if config.QUERY_CACHE_ENABLED:
+            result = result_cache.get(key)
+            if result is not None:
+                logger.info("Cache hit", extra={
+                    "dataset": query.dataset_id, "dimensions": query.dimensions, "measures": query.measures
+                })
+                return result
+        
+        return inflight_queries.do(key, lambda: QueryService._run_query(query, key, store))
+    
+    @staticmethod
+    def _run_query(query: ExploreQuery, key: tuple, store: bool = True) -> dict:
+        """
+        Validate, build and execute a query, then cache its result
+        
+        Args:
+            query: ExploreQuery request payload
+            key: Normalized cache key for the query
+            store: Whether to write the result to the result cache
+        
+        Returns:
+            Columnar result
+        
+        Raises:
+            HTTPException: If validation fails
+        """
+        # A flight that just finished may already have stored the result
+        if config.QUERY_CACHE_ENABLED:
+            result = result_cache.get(key, record_stats=False)
+            if result is not None:
+                return result
+        
+        dataset = QueryService.validate(query)
+        
+        logger.info("Executing query", extra={
+            "dataset": query.dataset_id, "dimensions": query.dimensions, "measures": query.measures
+        })
+        
+        start = time.perf_counter()
+        try:
+            with stage("execute"):
+                if config.PARTIAL_CACHE_ENABLED and partial_aggregate_service.supports(query):
+                    # Reuse cached per-day partials and fetch only the missing days
+                    result = partial_aggregate_service.execute(query)
+                else:
+                    result = QueryService._execute_direct(query)
+        except Exception as e:
+            QUERY_ERRORS.inc(dataset=query.dataset_id, type=type(e).__name__)
+            raise
+        QueryService._observe(
+            query.dataset_id, query.dimensions, query.measures, time.perf_counter() - start, result
+        )
+        
+        if config.QUERY_CACHE_ENABLED and store:
+            result_cache.set(
+                key,
+                result,
+                ttl=dataset.get("cache_ttl", config.QUERY_CACHE_DEFAULT_TTL)
+            )
+        
+        return result
+    
+    @staticmethod
+    def _observe(
+        dataset_id: str,
+        dimensions: list[str],
+        measures: list[str],
+        seconds: float,
+        result: dict
+    ) -> None:
+        """Record an execution's duration and row count in metrics and logs"""
+        QUERY_DURATION.observe(
+            seconds,
+            dataset=dataset_id,
+            dimension=",".join(dimensions),
+            measure=",".join(measures)
         )
+        data = result["data"]
+        rows = len(data[0]) if data else 0
+        QUERY_ROWS.observe(rows, dataset=dataset_id)
+        logger.info("Query executed", extra={
+            "dataset": dataset_id,
+            "dimensions": dimensions,
+            "measures": measures,
+            "duration_ms": round(seconds * 1000, 2),
+            "rows": rows,
+        })
+    
+    @staticmethod
+    def prepare_batch(
+        queries: list[Union[ExploreQuery, HTTPException]]
+    ) -> tuple[list[Union[dict, HTTPException, None]], list[ScanGroup]]:
+        """
+        Resolve what a batch can answer immediately and group the rest by scan
+        
+        Cached results and validation errors are filled in directly. The
+        remaining queries are planned (rollups included) and grouped by
+        QueryPlan.scan_key; identical queries share one slot.
+        
+        Args:
+            queries: Batch of ExploreQuery payloads; an HTTPException entry
+                (a query rejected before planning) is reported as is
+        
+        Returns:
+            Tuple of (results, groups): results holds a columnar result,
+            an HTTPException, or None for positions answered by a group
+        """
+        results: list[Union[dict, HTTPException, None]] = [None] * len(queries)
+        groups: dict[tuple, ScanGroup] = {}
+        
+        for position, query in enumerate(queries):
+            if isinstance(query, HTTPException):
+                results[position] = query
+                continue
+            
+            key = QueryService.cache_key(query)
+            if config.QUERY_CACHE_ENABLED:
+                cached = result_cache.get(key)
+                if cached is not None:
+                    results[position] = cached
+                    continue
+            
+            try:
+                dataset = QueryService.validate(query)
+            except HTTPException as e:
+                results[position] = e
+                continue
+            
+            plan = QueryService.plan(query)
+            group = groups.get(plan.scan_key)
+            if group is None:
+                group = groups[plan.scan_key] = ScanGroup(plan.scan_key)
+            
+            if key not in group.members:
+                ttl = dataset.get("cache_ttl", config.QUERY_CACHE_DEFAULT_TTL)
+                group.members[key] = (plan, ttl, [])
+            group.members[key][2].append(position)
+        
+        return results, list(groups.values())
+    
+    @staticmethod
+    def execute_scan_group(group: ScanGroup) -> dict[int, dict]:
+        """
+        Execute every query of a scan group with one backend scan
+        
+        Args:
+            group: Group built by prepare_batch
+        
+        Returns:
+            Columnar result per batch position
+        """
+        logger.info("Executing batched queries", extra={"table": group.table, "queries": len(group.members)})
         
-        return QueryResponse(rows=rows)
+        members = list(group.members.items())
+        plans = [plan for _, (plan, _, _) in members]
+        dataset_id = plans[0].source.dataset_id
+        start = time.perf_counter()
+        try:
+            with stage("execute"):
+                results = get_backend(plans[0].source.backend).execute_many(plans)
+        except Exception as e:
+            QUERY_ERRORS.inc(dataset=dataset_id, type=type(e).__name__)
+            raise
+        elapsed = time.perf_counter() - start
+        
+        by_position = {}
+        for (key, (plan, ttl, positions)), result in zip(members, results):
+            # Every member is charged the shared scan's duration
+            QueryService._observe(
+                dataset_id, plan.dimension_names, [m.name for m in plan.measures], elapsed, result
+            )
+            if config.QUERY_CACHE_ENABLED:
+                result_cache.set(key, result, ttl=ttl)
+            for position in positions:
+                by_position[position] = result
+        return by_position
+    
+    @staticmethod
+    def stream_query(
+        query: ExploreQuery,
+        chunk_size: int = config.QUERY_STREAM_CHUNK_ROWS
+    ) -> Generator[list[dict], None, None]:
+        """
+        Validate a query and return a generator over its rows in chunks
+        
+        Validation runs immediately so errors surface before streaming
+        starts; rows are produced lazily by the backend and are not
+        collected into the result cache.
+        
+        Args:
+            query: ExploreQuery request payload
+            chunk_size: Rows per chunk
+        
+        Returns:
+            Generator of row lists (closing it releases the backend's
+            connection or result iterator)
+        
+        Raises:
+            HTTPException: If validation fails
+        """
+        if config.QUERY_CACHE_ENABLED:
+            result = result_cache.get(QueryService.cache_key(query))
+            if result is not None:
+                return iter_row_chunks(result, chunk_size)
+        
+        QueryService.validate(query)
+        
+        logger.info("Streaming query", extra={
+            "dataset": query.dataset_id, "dimensions": query.dimensions, "measures": query.measures
+        })
+        
+        plan = QueryService.plan(query)
+        return get_backend(plan.source.backend).iter_query(plan, chunk_size=chunk_size)
+    
+    @staticmethod
+    def _execute_direct(query: ExploreQuery) -> dict:
+        """
+        Execute a validated query as a single backend query
+        
+        Args:
+            query: Validated ExploreQuery
+        
+        Returns:
+            Columnar result
+        """
+        plan = QueryService.plan(query)
+        return get_backend(plan.source.backend).execute_columns(plan)
 
 
 # Singleton instance
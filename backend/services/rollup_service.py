@@ -0,0 +1,199 @@
+"""
+Rollup maintenance and query routing
+
+A rollup is a (day x dimensions) pre-aggregate of a dataset's fact table.
+SUM and COUNT measures merge by summing, so any query whose group-by and
+filter columns are contained in a rollup can be answered from it instead
+of scanning the raw table.
+"""
+from typing import Optional
+import logging
+import threading
+
+import config
+from constants.datasets import DATASETS_REGISTRY
+from services.backends import get_backend
+from services.local_engine import local_engine, parse_aggregate
+from services.query_plan import COMPILED_DATASETS, CompiledDataset
+
+logger = logging.getLogger(__name__)
+
+# Aggregates whose partial results can be merged with SUM
+MERGEABLE_AGGREGATES = {"SUM", "COUNT"}
+
+
+class Rollup:
+    """Pre-aggregated table for one dataset"""
+
+    def __init__(
+        self,
+        dataset_id: str,
+        table: str,
+        dimensions: tuple[str, ...],
+        measures: list[str],
+        num_rows: int
+    ):
+        """
+        Initialize rollup metadata and compile its expressions
+
+        Args:
+            dataset_id: Dataset the rollup belongs to
+            table: Rollup table name
+            dimensions: Non-date columns kept in the rollup
+            measures: Registry measure keys stored in the rollup
+            num_rows: Number of rows in the rollup
+        """
+        self.dataset_id = dataset_id
+        self.table = table
+        self.dimensions = dimensions
+        self.measures = measures
+        self.num_rows = num_rows
+        self.compiled = CompiledDataset(
+            dataset_id,
+            table,
+            dimensions={d: d for d in ("dt", *dimensions)},
+            # Partial SUMs and COUNTs both merge by summing
+            measures={m: f"SUM({m})" for m in measures},
+            backend=COMPILED_DATASETS[dataset_id].backend
+        )
+
+    def covers(self, columns: set[str], measures: list[str]) -> bool:
+        """Whether the rollup holds every needed column and measure"""
+        return columns <= {"dt", *self.dimensions} and set(measures) <= set(self.measures)
+
+
+class RollupService:
+    """Builds rollups per dataset and picks the cheapest table for a query"""
+
+    def __init__(self):
+        """Initialize with no rollups built (they are built on first use)"""
+        self._rollups: dict[str, list[Rollup]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def definitions(dataset: dict) -> list[tuple[str, ...]]:
+        """
+        Rollup column sets for a dataset
+
+        Uses the registry's optional "rollups" key; otherwise builds a
+        day-only rollup plus day x dimension and, so platform-filtered
+        queries stay covered, day x dimension x platform.
+
+        Args:
+            dataset: Dataset configuration
+
+        Returns:
+            List of non-date column tuples, one per rollup
+        """
+        if "rollups" in dataset:
+            return [tuple(columns) for columns in dataset["rollups"]]
+
+        dimensions = [d for d in dataset["dimensions"] if d != "dt"]
+        definitions = [()]
+        for dimension in dimensions:
+            definitions.append((dimension,))
+            if dimension != "platform" and "platform" in dimensions:
+                definitions.append((dimension, "platform"))
+        return definitions
+
+    @staticmethod
+    def mergeable_measures(dataset: dict) -> list[str]:
+        """Registry measure keys that can be pre-aggregated"""
+        return [
+            measure for measure, expr in dataset["measures"].items()
+            if parse_aggregate(expr)[0] in MERGEABLE_AGGREGATES
+        ]
+
+    def _build(self, dataset_id: str) -> list[Rollup]:
+        """Build every rollup of a dataset in the local engine"""
+        dataset = DATASETS_REGISTRY[dataset_id]
+        compiled = COMPILED_DATASETS[dataset_id]
+        measures = self.mergeable_measures(dataset)
+        if not measures:
+            return []
+
+        rollups = []
+        for dimensions in self.definitions(dataset):
+            name = "__".join([dataset["table"], "rollup", "dt", *dimensions])
+            table = local_engine.build_rollup(
+                source_name=dataset["table"],
+                rollup_name=name,
+                dimensions=list(dimensions),
+                measures=[compiled.measures[m].spec for m in measures]
+            )
+            rollups.append(Rollup(dataset_id, name, dimensions, measures, table.num_rows))
+
+        # Smallest first, so routing takes the first rollup that covers
+        rollups.sort(key=lambda r: r.num_rows)
+        return rollups
+
+    def get_rollups(self, dataset_id: str) -> list[Rollup]:
+        """
+        Rollups of a dataset, building them on first use
+
+        Args:
+            dataset_id: Dataset ID
+
+        Returns:
+            Rollups sorted by row count (smallest first)
+        """
+        rollups = self._rollups.get(dataset_id)
+        if rollups is not None:
+            return rollups
+
+        with self._lock:
+            if dataset_id not in self._rollups:
+                self._rollups[dataset_id] = self._build(dataset_id)
+            return self._rollups[dataset_id]
+
+    def refresh(self, dataset_id: str) -> None:
+        """
+        Rebuild the rollups of a dataset after its fact table changed
+
+        Args:
+            dataset_id: Dataset ID
+        """
+        rollups = self._build(dataset_id)
+        with self._lock:
+            self._rollups[dataset_id] = rollups
+
+    def route(
+        self,
+        source: CompiledDataset,
+        dimensions: list[str],
+        measures: list[str],
+        platform: Optional[str] = None
+    ) -> dict:
+        """
+        Pick the smallest table able to answer a query
+
+        Args:
+            source: Compiled dataset the query targets
+            dimensions: Dimension keys to group by
+            measures: Measure keys to aggregate
+            platform: Optional platform filter
+
+        Returns:
+            Compiled table to plan against: either the source itself or
+            an equivalent rollup
+        """
+        if not config.ROLLUPS_ENABLED or not get_backend(source.backend).supports_rollups:
+            return source
+
+        columns = {*dimensions, "platform"} if platform else set(dimensions)
+        raw_rows = local_engine.get_table(source.table).num_rows
+
+        for rollup in self.get_rollups(source.dataset_id):
+            if rollup.num_rows >= raw_rows:
+                break
+            if rollup.covers(columns, measures):
+                logger.info("Routing query to rollup", extra={
+                    "dataset": source.dataset_id, "table": rollup.table, "rollup_rows": rollup.num_rows
+                })
+                return rollup.compiled
+
+        return source
+
+
+# Singleton instance
+rollup_service = RollupService()
@@ -0,0 +1,277 @@
+"""
+Embedded SQLite backend
+
+Runs query plans against a local SQLite file holding the fact tables
+(on-prem installs, CI). Tables are addressed by the last part of the
+registry's qualified name, so `project.dataset.fact_orders` reads
+`fact_orders`. Connections are pooled and opened read-only; each keeps a
+prepared-statement cache, and rendered SQL is reused per plan shape, so a
+repeated query only binds @date_from/@date_to/@platform and steps.
+
+Reseeding replaces the file rather than rewriting it, and open connections
+would keep reading the old, unlinked one. Every query checks the file's
+identity (inode and modification time) and resets the pool when it
+changed, so the rows served always match the data version.
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import logging
+import os
+import sqlite3
+import threading
+
+import config
+from services.query_backend import QueryBackend
+from services.query_plan import QueryPlan
+from utils.connection_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteService(QueryBackend):
+    """Service for embedded SQLite operations"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, pool_size: int, statement_cache_size: int):
+        """
+        Initialize service (connections are opened on first use)
+
+        Args:
+            path: SQLite database file
+            pool_size: Maximum number of open connections
+            statement_cache_size: Prepared statements cached per connection
+        """
+        self.path = path
+        self.statement_cache_size = statement_cache_size
+        self.pool = ConnectionPool(self._connect, pool_size)
+        self._statements: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        # (inode, mtime) of the file the pooled connections were opened on
+        self._file: Optional[tuple[int, int]] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a read-only connection usable from any worker thread"""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"SQLite database '{self.path}' not found")
+        return sqlite3.connect(
+            f"file:{self.path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+
+    def _identity(self) -> Optional[tuple[int, int]]:
+        """(inode, mtime) of the database file, or None if it is missing"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection to the current database file"""
+        identity = self._identity()
+        if identity != self._file:
+            with self._lock:
+                if identity != self._file:
+                    if self._file is not None:
+                        logger.info("SQLite database replaced, reopening connections", extra={"path": self.path})
+                        self.pool.reset()
+                    self._file = identity
+        with self.pool.connection() as connection:
+            yield connection
+
+    def data_version(self, table: str) -> Optional[str]:
+        """
+        Watermark of the database file (rewritten by every reseed)
+
+        Args:
+            table: Fully qualified table name (all tables share the file)
+
+        Returns:
+            File inode, modification time and size, or None if the file is
+            missing
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def warmup(self, tables: list[str]) -> None:
+        """
+        Open the first pooled connection (skipped if the file is missing)
+
+        Args:
+            tables: Fully qualified table names (all tables share the file)
+        """
+        if not os.path.exists(self.path):
+            return
+        with self._connection():
+            pass
+
+    def _statement(self, plan: QueryPlan) -> str:
+        """SQL for a plan, rendered once per statement shape"""
+        key = plan.statement_key
+        sql = self._statements.get(key)
+        if sql is None:
+            sql = plan.to_sql(table=plan.table.rsplit(".", 1)[-1])
+            with self._lock:
+                self._statements[key] = sql
+        return sql
+
+    @staticmethod
+    def _parameters(plan: QueryPlan) -> dict:
+        """Values bound to the plan's @parameters"""
+        return {
+            "date_from": plan.date_from.isoformat(),
+            "date_to": plan.date_to.isoformat(),
+            "platform": plan.filters.get("platform"),
+        }
+
+    @staticmethod
+    def _fetch(cursor: sqlite3.Cursor, plan: QueryPlan, chunk_size: Optional[int] = None) -> Iterator[list[tuple]]:
+        """
+        Fetch result rows in chunks, folding pushed-down totals into a remainder row
+
+        Args:
+            cursor: Cursor of the executed statement
+            plan: Plan the statement was rendered from
+            chunk_size: Rows per chunk (None for a single chunk)
+
+        Yields:
+            Lists of (dimensions..., measures...) row tuples; with
+            plan.pushes_remainder the last one holds the remainder row if
+            groups were cut off
+        """
+        num_dimensions = len(plan.dimensions)
+        width = num_dimensions + len(plan.measures)
+        # Sums of the returned rows, subtracted from the all-group totals
+        returned = [0] * len(plan.measures)
+        totals = None
+        count = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size) if chunk_size else cursor.fetchall()
+            if not rows:
+                break
+            if plan.pushes_remainder:
+                totals = rows[0][width:]
+                for row in rows:
+                    for i, value in enumerate(row[num_dimensions:width]):
+                        returned[i] += value
+                count += len(rows)
+                rows = [row[:width] for row in rows]
+            yield rows
+
+        # totals ends with total_groups
+        if totals is not None and totals[-1] > count:
+            yield [(
+                *[config.QUERY_OTHER_LABEL] * num_dimensions,
+                *(total - value for total, value in zip(totals, returned))
+            )]
+
+    @staticmethod
+    def _round(values: list) -> list:
+        """Round float aggregates to 2 decimals like the other backends"""
+        return [round(v, 2) if isinstance(v, float) else v for v in values]
+
+    def execute_columns(self, plan: QueryPlan) -> dict:
+        """
+        Execute a plan and return the result column-wise
+
+        Args:
+            plan: Compiled query plan
+
+        Returns:
+            Dict with "columns" (names) and "data" (one value list per column)
+
+        Raises:
+            Exception: If the SQLite query fails
+        """
+        columns = plan.dimension_names + [m.name for m in plan.measures]
+        try:
+            logger.info("Executing SQLite query", extra={
+                "table": plan.table, "date_from": plan.date_from, "date_to": plan.date_to, "filters": plan.filters
+            })
+
+            with self._connection() as connection:
+                cursor = connection.execute(self._statement(plan), self._parameters(plan))
+                rows = [row for chunk in self._fetch(cursor, plan) for row in chunk]
+
+            data = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+            for i in range(len(plan.dimensions), len(columns)):
+                data[i] = self._round(data[i])
+
+            logger.info("SQLite query returned", extra={"rows": len(rows)})
+            return {"columns": columns, "data": data}
+
+        except Exception as e:
+            logger.error("SQLite error", extra={"error": str(e)})
+            raise
+
+    def execute_many(self, plans: list[QueryPlan]) -> list[dict]:
+        """
+        Execute plans that share one scan_key on a single connection
+
+        SQLite has no GROUPING SETS, so each plan runs its own statement;
+        they still share the connection and its statement cache.
+
+        Args:
+            plans: Query plans that all share one scan_key
+
+        Returns:
+            One columnar result per plan, in the same order
+
+        Raises:
+            Exception: If the SQLite query fails
+        """
+        return [self.execute_columns(plan) for plan in plans]
+
+    def iter_query(self, plan: QueryPlan, chunk_size: int = 500) -> Iterator[list[dict]]:
+        """
+        Execute a plan and yield result rows page by page
+
+        The pooled connection is held until the last page is read (or the
+        generator is closed).
+
+        Args:
+            plan: Compiled query plan
+            chunk_size: Rows per yielded page
+
+        Yields:
+            Lists of result rows as dictionaries
+
+        Raises:
+            Exception: If the SQLite query fails
+        """
+        columns = plan.dimension_names + [m.name for m in plan.measures]
+        num_dimensions = len(plan.dimensions)
+        try:
+            logger.info("Streaming SQLite query", extra={
+                "table": plan.table, "date_from": plan.date_from, "date_to": plan.date_to, "filters": plan.filters
+            })
+
+            with self._connection() as connection:
+                cursor = connection.execute(self._statement(plan), self._parameters(plan))
+                try:
+                    for rows in self._fetch(cursor, plan, chunk_size):
+                        yield [
+                            dict(zip(columns, [*row[:num_dimensions], *self._round(row[num_dimensions:])]))
+                            for row in rows
+                        ]
+                finally:
+                    cursor.close()
+
+        except Exception as e:
+            logger.error("SQLite error", extra={"error": str(e)})
+            raise
+
+
+# Singleton instance
+sqlite_service = SQLiteService(
+    path=config.SQLITE_DATABASE_PATH,
+    pool_size=config.SQLITE_POOL_SIZE,
+    statement_cache_size=config.SQLITE_STATEMENT_CACHE_SIZE
+)
@@ -0,0 +1,180 @@
+"""
+Startup phases, background warmup and readiness
+
+The app's lifespan records how long each startup phase took (module
+imports, logging setup) and then starts the warmup in the background:
+every dataset's backend opens its client and loads its tables and the
+dataset's rollups are built, all datasets in parallel on the query
+executor, followed by the configured hot queries whose results land in
+the result cache. Requests are served throughout; anything not warmed
+yet is still built on first use.
+"""
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Any, Callable, Iterator, Optional
+import asyncio
+import logging
+import time
+
+import config
+from schemas.query_schema import ExploreQuery
+from services.backends import get_backend
+from services.query_plan import COMPILED_DATASETS
+from services.query_service import query_service
+from services.rollup_service import rollup_service
+from utils.executor import query_executor
+
+logger = logging.getLogger(__name__)
+
+# Executor tenant of warmup work, queued fairly next to real share tokens
+WARMUP_TENANT = "__warmup__"
+
+
+class StartupService:
+    """Tracks startup phases and runs the background warmup"""
+
+    def __init__(self, warmup_queries: list[dict], ready_after_warmup: bool):
+        """
+        Initialize service
+
+        Args:
+            warmup_queries: Explore query payloads to pre-cache ("days": N
+                stands in for date_from/date_to ending today)
+            ready_after_warmup: Report ready only once the warmup finished
+        """
+        self.warmup_queries = warmup_queries
+        self.ready_after_warmup = ready_after_warmup
+        # Phase name -> {"status", "duration_ms"}, in completion order
+        self.phases: dict[str, dict] = {}
+        self.started = False
+        self.warm = False
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, name: str, seconds: float, status: str = "ok") -> None:
+        """
+        Record a finished phase
+
+        Args:
+            name: Phase name
+            seconds: Phase duration
+            status: "ok" or "failed"
+        """
+        self.phases[name] = {"status": status, "duration_ms": round(seconds * 1000, 2)}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block as a startup phase
+
+        Args:
+            name: Phase name
+        """
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self.record(name, time.perf_counter() - start, status)
+
+    @property
+    def ready(self) -> bool:
+        """Whether the app should receive traffic"""
+        return self.started and (self.warm or not self.ready_after_warmup)
+
+    def report(self) -> dict:
+        """
+        Readiness and phase timings
+
+        Returns:
+            Dict with ready, warm and phases
+        """
+        return {"ready": self.ready, "warm": self.warm, "phases": dict(self.phases)}
+
+    @staticmethod
+    def _warm_dataset(dataset_id: str) -> None:
+        """Load a dataset's table in its backend and build its rollups"""
+        compiled = COMPILED_DATASETS[dataset_id]
+        backend = get_backend(compiled.backend)
+        backend.warmup([compiled.table])
+        if config.ROLLUPS_ENABLED and backend.supports_rollups:
+            rollup_service.get_rollups(dataset_id)
+
+    @staticmethod
+    def hot_query(payload: dict) -> ExploreQuery:
+        """
+        Build a warmup query, resolving "days" to a range ending today
+
+        Args:
+            payload: Explore query payload, optionally with "days"
+
+        Returns:
+            ExploreQuery
+        """
+        payload = dict(payload)
+        days = payload.pop("days", None)
+        if days is not None:
+            today = date.today()
+            payload["date_from"] = today - timedelta(days=int(days) - 1)
+            payload["date_to"] = today
+        return ExploreQuery(**payload)
+
+    async def _step(self, name: str, slots: asyncio.Semaphore, fn: Callable[..., Any], *args: Any) -> None:
+        """Run one warmup step on the executor; failures are logged, not raised"""
+        async with slots:
+            try:
+                with self.phase(name):
+                    await query_executor.run(fn, *args, tenant=WARMUP_TENANT)
+            except Exception:
+                logger.exception("Warmup step failed", extra={"phase": name})
+
+    async def _warmup(self) -> None:
+        """Warm every dataset in parallel, then run the hot queries"""
+        # Never queue more steps than the executor accepts per tenant
+        slots = asyncio.Semaphore(query_executor.max_queue_per_tenant)
+        with self.phase("warmup"):
+            await asyncio.gather(*(
+                self._step(f"warmup.{dataset_id}", slots, self._warm_dataset, dataset_id)
+                for dataset_id in COMPILED_DATASETS
+            ))
+            steps = []
+            for position, payload in enumerate(self.warmup_queries):
+                try:
+                    query = self.hot_query(payload)
+                except (TypeError, ValueError) as e:
+                    logger.warning("Skipping invalid warmup query", extra={"position": position, "error": str(e)})
+                    continue
+                steps.append(self._step(f"warmup.query.{position}", slots, query_service.execute_columns, query))
+            await asyncio.gather(*steps)
+        self.warm = True
+        logger.info("Warmup complete", extra={"phases": dict(self.phases)})
+
+    def start(self, warmup: bool) -> None:
+        """
+        Mark startup as done and start the background warmup
+
+        Args:
+            warmup: Whether to warm up (otherwise the app counts as warm)
+        """
+        self.started = True
+        if warmup:
+            self._task = asyncio.create_task(self._warmup())
+        else:
+            self.warm = True
+
+    async def stop(self) -> None:
+        """Cancel a warmup still in progress"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+# Singleton instance
+startup_service = StartupService(
+    warmup_queries=config.WARMUP_QUERIES,
+    ready_after_warmup=config.READY_AFTER_WARMUP
+)
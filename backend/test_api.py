@@ -98,6 +98,110 @@ async def test_execute_query():
             return False
 
 
+async def test_execute_query_stream():
+    """Test execute query endpoint in NDJSON streaming mode"""
+    print("\n✓ Testing Execute Query (NDJSON stream)...")
+    
+    today = date.today()
+    month_ago = today - timedelta(days=29)
+    
+    query_payload = {
+        "dataset_id": "orders",
+        "dimension": "product_name",
+        "measure": "revenue",
+        "date_from": month_ago.isoformat(),
+        "date_to": today.isoformat(),
+        "limit": 5000,
+        "order": "asc"
+    }
+    
+    async with httpx.AsyncClient() as client:
+        async with client.stream(
+            "POST",
+            f"{BASE_URL}/share/{TEST_TOKEN}/query",
+            json=query_payload,
+            headers={"Accept": "application/x-ndjson"}
+        ) as resp:
+            print(f"  Status: {resp.status_code}")
+            if resp.status_code != 200:
+                print(f"  Error: {await resp.aread()}")
+                return False
+            rows = 0
+            async for line in resp.aiter_lines():
+                if line:
+                    rows += 1
+            print(f"  Rows streamed: {rows}")
+            return True
+
+
+async def test_execute_batch():
+    """Test batch query endpoint"""
+    print("\n✓ Testing Batch Query...")
+    
+    today = date.today()
+    week_ago = today - timedelta(days=6)
+    
+    base = {
+        "dataset_id": "orders",
+        "date_from": week_ago.isoformat(),
+        "date_to": today.isoformat(),
+    }
+    queries = [
+        {**base, "dimension": "dt", "measure": "revenue"},
+        {**base, "dimension": "dt", "measure": "orders"},
+        {**base, "dimension": "platform", "measure": "revenue"},
+        {**base, "dimension": "invalid", "measure": "revenue"},
+    ]
+    
+    async with httpx.AsyncClient() as client:
+        resp = await client.post(
+            f"{BASE_URL}/share/{TEST_TOKEN}/queries",
+            json=queries
+        )
+        print(f"  Status: {resp.status_code}")
+        if resp.status_code != 200:
+            print(f"  Error: {resp.text}")
+            return False
+        for query, result in zip(queries, resp.json()["results"]):
+            if result.get("error"):
+                print(f"  ✗ {query['dimension']} × {query['measure']}: {result['error']['detail']}")
+            else:
+                print(f"  ✓ {query['dimension']} × {query['measure']}: {len(result['rows'])} rows")
+        return True
+
+
+async def test_execute_large_batch():
+    """Test a batch with more scan groups than a token may queue"""
+    print("\n✓ Testing Large Batch Query...")
+    
+    today = date.today()
+    
+    # Distinct date ranges, so every query is its own scan group
+    queries = [
+        {
+            "dataset_id": "orders",
+            "dimension": "platform",
+            "measure": "revenue",
+            "date_from": (today - timedelta(days=30 + i)).isoformat(),
+            "date_to": (today - timedelta(days=i)).isoformat(),
+        }
+        for i in range(30)
+    ]
+    
+    async with httpx.AsyncClient(timeout=60) as client:
+        resp = await client.post(
+            f"{BASE_URL}/share/{TEST_TOKEN}/queries",
+            json=queries
+        )
+        print(f"  Status: {resp.status_code}")
+        if resp.status_code != 200:
+            print(f"  Error: {resp.text}")
+            return False
+        errors = [result["error"] for result in resp.json()["results"] if result.get("error")]
+        print(f"  Queries: {len(queries)}, errors: {len(errors)}")
+        return not errors
+
+
 async def test_query_all_combinations():
     """Test query with different dimensions and measures"""
     print("\n✓ Testing Query Combinations...")
@@ -111,14 +215,15 @@ async def test_query_all_combinations():
         ("orders", "platform", "revenue"),
         ("livestream", "dt", "revenue"),
         ("livestream", "platform", "sessions"),
+        ("orders", ["dt", "platform"], ["revenue", "orders"]),
     ]
     
     async with httpx.AsyncClient() as client:
         for dataset_id, dimension, measure in tests:
             query_payload = {
                 "dataset_id": dataset_id,
-                "dimension": dimension,
-                "measure": measure,
+                "dimensions": dimension if isinstance(dimension, list) else [dimension],
+                "measures": measure if isinstance(measure, list) else [measure],
                 "date_from": week_ago.isoformat(),
                 "date_to": today.isoformat(),
                 "limit": 500,
@@ -152,6 +257,9 @@ async def main():
         await test_list_datasets()
         await test_get_fields()
         await test_execute_query()
+        await test_execute_query_stream()
+        await test_execute_batch()
+        await test_execute_large_batch()
         await test_query_all_combinations()
         
         print("\n" + "=" * 60)
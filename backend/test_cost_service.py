@@ -0,0 +1,160 @@
+"""
+Test cost-aware admission and estimated versus actual byte accounting
+
+Runs in-process (no server needed) against the local fake BigQuery
+client: a query is rejected or downgraded by a share token's byte budget
+exactly as the client's dry-run estimate says, and the estimate and the
+bytes actually processed are recorded under the same token.
+
+Run from the backend directory:
+    python test_cost_service.py
+"""
+import contextvars
+import os
+import tempfile
+from datetime import date, timedelta
+
+# A throwaway shared result cache, so earlier runs never hit
+os.environ.setdefault(
+    "SHARED_CACHE_PATH",
+    os.path.join(tempfile.mkdtemp(prefix="test-cost-service-"), "result_cache.sqlite")
+)
+
+from fastapi import HTTPException
+
+import api.metrics  # noqa: F401 (registers the cost metrics)
+import config
+from schemas.query_schema import ExploreQuery
+from services.bigquery_client import FakeBigQueryClient
+from services.cost_service import cost_service
+from services.query_service import QueryService, query_service
+from utils.cost_tracker import cost_tracker
+from utils.metrics import metrics_registry
+
+TEST_TOKEN = "cost_test_token"
+DATASET_ID = "orders"
+
+client = FakeBigQueryClient()
+
+
+def make_query(days: int) -> ExploreQuery:
+    """Query over the last days of the dataset"""
+    today = date.today()
+    return ExploreQuery(
+        dataset_id=DATASET_ID,
+        dimension="product_name",
+        measure="revenue",
+        date_from=today - timedelta(days=days - 1),
+        date_to=today
+    )
+
+
+def token_counters() -> dict:
+    """Cost counters recorded for the test token"""
+    return dict(cost_tracker.stats()["tokens"].get(TEST_TOKEN, {}))
+
+
+def with_budget(max_bytes: int, over_budget: str) -> None:
+    """Configure the test token's per-query byte budget"""
+    config.SHARE_TOKENS[TEST_TOKEN] = {
+        "active": True,
+        "label": "Cost test",
+        "max_bytes_billed": max_bytes,
+        "over_budget": over_budget,
+    }
+
+
+def setup_module() -> None:
+    """Cached results are admitted for free, so estimate every query"""
+    config.QUERY_CACHE_ENABLED = False
+
+
+def teardown_module() -> None:
+    """Restore the configuration"""
+    config.SHARE_TOKENS.pop(TEST_TOKEN, None)
+    config.QUERY_CACHE_ENABLED = True
+
+
+def test_reject_over_budget() -> None:
+    """A query whose dry run exceeds the budget is rejected and recorded"""
+    query = make_query(90)
+    estimate = client.dry_run(QueryService.plan(query))
+    with_budget(estimate - 1, "reject")
+    before = token_counters()
+
+    try:
+        cost_service.admit(query, TEST_TOKEN)
+        raise AssertionError("query over budget was admitted")
+    except HTTPException as e:
+        assert e.status_code == 400
+        assert str(estimate) in e.detail
+
+    after = token_counters()
+    assert after.get("rejected", 0) - before.get("rejected", 0) == 1
+    assert after.get("rejected_bytes", 0) - before.get("rejected_bytes", 0) == estimate
+    # Rejected queries never reach the backend
+    assert after.get("estimated_bytes", 0) == before.get("estimated_bytes", 0)
+
+    with_budget(estimate, "reject")
+    admission = cost_service.admit(query, TEST_TOKEN)
+    assert admission.estimated_bytes == estimate and not admission.downgraded
+
+
+def test_downgrade_over_budget() -> None:
+    """A downgrading token gets the latest days that fit its budget"""
+    query = make_query(90)
+    estimate = client.dry_run(QueryService.plan(query))
+    with_budget(estimate // 3, "downgrade")
+    before = token_counters()
+
+    admission = cost_service.admit(query, TEST_TOKEN)
+
+    assert admission.downgraded
+    assert admission.query.date_to == query.date_to
+    assert query.date_from < admission.query.date_from <= query.date_to
+    assert admission.estimated_bytes == client.dry_run(QueryService.plan(admission.query))
+    assert admission.estimated_bytes <= estimate // 3
+    assert admission.headers()["X-Query-Downgraded"] == f"date_from={admission.query.date_from.isoformat()}"
+
+    after = token_counters()
+    assert after.get("downgraded", 0) - before.get("downgraded", 0) == 1
+    assert after["downgraded_bytes"] - before.get("downgraded_bytes", 0) == admission.estimated_bytes
+
+
+def test_actual_bytes_billed_to_token() -> None:
+    """Backend bytes land under the token that ran the query, next to its estimate"""
+    query = make_query(30)
+    with_budget(0, "reject")
+    before = token_counters()
+
+    def run() -> None:
+        cost_tracker.bill_to(TEST_TOKEN)
+        admission = cost_service.admit(query, TEST_TOKEN)
+        query_service.execute_columns(admission.query)
+
+    contextvars.copy_context().run(run)
+
+    after = token_counters()
+    estimated = after["estimated_bytes"] - before.get("estimated_bytes", 0)
+    actual = after["actual_bytes"] - before.get("actual_bytes", 0)
+    assert estimated == client.dry_run(QueryService.plan(query))
+    # Without a platform filter the scan reads exactly the estimated bytes
+    assert actual == estimated
+    assert after["backend_queries"] - before.get("backend_queries", 0) == 1
+
+    exposition = metrics_registry.render()
+    assert f'query_estimated_bytes_total{{dataset="{DATASET_ID}",decision="admitted"}}' in exposition
+    assert f'query_actual_bytes_total{{dataset="{DATASET_ID}"}}' in exposition
+
+
+if __name__ == "__main__":
+    setup_module()
+    try:
+        test_reject_over_budget()
+        print("✓ Queries over budget are rejected at the dry-run estimate")
+        test_downgrade_over_budget()
+        print("✓ Downgraded queries fit the budget at the dry-run estimate")
+        test_actual_bytes_billed_to_token()
+        print("✓ Actual bytes are recorded under the query's token")
+    finally:
+        teardown_module()
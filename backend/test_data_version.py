@@ -0,0 +1,109 @@
+"""
+Test that a data load is never answered from results cached before it
+
+Runs in-process (no server needed): queries a dataset, replaces its fact
+table with doubled revenue as a data load would, and checks that the next
+request returns the new numbers under a new ETag, both for the result
+cache and for the per-day partial aggregate cache.
+
+Run from the backend directory:
+    python test_data_version.py
+"""
+import os
+import tempfile
+from datetime import date, timedelta
+
+# A throwaway shared result cache, so earlier runs never hit
+os.environ.setdefault(
+    "SHARED_CACHE_PATH",
+    os.path.join(tempfile.mkdtemp(prefix="test-data-version-"), "result_cache.sqlite")
+)
+
+from fastapi.testclient import TestClient
+
+import config
+from app import app
+from services.data_version_service import data_version_service
+from services.local_engine import ColumnarTable, local_engine
+from services.query_plan import COMPILED_DATASETS
+from services.rollup_service import rollup_service
+
+TEST_TOKEN = "demo_token_123"
+DATASET_ID = "orders"
+
+
+def load_doubled_revenue() -> None:
+    """Replace the dataset's fact table with one whose revenue is doubled"""
+    table = local_engine.get_table(COMPILED_DATASETS[DATASET_ID].table)
+    local_engine.register_table(ColumnarTable(
+        table.name,
+        table.days,
+        table.dimensions,
+        {**table.measures, "revenue": table.measures["revenue"] * 2}
+    ))
+    rollup_service.refresh(DATASET_ID)
+    # As after a data load: the next request rechecks the watermark
+    data_version_service.invalidate(DATASET_ID)
+
+
+def check_fresh_after_load(client: TestClient, payload: dict) -> None:
+    """Query, load new data, and check the repeated query sees it"""
+    url = f"/share/{TEST_TOKEN}/query"
+
+    before = client.post(url, json=payload)
+    assert before.status_code == 200, before.text
+    # Served from the result cache the second time
+    assert client.post(url, json=payload).json() == before.json()
+
+    load_doubled_revenue()
+
+    after = client.post(url, json=payload, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200, after.status_code
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+    old = {row[payload["dimension"]]: row["revenue"] for row in before.json()["rows"]}
+    new = {row[payload["dimension"]]: row["revenue"] for row in after.json()["rows"]}
+    assert new.keys() == old.keys()
+    for key, revenue in old.items():
+        assert abs(new[key] - 2 * revenue) < 0.05, (key, revenue, new[key])
+
+
+def test_result_cache_after_load() -> None:
+    """Result cache entries from before a load are not served after it"""
+    today = date.today()
+    payload = {
+        "dataset_id": DATASET_ID,
+        "dimension": "platform",
+        "measure": "revenue",
+        "date_from": (today - timedelta(days=60)).isoformat(),
+        "date_to": (today - timedelta(days=1)).isoformat(),
+    }
+    with TestClient(app) as client:
+        check_fresh_after_load(client, payload)
+
+
+def test_partial_cache_after_load() -> None:
+    """Per-day partials from before a load are not merged after it"""
+    today = date.today()
+    payload = {
+        "dataset_id": DATASET_ID,
+        "dimension": "product_name",
+        "measure": "revenue",
+        "date_from": (today - timedelta(days=45)).isoformat(),
+        "date_to": (today - timedelta(days=2)).isoformat(),
+    }
+    # Partials only answer queries no rollup covers
+    saved = config.PARTIAL_CACHE_ENABLED, config.ROLLUPS_ENABLED
+    config.PARTIAL_CACHE_ENABLED, config.ROLLUPS_ENABLED = True, False
+    try:
+        with TestClient(app) as client:
+            check_fresh_after_load(client, payload)
+    finally:
+        config.PARTIAL_CACHE_ENABLED, config.ROLLUPS_ENABLED = saved
+
+
+if __name__ == "__main__":
+    test_result_cache_after_load()
+    print("✓ Result cache is fresh after a data load")
+    test_partial_cache_after_load()
+    print("✓ Partial aggregates are fresh after a data load")
@@ -0,0 +1,129 @@
+"""
+Unit tests for single-flight query coalescing
+
+Run from the backend directory:
+    python -m pytest -q test_singleflight.py
+"""
+import asyncio
+import threading
+import time
+
+from utils.singleflight import SingleFlight
+
+CALLERS = 8
+TIMEOUT = 5
+
+
+def wait_until(condition, timeout: float = TIMEOUT) -> None:
+    """Poll until condition() is true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def run_callers(flight: SingleFlight, leader_fn, follower_fn) -> list:
+    """
+    Run CALLERS concurrent do() calls with one key
+
+    The leader's function is started first and holds the flight open
+    until every follower has joined it.
+
+    Returns:
+        Per caller, its result or the exception it raised
+    """
+    outcomes = [None] * CALLERS
+
+    def call(index: int, fn) -> None:
+        try:
+            outcomes[index] = flight.do("key", fn)
+        except BaseException as e:
+            outcomes[index] = e
+
+    leader = threading.Thread(target=call, args=(0, leader_fn))
+    leader.start()
+    wait_until(lambda: flight.stats()["in_flight"] == 1)
+
+    followers = [threading.Thread(target=call, args=(i, follower_fn)) for i in range(1, CALLERS)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join(TIMEOUT)
+    return outcomes
+
+
+def leader_body(flight: SingleFlight, result=None, error: BaseException = None):
+    """Leader function that waits for every follower, then returns or raises"""
+    def fn():
+        wait_until(lambda: flight.stats()["coalesced"] >= CALLERS - 1)
+        if error is not None:
+            raise error
+        return result
+    return fn
+
+
+def test_concurrent_calls_execute_once() -> None:
+    """N callers with one key run the function once and N-1 are coalesced"""
+    flight = SingleFlight()
+    calls = []
+    lead = leader_body(flight, "result")
+
+    def leader_fn():
+        calls.append("leader")
+        return lead()
+
+    def follower_fn():
+        calls.append("follower")
+        return "other"
+
+    outcomes = run_callers(flight, leader_fn, follower_fn)
+
+    assert outcomes == ["result"] * CALLERS
+    assert calls == ["leader"]
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": CALLERS - 1}
+
+
+def test_leader_error_is_shared() -> None:
+    """Followers receive the leader's exception instead of re-running"""
+    flight = SingleFlight()
+    error = ValueError("backend failed")
+
+    outcomes = run_callers(flight, leader_body(flight, error=error), lambda: "other")
+
+    assert all(outcome is error for outcome in outcomes)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": CALLERS - 1}
+    # The failure is not cached: the next call runs again
+    assert flight.do("key", lambda: "retried") == "retried"
+    assert flight.stats()["executions"] == 2
+
+
+def test_leader_cancel_elects_new_leader() -> None:
+    """A cancelled leader's followers retry and one of them re-executes"""
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def follower_fn():
+        # Hold the new flight open until the other followers rejoined it
+        release.wait(TIMEOUT)
+        return "result"
+
+    threading.Timer(0.2, release.set).start()
+    outcomes = run_callers(flight, leader_body(flight, error=asyncio.CancelledError()), follower_fn)
+
+    # The cancellation stays with the leader; followers get a real result
+    assert isinstance(outcomes[0], asyncio.CancelledError)
+    assert outcomes[1:] == ["result"] * (CALLERS - 1)
+    stats = flight.stats()
+    assert stats["in_flight"] == 0
+    assert stats["executions"] == 2
+    # Followers of the aborted flight are not counted as saved executions
+    assert stats["coalesced"] == CALLERS - 2
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_execute_once()
+    print("✓ Concurrent identical calls execute once")
+    test_leader_error_is_shared()
+    print("✓ Leader errors are shared with followers")
+    test_leader_cancel_elects_new_leader()
+    print("✓ A cancelled leader's followers elect a new leader")
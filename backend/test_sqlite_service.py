@@ -0,0 +1,124 @@
+"""
+Test the SQLite backend across a reseed
+
+Seeds a throwaway database file, queries it through a pooled
+SQLiteService, then replaces the file the way a reseed does (os.replace
+of a modified copy) while a connection is still borrowed. The next query
+must reset the pool and read the new rows, and the pushed-down remainder
+("Other") row must match the local engine for the same plan.
+
+Run from the backend directory:
+    python test_sqlite_service.py
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import date, timedelta
+
+import config
+from seed_sqlite import seed
+from services.bigquery_service import bigquery_service
+from services.query_plan import COMPILED_DATASETS, QueryPlan
+from services.sqlite_service import SQLiteService
+
+DATE_TO = date.today() - timedelta(days=1)
+DATE_FROM = DATE_TO - timedelta(days=29)
+
+
+def make_plan(dimension: str, limit: int = None, other: bool = False) -> QueryPlan:
+    """Orders and revenue over the last 30 seeded days"""
+    return QueryPlan(
+        COMPILED_DATASETS["orders"], [dimension], ["orders", "revenue"], DATE_FROM, DATE_TO,
+        order="desc", limit=limit, order_by="revenue", other=other
+    )
+
+
+def rows(result: dict) -> list:
+    """Result columns as rows"""
+    return [list(row) for row in zip(*result["data"])]
+
+
+def assert_rows_close(actual: list, expected: list, scale: float = 1.0) -> None:
+    """Same groups and counts; revenue equal to the expected one times scale"""
+    assert [row[:2] for row in actual] == [row[:2] for row in expected]
+    for row, other in zip(actual, expected):
+        assert abs(row[2] - other[2] * scale) < 0.05, (row, other)
+
+
+def replace_with_doubled_revenue(path: str) -> None:
+    """Swap in a copy of the file whose order revenue is doubled"""
+    copy = f"{path}.new"
+    shutil.copy(path, copy)
+    connection = sqlite3.connect(copy)
+    connection.execute("UPDATE fact_orders SET revenue = revenue * 2")
+    connection.commit()
+    connection.close()
+    os.replace(copy, path)
+
+
+def test_reseed_resets_pool() -> None:
+    """After os.replace the next checkout reads the new file, even with a connection held"""
+    path = os.path.join(tempfile.mkdtemp(prefix="test-sqlite-service-"), "explorer.sqlite")
+    seed(path)
+    sqlite = SQLiteService(path, pool_size=2, statement_cache_size=16)
+    try:
+        plan = make_plan("platform")
+        before = rows(sqlite.execute_columns(plan))
+        assert_rows_close(before, rows(bigquery_service.execute_columns(plan)))
+        version = sqlite.data_version("fact_orders")
+        resets = sqlite.pool.stats()["resets"]
+
+        # Hold a pooled connection (opened on the old file) across the swap
+        borrowed = threading.Event()
+        release = threading.Event()
+
+        def hold() -> None:
+            with sqlite._connection():
+                borrowed.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        borrowed.wait()
+        try:
+            replace_with_doubled_revenue(path)
+            after = rows(sqlite.execute_columns(plan))
+        finally:
+            release.set()
+            holder.join()
+
+        assert sqlite.data_version("fact_orders") != version
+        assert sqlite.pool.stats()["resets"] == resets + 1
+        assert_rows_close(after, before, scale=2.0)
+
+        # The connection returned after the reset is discarded, not reused
+        assert_rows_close(rows(sqlite.execute_columns(plan)), before, scale=2.0)
+        assert sqlite.pool.stats()["resets"] == resets + 1
+    finally:
+        sqlite.pool.close()
+
+
+def test_remainder_row_matches_local_engine() -> None:
+    """The window-total Other row equals the local engine's remainder"""
+    path = os.path.join(tempfile.mkdtemp(prefix="test-sqlite-service-"), "explorer.sqlite")
+    seed(path)
+    sqlite = SQLiteService(path, pool_size=1, statement_cache_size=16)
+    try:
+        for limit in (1, 3, 5):
+            plan = make_plan("product_name", limit=limit, other=True)
+            actual = rows(sqlite.execute_columns(plan))
+            expected = rows(bigquery_service.execute_columns(plan))
+            assert actual[-1][0] == config.QUERY_OTHER_LABEL
+            assert len(actual) == limit + 1
+            assert_rows_close(actual, expected)
+    finally:
+        sqlite.pool.close()
+
+
+if __name__ == "__main__":
+    test_reseed_resets_pool()
+    print("✓ Replacing the file resets the pool and serves the new rows")
+    test_remainder_row_matches_local_engine()
+    print("✓ SQLite's Other row matches the local engine")
@@ -0,0 +1,220 @@
+"""
+Test top-N ordering and the "Other" remainder row
+
+Covers LocalEngine._top/_remainder on a small hand-built table (ties at
+the N-th group, a limit covering every group, both orders, measures that
+cannot be summed) and checks that QueryPlan.to_sql, run on SQLite with
+its window totals, returns the same rows as the local engine.
+
+Run from the backend directory:
+    python test_top_n.py
+"""
+import os
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi import HTTPException
+
+import config
+from constants.datasets import DATASETS_REGISTRY
+from schemas.query_schema import ExploreQuery
+from seed_sqlite import seed
+from services.bigquery_service import bigquery_service
+from services.local_engine import ColumnarTable, LocalEngine
+from services.query_plan import COMPILED_DATASETS, MeasureExpr, QueryPlan
+from services.query_service import QueryService
+from services.sqlite_service import SQLiteService
+
+OTHER = config.QUERY_OTHER_LABEL
+TABLE = "test.top_n"
+DAY = date(2025, 1, 1)
+MEASURES = [("revenue", "SUM", "revenue"), ("orders", "COUNT", None)]
+
+# Group -> revenue of each of its rows: B and D tie first, C and F tie third
+GROUPS = {
+    "A": [4.0, 6.0],
+    "B": [10.0, 10.0, 10.0],
+    "C": [20.0],
+    "D": [15.0, 15.0],
+    "E": [5.0],
+    "F": [12.5, 7.5],
+}
+
+
+def make_engine() -> LocalEngine:
+    """Engine holding only the hand-built table"""
+    names = sorted(GROUPS)
+    codes = [names.index(name) for name in names for _ in GROUPS[name]]
+    revenue = [value for name in names for value in GROUPS[name]]
+    engine = LocalEngine(rows_per_day=1, days=1, seed=0)
+    engine.register_table(ColumnarTable(
+        TABLE,
+        days=np.full(len(codes), DAY.toordinal()),
+        dimensions={"product": (np.array(codes, dtype=np.int32), np.array(names))},
+        measures={"revenue": np.array(revenue)}
+    ))
+    return engine
+
+
+def top_n(engine: LocalEngine, order: str, limit: int, order_by: str = "revenue", measures=MEASURES) -> list:
+    """Rows of a top-N query with a remainder row"""
+    result = engine.aggregate_columns(
+        TABLE, ["product"], measures, DAY, DAY, order=order, limit=limit, order_by=order_by, other=True
+    )
+    return [list(row) for row in zip(*result["data"])]
+
+
+def test_top_ranks_ties_by_group() -> None:
+    """_top keeps the lowest group indices among ties at the cutoff"""
+    values = np.array([5.0, 3.0, 5.0, 1.0, 5.0, 3.0])
+    assert LocalEngine._top(values, "desc", 2).tolist() == [0, 2]
+    assert LocalEngine._top(values, "desc", 4).tolist() == [0, 2, 4, 1]
+    assert LocalEngine._top(values, "asc", 2).tolist() == [3, 1]
+    assert LocalEngine._top(values, "asc", 3).tolist() == [3, 1, 5]
+    # A limit at or past the group count ranks every group
+    assert LocalEngine._top(values, "desc", 6).tolist() == [0, 2, 4, 1, 5, 3]
+    assert LocalEngine._top(values, "asc", 100).tolist() == [3, 1, 5, 0, 2, 4]
+    assert LocalEngine._top(values, "desc", None).tolist() == [0, 2, 4, 1, 5, 3]
+
+
+def test_top_n_descending_with_tie_at_cutoff() -> None:
+    """The tied group with the lower key is kept; the other joins Other"""
+    engine = make_engine()
+    assert top_n(engine, "desc", 2) == [["B", 30.0, 3], ["D", 30.0, 2], [OTHER, 55.0, 6]]
+    assert top_n(engine, "desc", 3) == [["B", 30.0, 3], ["D", 30.0, 2], ["C", 20.0, 1], [OTHER, 35.0, 5]]
+
+
+def test_top_n_ascending() -> None:
+    """Ascending order selects the smallest groups, ties by key"""
+    engine = make_engine()
+    assert top_n(engine, "asc", 3) == [["E", 5.0, 1], ["A", 10.0, 2], ["C", 20.0, 1], [OTHER, 80.0, 7]]
+    # Ordering by a COUNT measure: A, D, F tie at 2 rows
+    assert top_n(engine, "asc", 3, "orders") == [["C", 20.0, 1], ["E", 5.0, 1], ["A", 10.0, 2], [OTHER, 80.0, 7]]
+
+
+def test_no_other_row_when_limit_covers_all_groups() -> None:
+    """Nothing is cut off, so no remainder row is appended"""
+    engine = make_engine()
+    for limit in (len(GROUPS), len(GROUPS) + 10):
+        rows = top_n(engine, "desc", limit)
+        assert [row[0] for row in rows] == ["B", "D", "C", "F", "A", "E"]
+
+
+def test_other_row_by_group_key() -> None:
+    """Without order_by the groups cut off by key order are totalled"""
+    engine = make_engine()
+    result = engine.aggregate_columns(TABLE, ["product"], MEASURES, DAY, DAY, order="desc", limit=2, other=True)
+    assert [list(row) for row in zip(*result["data"])] == [["F", 20.0, 2], ["E", 5.0, 1], [OTHER, 90.0, 8]]
+
+
+def test_avg_measure_has_no_other_row() -> None:
+    """Averages cannot be summed into a remainder: engine and validation refuse"""
+    engine = make_engine()
+    try:
+        top_n(engine, "desc", 2, measures=[("avg_revenue", "AVG", "revenue")], order_by="avg_revenue")
+        raise AssertionError("AVG remainder was computed")
+    except ValueError as e:
+        assert "SUM or COUNT" in str(e)
+    # Without a remainder row AVG measures rank normally
+    result = engine.aggregate_columns(
+        TABLE, ["product"], [("avg_revenue", "AVG", "revenue")], DAY, DAY,
+        order="desc", limit=2, order_by="avg_revenue"
+    )
+    assert [list(row) for row in zip(*result["data"])] == [["C", 20.0], ["D", 15.0]]
+
+    # The API rejects include_other with an AVG measure before planning
+    DATASETS_REGISTRY["orders"]["measures"]["avg_revenue"] = "AVG(revenue)"
+    COMPILED_DATASETS["orders"].measures["avg_revenue"] = MeasureExpr("avg_revenue", "AVG(revenue)")
+    try:
+        query = ExploreQuery(
+            dataset_id="orders", dimension="product_name", measure="avg_revenue",
+            date_from=DAY, date_to=DAY, limit=5, order_by="avg_revenue", include_other=True
+        )
+        try:
+            QueryService.validate(query)
+            raise AssertionError("include_other with AVG was accepted")
+        except HTTPException as e:
+            assert e.status_code == 400
+    finally:
+        del DATASETS_REGISTRY["orders"]["measures"]["avg_revenue"]
+        del COMPILED_DATASETS["orders"].measures["avg_revenue"]
+
+
+def rows_close(actual: list, expected: list) -> bool:
+    """Rows equal, with float measures within rounding of each other"""
+    if len(actual) != len(expected):
+        return False
+    for row, other in zip(actual, expected):
+        for a, b in zip(row, other):
+            if isinstance(a, float) or isinstance(b, float):
+                if abs(a - b) > 0.05:
+                    return False
+            elif a != b:
+                return False
+    return True
+
+
+def test_sqlite_matches_local_engine() -> None:
+    """The rendered SQL (ORDER BY/LIMIT with window totals) gives the engine's rows"""
+    path = os.path.join(tempfile.mkdtemp(prefix="test-top-n-"), "explorer.sqlite")
+    seed(path)
+    sqlite = SQLiteService(path, pool_size=1, statement_cache_size=16)
+    source = COMPILED_DATASETS["orders"]
+    date_to = date.today() - timedelta(days=1)
+    date_from = date_to - timedelta(days=29)
+
+    def run(backend, order: str, limit: int, order_by: str, platform=None) -> list:
+        plan = QueryPlan(
+            source, ["product_name"], ["orders", "revenue"], date_from, date_to,
+            platform=platform, order=order, limit=limit, order_by=order_by, other=True
+        )
+        return [list(row) for row in zip(*backend.execute_columns(plan)["data"])]
+
+    # Find a limit whose last group ties with the first one cut off
+    ranked = run(bigquery_service, "desc", 5000, "orders")
+    boundary = next(i for i in range(1, len(ranked)) if ranked[i - 1][1] == ranked[i][1])
+
+    try:
+        for order in ("asc", "desc"):
+            for limit in (1, boundary, len(ranked), len(ranked) + 1):
+                for order_by in ("orders", "revenue"):
+                    for platform in (None, "tiktok"):
+                        expected = run(bigquery_service, order, limit, order_by, platform)
+                        actual = run(sqlite, order, limit, order_by, platform)
+                        assert rows_close(actual, expected), (order, limit, order_by, platform)
+                        has_other = expected[-1][0] == OTHER
+                        assert has_other == (limit < len(run(bigquery_service, order, 5000, order_by, platform)))
+    finally:
+        sqlite.pool.close()
+
+
+def test_to_sql_window_totals() -> None:
+    """The remainder's totals are window aggregates evaluated before LIMIT"""
+    plan = QueryPlan(
+        COMPILED_DATASETS["orders"], ["product_name"], ["revenue", "orders"], DAY, DAY,
+        order="desc", limit=10, order_by="revenue", other=True
+    )
+    sql = plan.to_sql()
+    assert "SUM(SUM(revenue)) OVER () AS total_revenue" in sql
+    assert "SUM(COUNT(1)) OVER () AS total_orders" in sql
+    assert "COUNT(*) OVER () AS total_groups" in sql
+    assert "ORDER BY revenue DESC, product_name ASC" in sql
+    assert sql.endswith("LIMIT 10")
+    # Without a limit nothing is cut off and no totals are pushed down
+    plan.limit = None
+    assert "OVER ()" not in plan.to_sql()
+
+
+if __name__ == "__main__":
+    test_top_ranks_ties_by_group()
+    test_top_n_descending_with_tie_at_cutoff()
+    test_top_n_ascending()
+    test_no_other_row_when_limit_covers_all_groups()
+    test_other_row_by_group_key()
+    print("✓ Top-N ranks ties by group key and totals the rest as Other")
+    test_avg_measure_has_no_other_row()
+    print("✓ AVG measures get no remainder row")
+    test_to_sql_window_totals()
+    test_sqlite_matches_local_engine()
+    print("✓ SQLite pushdown matches the local engine")
@@ -0,0 +1,143 @@
+"""
+In-memory caching utilities
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate the memory footprint of a cached value in bytes
+
+    Walks lists, tuples and dicts recursively so that result rows
+    (list of dicts of scalars) are accounted for with their contents.
+
+    Args:
+        value: Value to measure
+
+    Returns:
+        Approximate size in bytes
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and a total byte budget"""
+
+    def __init__(self, max_bytes: int, default_ttl: float = 300.0):
+        """
+        Initialize cache
+
+        Args:
+            max_bytes: Upper bound on the summed size of all entries
+            default_ttl: TTL in seconds used when set() gets no ttl
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, record_stats: bool = True) -> Optional[Any]:
+        """
+        Look up a value and mark it as recently used
+
+        Args:
+            key: Cache key
+            record_stats: Count this lookup in hits/misses
+
+        Returns:
+            Cached value, or None on miss or expiry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += record_stats
+                return None
+
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += record_stats
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += record_stats
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries if needed
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live in seconds (defaults to default_ttl)
+
+        Returns:
+            True if stored, False if the value alone exceeds max_bytes
+            or the ttl is not positive
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        size = estimate_size(value)
+
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+        return True
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Snapshot of cache counters
+
+        Returns:
+            Dict with entries, bytes, hits, misses, evictions and expirations
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
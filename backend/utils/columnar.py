@@ -0,0 +1,74 @@
+"""
+Columnar result helpers
+
+Query results are passed around internally as {"columns": [...], "data":
+[...]} where data holds one value list per column. These helpers convert
+that shape to the row format and to Apache Arrow IPC.
+"""
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Iterator
+
+
+def num_rows(result: dict) -> int:
+    """Number of rows in a columnar result"""
+    return len(result["data"][0]) if result["data"] else 0
+
+
+def to_rows(result: dict) -> list[dict]:
+    """
+    Convert a columnar result to a list of row dicts
+
+    Args:
+        result: Columnar result
+
+    Returns:
+        List of rows keyed by column name
+    """
+    columns = result["columns"]
+    return [dict(zip(columns, values)) for values in zip(*result["data"])]
+
+
+def iter_row_chunks(result: dict, chunk_size: int) -> Iterator[list[dict]]:
+    """
+    Yield a columnar result as row dicts, chunk_size rows at a time
+
+    Args:
+        result: Columnar result
+        chunk_size: Rows per chunk
+
+    Yields:
+        Lists of row dicts
+    """
+    columns = result["columns"]
+    for start in range(0, num_rows(result), chunk_size):
+        data = [values[start:start + chunk_size] for values in result["data"]]
+        yield [dict(zip(columns, values)) for values in zip(*data)]
+
+
+@lru_cache(maxsize=1)
+def arrow_available() -> bool:
+    """Whether the optional pyarrow dependency is installed"""
+    return find_spec("pyarrow") is not None
+
+
+def to_arrow_ipc(result: dict) -> bytes:
+    """
+    Serialize a columnar result as an Arrow IPC stream
+
+    Args:
+        result: Columnar result
+
+    Returns:
+        Arrow IPC stream bytes
+
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    import pyarrow as pa
+
+    table = pa.table(dict(zip(result["columns"], result["data"])))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,118 @@
+"""
+Thread-safe pool of reusable database connections
+
+reset() retires every connection (e.g. after the database file was
+replaced): idle ones are closed at once, borrowed ones when returned, and
+their slots are refilled with fresh connections on demand.
+"""
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Hands out at most `size` connections, opening them lazily"""
+
+    def __init__(self, factory: Callable[[], Any], size: int):
+        """
+        Initialize an empty pool
+
+        Args:
+            factory: Opens a new connection
+            size: Maximum number of open connections
+        """
+        self.size = size
+        self._factory = factory
+        # LIFO keeps recently used connections (and their caches) warm.
+        # Entries are (generation, connection), or None for a slot whose
+        # retired connection was closed and that opens a new one when taken
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._generation = 0
+        self.waits = 0
+        self.resets = 0
+
+    def _acquire(self) -> tuple[int, Any]:
+        """Take an idle connection, open a new one, or wait for a release"""
+        try:
+            entry = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+                else:
+                    self.waits += 1
+            entry = None if can_open else self._idle.get()
+
+        if entry is not None:
+            return entry
+
+        # A counted slot without a connection: open one for it
+        generation = self._generation
+        try:
+            connection = self._factory()
+        except BaseException:
+            with self._lock:
+                self._opened -= 1
+            raise
+        logger.info("Opened pooled connection", extra={"opened": self._opened, "size": self.size})
+        return generation, connection
+
+    def _release(self, generation: int, connection: Any) -> None:
+        """Return a connection, closing it if it was retired by reset()"""
+        if generation == self._generation:
+            self._idle.put((generation, connection))
+            return
+        connection.close()
+        # Keep the slot so a waiting borrower wakes up and opens a new one
+        self._idle.put(None)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Borrow a connection for the duration of a with block
+
+        Yields:
+            An open connection, returned to the pool afterwards
+        """
+        generation, connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._release(generation, connection)
+
+    def reset(self) -> None:
+        """Retire every connection: idle ones close now, borrowed ones on return"""
+        with self._lock:
+            self._generation += 1
+            self.resets += 1
+        self.close()
+
+    def close(self) -> None:
+        """Close every idle connection (borrowed ones stay open)"""
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                entry[1].close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self) -> dict:
+        """Pool size, open and idle connections, waits for a release and resets"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "opened": self._opened,
+                "idle": self._idle.qsize(),
+                "waits": self.waits,
+                "resets": self.resets,
+            }
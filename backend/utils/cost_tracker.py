@@ -0,0 +1,112 @@
+"""
+Estimated versus actual query cost accounting
+
+Estimates and actual bytes are both kept per (dataset, share token), so
+the two can be compared for one share link as well as per dataset.
+Backends do not know which share token a query runs for; routes name it
+once per request with bill_to(), and since QueryExecutor copies the
+request context into worker threads, record_actual() finds it there.
+"""
+from contextvars import ContextVar
+from typing import Optional
+import threading
+
+# Admission decisions recorded with an estimate
+DECISIONS = ("admitted", "downgraded", "rejected")
+
+_billed_token: ContextVar[Optional[str]] = ContextVar("billed_token", default=None)
+
+
+class CostTracker:
+    """Thread-safe byte counters per dataset and share token"""
+
+    def __init__(self):
+        """Initialize empty counters"""
+        self._lock = threading.Lock()
+        # (dataset, token or None) -> counter name -> value
+        self._counters: dict[tuple[str, Optional[str]], dict[str, int]] = {}
+
+    @staticmethod
+    def bill_to(token: str) -> None:
+        """
+        Attribute backend bytes processed in the current request to a token
+
+        Args:
+            token: Verified share token of the request
+        """
+        _billed_token.set(token)
+
+    def _bump(self, dataset_id: str, token: Optional[str], **amounts: int) -> None:
+        """Add amounts to named counters of a dataset and token"""
+        with self._lock:
+            counters = self._counters.setdefault((dataset_id, token), {})
+            for name, amount in amounts.items():
+                counters[name] = counters.get(name, 0) + amount
+
+    def record_estimate(self, dataset_id: str, token: str, estimated_bytes: int, decision: str) -> None:
+        """
+        Record an admission decision and its dry-run estimate
+
+        Args:
+            dataset_id: Dataset queried
+            token: Share token that sent the query
+            estimated_bytes: Dry-run estimate (after any downgrade)
+            decision: "admitted", "downgraded" or "rejected"
+        """
+        amounts = {decision: 1, f"{decision}_bytes": estimated_bytes}
+        if decision != "rejected":
+            # Bytes expected to reach the backend, comparable to actual_bytes
+            amounts["estimated_bytes"] = estimated_bytes
+        self._bump(dataset_id, token, **amounts)
+
+    def record_actual(self, dataset_id: str, actual_bytes: int) -> None:
+        """
+        Record bytes processed by one backend execution
+
+        The bytes are billed to the token named by bill_to() in the
+        current context (None outside a request, e.g. warmup). Cache hits,
+        coalesced queries and cached partial days never reach the
+        backend, so actual totals also reflect those savings.
+
+        Args:
+            dataset_id: Dataset queried
+            actual_bytes: Bytes processed
+        """
+        self._bump(dataset_id, _billed_token.get(), backend_queries=1, actual_bytes=actual_bytes)
+
+    def _totals(self, position: int) -> dict:
+        """Counters summed by dataset (position 0) or token (position 1)"""
+        totals: dict = {}
+        with self._lock:
+            for key, counters in self._counters.items():
+                if key[position] is None:
+                    continue
+                summed = totals.setdefault(key[position], {})
+                for name, value in counters.items():
+                    summed[name] = summed.get(name, 0) + value
+        return totals
+
+    def estimated_bytes(self) -> dict[tuple[str, str], int]:
+        """Estimated bytes per (dataset, decision)"""
+        return {
+            (dataset_id, decision): counters[f"{decision}_bytes"]
+            for dataset_id, counters in self._totals(0).items()
+            for decision in DECISIONS
+            if f"{decision}_bytes" in counters
+        }
+
+    def actual_bytes(self) -> dict[tuple[str], int]:
+        """Actual bytes processed per dataset"""
+        return {
+            (dataset_id,): counters["actual_bytes"]
+            for dataset_id, counters in self._totals(0).items()
+            if "actual_bytes" in counters
+        }
+
+    def stats(self) -> dict:
+        """Counters summed per dataset and per token"""
+        return {"datasets": self._totals(0), "tokens": self._totals(1)}
+
+
+# Singleton instance
+cost_tracker = CostTracker()
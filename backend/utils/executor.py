@@ -0,0 +1,216 @@
+"""
+Bounded worker pool for blocking query execution
+
+Waiting queries are queued per tenant (share token) and workers take the
+next query round-robin across tenants, so one busy share link cannot
+starve the others of query capacity.
+
+Each tenant may only have max_queue_per_tenant calls waiting; one more is
+rejected with a 503. The cap applies to internal fan-out too: code that
+submits several calls for one tenant at once (a batch's scan groups, the
+startup warmup) keeps at most max_queue_per_tenant of them in flight with
+an asyncio.Semaphore, so the rest wait on the event loop instead of
+being rejected.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+import config
+from utils.tracing import run_traced
+
+logger = logging.getLogger(__name__)
+
+
+class _Task:
+    """A blocking call waiting for (or running on) a worker"""
+
+    def __init__(self, fn: Callable[..., Any], args: tuple, tenant: str):
+        """
+        Initialize task
+
+        Args:
+            fn: Callable to run
+            args: Positional arguments for fn
+            tenant: Tenant the task is scheduled for
+        """
+        self.fn = fn
+        self.args = args
+        self.tenant = tenant
+        self.future: Future = Future()
+        # The caller's context (request trace) follows the task to its worker
+        self.context = contextvars.copy_context()
+        self.submitted = time.perf_counter()
+
+
+class QueryExecutor:
+    """Runs blocking calls on a fixed thread pool with fair per-tenant queues"""
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        queue_timeout: float,
+        max_queue_per_tenant: int
+    ):
+        """
+        Initialize executor
+
+        Args:
+            max_workers: Number of queries allowed to run concurrently
+            max_queue: Number of queries allowed to wait for a free worker
+            queue_timeout: Seconds a query may wait before it is rejected
+            max_queue_per_tenant: Number of waiting queries per tenant
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="query-worker"
+        )
+        self._lock = threading.Lock()
+        # Tenant -> waiting tasks; iteration order is the round-robin order
+        self._queues: OrderedDict[str, deque[_Task]] = OrderedDict()
+        self._queued = 0
+        self._active = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @staticmethod
+    def _unavailable(detail: str) -> HTTPException:
+        """Build the 503 raised when a query cannot be scheduled"""
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": "1"}
+        )
+
+    def _next_task(self) -> Optional[_Task]:
+        """Pop the next waiting task round-robin across tenants (lock held)"""
+        if not self._queues:
+            return None
+        tenant, tasks = self._queues.popitem(last=False)
+        task = tasks.popleft()
+        if tasks:
+            # The tenant goes to the back of the line behind everyone else
+            self._queues[tenant] = tasks
+        self._queued -= 1
+        return task
+
+    def _execute(self, task: _Task) -> None:
+        """Worker body: run a task, then hand the worker to the next one"""
+        while task is not None:
+            # False if the task was cancelled (queue timeout or caller gone) before it started
+            if task.future.set_running_or_notify_cancel():
+                try:
+                    task.future.set_result(
+                        task.context.run(run_traced, task.fn, task.args, task.submitted)
+                    )
+                except BaseException as e:
+                    task.future.set_exception(e)
+
+            with self._lock:
+                task = self._next_task()
+                if task is None:
+                    self._active -= 1
+
+    def _withdraw(self, task: _Task) -> bool:
+        """Remove a task that has not started yet; False if it already runs"""
+        with self._lock:
+            tasks = self._queues.get(task.tenant)
+            if tasks is None or task not in tasks:
+                return False
+            tasks.remove(task)
+            if not tasks:
+                del self._queues[task.tenant]
+            self._queued -= 1
+            return True
+
+    async def run(self, fn: Callable[..., Any], *args: Any, tenant: str = "") -> Any:
+        """
+        Run a blocking callable on the pool without blocking the event loop
+
+        Args:
+            fn: Callable to run
+            *args: Positional arguments for fn
+            tenant: Tenant to schedule the call for (share token)
+
+        Returns:
+            Return value of fn
+
+        Raises:
+            HTTPException: 503 if the wait queue (or the tenant's share of
+                it) is full or the query waited longer than queue_timeout
+                for a worker
+        """
+        task = _Task(fn, args, tenant)
+
+        with self._lock:
+            if self._active < self.max_workers and not self._queues:
+                self._active += 1
+                self._pool.submit(self._execute, task)
+            elif self._queued >= self.max_queue:
+                self.rejected += 1
+                raise self._unavailable("Query capacity exhausted, please retry")
+            elif len(self._queues.get(tenant, ())) >= self.max_queue_per_tenant:
+                self.rejected += 1
+                raise self._unavailable("Too many queued queries for this share link, please retry")
+            else:
+                self._queues.setdefault(tenant, deque()).append(task)
+                self._queued += 1
+
+        wrapped = asyncio.wrap_future(task.future)
+
+        try:
+            done, _ = await asyncio.wait({wrapped}, timeout=self.queue_timeout)
+            # Withdrawing only succeeds while the task is still waiting in the queue
+            if not done and self._withdraw(task):
+                task.future.cancel()
+                with self._lock:
+                    self.timed_out += 1
+                logger.warning("Query timed out waiting for a worker", extra={"queue_timeout": self.queue_timeout})
+                raise self._unavailable("Query queue timeout, please retry")
+
+            return await wrapped
+        except asyncio.CancelledError:
+            # The caller went away (client disconnect, timeout): a waiting task
+            # gives its tenant's queue slot back; a running one finishes unread
+            if self._withdraw(task):
+                task.future.cancel()
+            raise
+
+    def stats(self) -> dict:
+        """
+        Snapshot of executor counters
+
+        Returns:
+            Dict with active, queued, rejected and timed_out counts
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "queued_tenants": len(self._queues),
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+# Singleton instance
+query_executor = QueryExecutor(
+    max_workers=config.QUERY_MAX_WORKERS,
+    max_queue=config.QUERY_MAX_QUEUE,
+    queue_timeout=config.QUERY_QUEUE_TIMEOUT_SECONDS,
+    max_queue_per_tenant=config.QUERY_MAX_QUEUE_PER_TOKEN
+)
@@ -0,0 +1,96 @@
+"""
+HTTP conditional caching helpers (ETag, If-None-Match, Cache-Control)
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from utils.json_response import FastJSONResponse
+
+
+def make_etag(data: bytes) -> str:
+    """
+    Strong ETag for a byte string
+
+    Args:
+        data: Response body (or any bytes identifying it)
+
+    Returns:
+        Quoted ETag value
+    """
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match header matches an ETag
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+
+    Args:
+        request: Incoming request
+        etag: Current ETag of the resource
+
+    Returns:
+        True if the client's cached copy is current
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, cache_control: str, headers: Optional[dict] = None) -> Response:
+    """
+    Empty 304 response carrying the validators
+
+    Args:
+        etag: Current ETag
+        cache_control: Cache-Control value
+        headers: Extra response headers (e.g. Vary)
+
+    Returns:
+        304 Not Modified response
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={**(headers or {}), "ETag": etag, "Cache-Control": cache_control}
+    )
+
+
+class PrecomputedResponse:
+    """Serialized JSON body with its strong ETag, built once"""
+
+    def __init__(self, body: bytes):
+        """
+        Initialize from a serialized body
+
+        Args:
+            body: JSON response bytes
+        """
+        self.body = body
+        self.etag = make_etag(body)
+
+    def respond(self, request: Request, cache_control: str, headers: Optional[dict] = None) -> Response:
+        """
+        Answer a request with the body, or 304 if the client has it
+
+        Args:
+            request: Incoming request (If-None-Match is checked)
+            cache_control: Cache-Control value
+            headers: Extra response headers
+
+        Returns:
+            200 JSON response or 304 Not Modified
+        """
+        if etag_matches(request, self.etag):
+            return not_modified(self.etag, cache_control)
+        return FastJSONResponse(
+            content=self.body,
+            headers={**(headers or {}), "ETag": self.etag, "Cache-Control": cache_control}
+        )
@@ -0,0 +1,43 @@
+"""
+Fast JSON serialization for trusted response payloads
+
+Uses orjson when installed and falls back to the standard library.
+Returning FastJSONResponse from a route bypasses FastAPI's response_model
+validation and jsonable_encoder pass, so it is only meant for data the
+service produced itself (engine output, registry metadata).
+"""
+import json
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize a JSON-compatible value to compact UTF-8 bytes
+
+    Args:
+        content: Value made of dicts, lists, strings, numbers, bools and None
+
+    Returns:
+        Encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with dumps() and no re-validation"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        """Encode content (bytes are passed through as pre-rendered JSON)"""
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
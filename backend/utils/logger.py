@@ -1,22 +1,245 @@
 """
 Logging utility
+
+Log calls never touch a file or stream on the calling thread. Records go
+through a bounded in-memory queue to a background writer thread which
+formats them (JSON lines by default) and writes them to stdout and a
+size-rotated logs/app.log. When the queue is full, records are dropped
+and counted instead of blocking the caller. Importing this module does
+no I/O: the logs directory, the log file and the writer thread are set
+up by start_logging(), which the app's lifespan calls at startup.
+
+Records carry the request context bound by the request middleware
+(request_id, token_label, route) plus any structured fields passed as
+`extra`, e.g. logger.info("Query executed", extra={"dataset": "orders"}).
+INFO and lower records of the high-volume loggers listed in
+LOG_SAMPLED_LOGGERS are kept at LOG_INFO_SAMPLE_RATE; the decision is
+made per request, so a sampled request keeps all of its lines.
 """
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
-from pathlib import Path
+import zlib
+
+import config
 
-# Create logs directory if it doesn't exist
 logs_dir = Path(__file__).parent.parent / "logs"
-logs_dir.mkdir(exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(logs_dir / "app.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "context"}
+
+_log_context: ContextVar[dict] = ContextVar("log_context", default={})
+
+
+def bind_log_context(**fields) -> object:
+    """
+    Add fields to the log context of the current request
+
+    Args:
+        **fields: Fields attached to every record logged in this context
+
+    Returns:
+        Token for reset_log_context()
+    """
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token: object) -> None:
+    """Restore the log context from before bind_log_context()"""
+    _log_context.reset(token)
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    """Request context and extra fields of a record"""
+    fields = dict(getattr(record, "context", {}))
+    for key, value in vars(record).items():
+        if key not in _RECORD_ATTRIBUTES:
+            fields[key] = value
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Render time, level, logger, message, context and extra fields"""
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Rendered on the logging thread by NonBlockingQueueHandler.prepare
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines with context and extra fields appended as key=value"""
+
+    def __init__(self):
+        """Initialize with the previous line layout"""
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Render the line, then the fields"""
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request context onto records on the calling thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _log_context.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a share of INFO and lower records from high-volume loggers"""
+
+    def __init__(self, rate: float, loggers: list[str]):
+        """
+        Initialize filter
+
+        Args:
+            rate: Share of records kept (1.0 keeps everything)
+            loggers: Logger names (and their children) that are sampled
+        """
+        super().__init__()
+        self.rate = rate
+        self.loggers = tuple(loggers)
+        self.dropped = 0
+
+    def _sampled(self, record: logging.LogRecord) -> bool:
+        """Whether the record belongs to a sampled request"""
+        request_id = record.context.get("request_id") if hasattr(record, "context") else None
+        if request_id is None:
+            return random.random() < self.rate
+        # Same decision for every record of a request
+        return zlib.crc32(request_id.encode()) / 0xFFFFFFFF < self.rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno > logging.INFO:
+            return True
+        if not any(record.name == name or record.name.startswith(name + ".") for name in self.loggers):
+            return True
+        if self._sampled(record):
+            return True
+        self.dropped += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking on a full queue"""
+
+    def __init__(self, log_queue: queue.Queue):
+        """
+        Initialize handler
+
+        Args:
+            log_queue: Bounded queue read by the writer thread
+        """
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge args into the message now; formatting happens on the writer thread"""
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record on the queue, or count it as dropped if full"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _formatter() -> logging.Formatter:
+    """Formatter selected by LOG_FORMAT"""
+    if config.LOG_FORMAT.lower() == "text":
+        return TextFormatter()
+    return JsonFormatter()
+
+
+_queue: queue.Queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(_queue)
+queue_handler.addFilter(ContextFilter())
+sampling_filter = SamplingFilter(config.LOG_INFO_SAMPLE_RATE, config.LOG_SAMPLED_LOGGERS)
+queue_handler.addFilter(sampling_filter)
+
+_listener: Optional[QueueListener] = None
+
+
+def start_logging() -> None:
+    """Install the queue handler on the root logger and start the writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+    logs_dir.mkdir(exist_ok=True)
+    # Writer side: formatting and I/O happen on the listener thread only
+    file_handler = RotatingFileHandler(
+        logs_dir / "app.log",
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(_formatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(getattr(logging, config.LOG_LEVEL.upper(), logging.INFO))
+    _listener = QueueListener(_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records, stop the writer thread and close the log file"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def logging_stats() -> dict:
+    """
+    Snapshot of logging pipeline counters
+
+    Returns:
+        Dict with queued, dropped (queue full) and sampled_out counts
+    """
+    return {
+        "queued": _queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "sampled_out": sampling_filter.dropped,
+    }
+
 
 logger = logging.getLogger(__name__)
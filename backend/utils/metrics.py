@@ -0,0 +1,323 @@
+"""
+In-process metrics in the Prometheus text exposition format
+
+Counters, gauges and histograms keep one small record per label set
+behind a per-metric lock, so recording from query worker threads and the
+event loop is safe and costs a dict lookup plus an addition. Values that
+other components already count (executor queue depth, cache hits) are
+read at scrape time through callback metrics instead of being mirrored.
+"""
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+import math
+import threading
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Starlette appends "; charset=utf-8" to text media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """Render {name="value",...} (empty string without labels)"""
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class: name, help text, label names and a lock"""
+
+    type: str = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        Initialize metric
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels every sample carries
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        """Label values in labelnames order"""
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[tuple[str, tuple[str, ...], tuple[str, ...], float]]:
+        """Yield (suffix, label names, label values, value) per sample"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """HELP, TYPE and sample lines of the metric"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        Initialize counter
+
+        Args:
+            name: Metric name (conventionally ending in _total)
+            documentation: HELP text
+            labelnames: Names of the labels every sample carries
+        """
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Add to the counter of a label set
+
+        Args:
+            amount: Non-negative increment
+            **labels: Label values
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", self.labelnames, key, value
+
+
+class Gauge(_Metric):
+    """Value per label set that can go up and down"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        Initialize gauge
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels every sample carries
+        """
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add to the gauge of a label set"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Subtract from the gauge of a label set"""
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge of a label set"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", self.labelnames, key, value
+
+
+class Histogram(_Metric):
+    """Bucketed distribution (with sum and count) per label set"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        """
+        Initialize histogram
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels every sample carries
+            buckets: Sorted upper bounds (+Inf is added)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record one observation
+
+        Args:
+            value: Observed value (seconds, rows, bytes)
+            **labels: Label values
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            record = self._values.get(key)
+            if record is None:
+                record = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            record[0][index] += 1
+            record[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        bucket_labels = self.labelnames + ("le",)
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield "_bucket", bucket_labels, key + (bound,), cumulative
+            yield "_sum", self.labelnames, key, total
+            yield "_count", self.labelnames, key, cumulative
+
+
+class CallbackMetric(_Metric):
+    """Metric whose samples are read from another component at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        callback: Callable[[], dict[tuple[str, ...], float]],
+        labelnames: tuple[str, ...] = ()
+    ):
+        """
+        Initialize callback metric
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            metric_type: "gauge" or "counter"
+            callback: Returns label values -> value
+            labelnames: Names of the labels every sample carries
+        """
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self):
+        for key, value in self.callback().items():
+            yield "", self.labelnames, key, value
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        Add a metric
+
+        Args:
+            metric: Metric to expose
+
+        Returns:
+            The metric, for assignment at module level
+
+        Raises:
+            ValueError: If a metric with the same name is registered
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        """Look up a metric by name"""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """
+        Render every metric in the text exposition format
+
+        Returns:
+            Exposition text ending with a newline
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Singleton instance
+metrics_registry = MetricsRegistry()
+
+# Row and byte count buckets
+SIZE_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUEST_LATENCY = metrics_registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status")
+))
+RESPONSE_BYTES = metrics_registry.register(Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route template",
+    ("route",),
+    buckets=SIZE_BUCKETS
+))
+REQUEST_ERRORS = metrics_registry.register(Counter(
+    "http_request_errors_total",
+    "HTTP requests that ended in an error, by route template and error type",
+    ("route", "type")
+))
+QUERY_DURATION = metrics_registry.register(Histogram(
+    "query_execution_duration_seconds",
+    "Backend execution time of explore queries that missed the result cache",
+    ("dataset", "dimension", "measure")
+))
+QUERY_ROWS = metrics_registry.register(Histogram(
+    "query_rows_returned",
+    "Rows returned by explore query executions",
+    ("dataset",),
+    buckets=SIZE_BUCKETS
+))
+QUERY_ERRORS = metrics_registry.register(Counter(
+    "query_errors_total",
+    "Failed explore query executions by dataset and exception type",
+    ("dataset", "type")
+))
@@ -0,0 +1,194 @@
+"""
+Sampling CPU profiler for single requests
+
+While a profiled request runs, a background thread periodically samples
+the Python stacks of the threads currently working on it (the event loop
+thread and any query worker running its tasks) and counts them in the
+folded "frame;frame;frame count" format that flamegraph.pl and speedscope
+read. Sampling only inspects frames, so the profiled code runs unmodified.
+The event loop thread is shared with other requests, so its samples can
+include their work too; samples of the idle loop are skipped.
+"""
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import os
+import sys
+import threading
+import time
+import uuid
+
+
+def _frame_label(frame) -> str:
+    """function (file:line) label of one frame"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    """Whether a thread is parked in the event loop's selector"""
+    return frame.f_code.co_filename.endswith("selectors.py")
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads attached to one request"""
+
+    def __init__(self, interval: float):
+        """
+        Initialize profiler (sampling starts with start())
+
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        # Thread id -> attach count (a thread can attach re-entrantly)
+        self._threads: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @contextmanager
+    def attach(self, thread_id: Optional[int] = None) -> Iterator[None]:
+        """
+        Sample a thread while the enclosed block runs
+
+        Args:
+            thread_id: Thread to sample (default: the calling thread)
+        """
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._threads[thread_id] == 1:
+                    del self._threads[thread_id]
+                else:
+                    self._threads[thread_id] -= 1
+
+    def _sample(self) -> None:
+        """Record one stack per attached thread"""
+        with self._lock:
+            thread_ids = list(self._threads)
+        frames = sys._current_frames()
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is None or _is_idle(frame):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def _run(self) -> None:
+        """Sampler thread body"""
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        """Start the sampler thread"""
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread"""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def folded(self) -> str:
+        """
+        Samples in folded stack format, most frequent first
+
+        Returns:
+            One "frame;frame;... count" line per distinct stack
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """A finished request profile"""
+
+    def __init__(
+        self,
+        profile_id: str,
+        token: str,
+        method: str,
+        path: str,
+        duration: float,
+        profiler: SamplingProfiler
+    ):
+        """
+        Initialize from a stopped profiler
+
+        Args:
+            profile_id: ID from new_id()
+            token: Share token that requested the profile
+            method: HTTP method of the request
+            path: Request path
+            duration: Request duration in seconds
+            profiler: Stopped profiler holding the samples
+        """
+        self.id = profile_id
+        self.token = token
+        self.method = method
+        self.path = path
+        self.created_at = time.time()
+        self.duration = duration
+        self.interval = profiler.interval
+        self.samples = profiler.samples
+        self.folded = profiler.folded()
+
+    @staticmethod
+    def new_id() -> str:
+        """Random profile ID"""
+        return uuid.uuid4().hex
+
+    def summary(self) -> dict:
+        """JSON-serializable description without the stacks"""
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration * 1000, 2),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+        }
+
+
+class ProfileStore:
+    """Keeps the most recent profiles, oldest dropped first"""
+
+    def __init__(self, max_profiles: int):
+        """
+        Initialize an empty store
+
+        Args:
+            max_profiles: Number of profiles kept
+        """
+        self.max_profiles = max_profiles
+        self._profiles: OrderedDict[str, Profile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile) -> None:
+        """Store a profile, evicting the oldest beyond max_profiles"""
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        """Look up a profile by ID"""
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def for_token(self, token: str) -> list[Profile]:
+        """Profiles requested by a token, newest first"""
+        with self._lock:
+            return [p for p in reversed(self._profiles.values()) if p.token == token]
@@ -0,0 +1,113 @@
+"""
+Per-key token bucket rate limiting
+"""
+import math
+import threading
+import time
+from typing import Optional
+
+
+class RateLimitDecision:
+    """Outcome of one rate limit check"""
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset: float, retry_after: float):
+        """
+        Initialize decision
+
+        Args:
+            allowed: Whether the request may proceed
+            limit: Bucket capacity (burst)
+            remaining: Whole tokens left after this request
+            reset: Seconds until the bucket is full again
+            retry_after: Seconds until the next token is available
+        """
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str]:
+        """Standard rate limit response headers"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TokenBucket:
+    """Bucket of `capacity` tokens refilled continuously at `rate` per second"""
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> RateLimitDecision:
+        """
+        Take one token if available (caller holds the limiter lock)
+
+        Args:
+            now: Current time.monotonic()
+
+        Returns:
+            RateLimitDecision for this request
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        allowed = self.tokens >= 1
+        if allowed:
+            self.tokens -= 1
+
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=self.capacity,
+            remaining=int(self.tokens),
+            reset=(self.capacity - self.tokens) / self.rate,
+            retry_after=0.0 if allowed else (1 - self.tokens) / self.rate
+        )
+
+
+class RateLimiter:
+    """Thread-safe token buckets, one per key, created on first use"""
+
+    def __init__(self):
+        """Initialize with no buckets"""
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def check(self, key: str, requests_per_minute: float, burst: int) -> RateLimitDecision:
+        """
+        Consume one request from a key's bucket
+
+        Args:
+            key: Bucket key (share token)
+            requests_per_minute: Sustained request rate
+            burst: Bucket capacity
+
+        Returns:
+            RateLimitDecision (allowed or not, with header values)
+        """
+        with self._lock:
+            bucket: Optional[TokenBucket] = self._buckets.get(key)
+            rate = requests_per_minute / 60.0
+            if bucket is None or bucket.rate != rate or bucket.capacity != burst:
+                bucket = self._buckets[key] = TokenBucket(rate, burst)
+            decision = bucket.take(time.monotonic())
+            if not decision.allowed:
+                self.rejected += 1
+            return decision
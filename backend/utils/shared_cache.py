@@ -0,0 +1,388 @@
+"""
+Host-local result cache shared by every worker process
+
+Query results are stored in a SQLite file in WAL mode, so the uvicorn
+workers of one host read each other's results instead of each warming a
+private cache. Every write is one transaction (insert, expiry sweep and
+LRU eviction commit together or not at all), readers never block behind
+writers, and a busy or unreadable file only ever turns into a cache miss
+or a skipped write. Entries expire by wall-clock time, since monotonic
+clocks are not comparable across processes.
+
+Recency is tracked at most once per TOUCH_INTERVAL per entry: hits record
+their access time in memory and the next write of the process applies
+them, so a hit never takes the write lock.
+
+Triggers keep the entry count and total size in a meta table. Every
+write reads them back, and stats() reports that snapshot, so a metrics
+scrape on the event loop never waits on the file.
+
+Values are pickled. The file is created readable by the current user
+only; point SHARED_CACHE_PATH at a directory no other user can write.
+"""
+from typing import Any, Hashable, Optional
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from utils.cache import LRUCache
+from utils.connection_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the stored value layout changes, so old entries are ignored
+FORMAT_VERSION = 1
+
+# Seconds between recorded accesses of the same entry
+TOUCH_INTERVAL = 1.0
+
+# Pending touches that make a hit flush them without waiting for a write
+TOUCH_BATCH = 256
+
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('bytes', 0);
+INSERT OR IGNORE INTO meta (name, value) SELECT 'entries', COUNT(*) FROM entries;
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_insert_count AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + 1 WHERE name = 'entries';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete_count AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - 1 WHERE name = 'entries';
+END;
+COMMIT;
+"""
+
+
+class SharedCache:
+    """LRU/TTL cache in a SQLite file shared by processes on one host"""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        default_ttl: float,
+        busy_timeout: float,
+        pool_size: int
+    ):
+        """
+        Initialize cache (the file is opened on first use)
+
+        Args:
+            path: SQLite file shared by the workers
+            max_bytes: Upper bound on the summed size of all stored values
+            default_ttl: TTL in seconds used when set() gets no ttl
+            busy_timeout: Seconds a write waits for another writer
+            pool_size: Maximum number of open connections per process
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.busy_timeout = busy_timeout
+        self.pool = ConnectionPool(self._connect, pool_size)
+        # Hashed key -> last access time not yet written
+        self._touched: dict[bytes, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+        # Size of the shared file as of this process's last write, so stats
+        # (read at scrape time on the event loop) never touch the file
+        self._entries = 0
+        self._bytes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection, creating the file and schema if needed"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.path):
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            # A cache survives losing the last transactions on power loss
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._read_size(connection)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def _read_size(self, connection: sqlite3.Connection) -> None:
+        """Refresh the entries and bytes snapshot from the trigger-kept totals"""
+        size = dict(connection.execute("SELECT name, value FROM meta").fetchall())
+        with self._lock:
+            self._entries = size.get("entries", 0)
+            self._bytes = size.get("bytes", 0)
+
+    @staticmethod
+    def _hash(key: Hashable) -> bytes:
+        """Fixed-size key that is identical in every process"""
+        return hashlib.sha256(repr((FORMAT_VERSION, key)).encode("utf-8")).digest()
+
+    def lookup(self, key: Hashable, record_stats: bool = True) -> Optional[tuple[Any, float]]:
+        """
+        Look up a value and its expiry time
+
+        Args:
+            key: Cache key
+            record_stats: Count this lookup in hits/misses
+
+        Returns:
+            Tuple of (value, expires_at as a POSIX timestamp), or None on
+            miss, expiry or an unreadable cache file
+        """
+        hashed = self._hash(key)
+        now = time.time()
+        try:
+            with self.pool.connection() as connection:
+                row = connection.execute(
+                    "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?",
+                    (hashed,)
+                ).fetchone()
+            if row is not None and row[1] > now:
+                value = pickle.loads(row[0])
+            else:
+                row = None
+        except (sqlite3.Error, OSError, pickle.UnpicklingError) as e:
+            self._failed("read", e)
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += record_stats
+                return None
+            self.hits += record_stats
+            if row[2] < now - TOUCH_INTERVAL:
+                self._touched[hashed] = now
+            flush = len(self._touched) >= TOUCH_BATCH
+        if flush:
+            self._write(lambda connection: None)
+        return value, row[1]
+
+    def get(self, key: Hashable, record_stats: bool = True) -> Optional[Any]:
+        """
+        Look up a value
+
+        Args:
+            key: Cache key
+            record_stats: Count this lookup in hits/misses
+
+        Returns:
+            Cached value, or None on miss or expiry
+        """
+        entry = self.lookup(key, record_stats)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store a value, evicting expired and least recently used entries
+
+        Args:
+            key: Cache key
+            value: Value to store (must be picklable)
+            ttl: Time to live in seconds (defaults to default_ttl)
+
+        Returns:
+            True if stored; False if the value alone exceeds max_bytes, the
+            ttl is not positive or the write could not be made
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return False
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return False
+
+        hashed = self._hash(key)
+
+        def store(connection: sqlite3.Connection) -> None:
+            now = time.time()
+            # DELETE + INSERT rather than REPLACE, so the size triggers fire
+            connection.execute("DELETE FROM entries WHERE key = ?", (hashed,))
+            connection.execute(
+                "INSERT INTO entries (key, size, expires_at, accessed_at, value) VALUES (?, ?, ?, ?, ?)",
+                (hashed, len(blob), now + ttl, now, blob)
+            )
+
+        return self._write(store)
+
+    def _write(self, change) -> bool:
+        """Apply a change, pending touches and eviction in one transaction"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        try:
+            with self.pool.connection() as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    connection.executemany(
+                        "UPDATE entries SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                        [(at, hashed, at) for hashed, at in touched.items()]
+                    )
+                    change(connection)
+                    self._evict(connection)
+                    self._read_size(connection)
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+        except (sqlite3.Error, OSError) as e:
+            self._failed("write", e)
+            return False
+        return True
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """Drop expired entries, then least recently used ones over max_bytes"""
+        expired = connection.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.expirations += expired
+
+        excess = connection.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0] - self.max_bytes
+        while excess > 0:
+            victims = []
+            for hashed, size in connection.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 64"
+            ):
+                victims.append((hashed,))
+                excess -= size
+                if excess <= 0:
+                    break
+            if not victims:
+                break
+            connection.executemany("DELETE FROM entries WHERE key = ?", victims)
+            self.evictions += len(victims)
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        """Count and log a cache error (the query itself carries on)"""
+        self.errors += 1
+        logger.warning("Shared cache error", extra={"operation": operation, "error": str(error)})
+
+    def clear(self) -> None:
+        """Drop all entries of every process (counters are kept)"""
+        self._write(lambda connection: connection.execute("DELETE FROM entries"))
+
+    def stats(self) -> dict:
+        """
+        Snapshot of cache counters
+
+        Never touches the file, so it is safe to call on the event loop.
+
+        Returns:
+            Dict with entries and bytes of the shared file as of this
+            process's last write, and this process's hits, misses,
+            evictions, expirations and errors
+        """
+        with self._lock:
+            return {
+                "entries": self._entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "errors": self.errors,
+            }
+
+
+class TieredCache:
+    """Per-process LRUCache in front of a host-wide SharedCache"""
+
+    def __init__(self, local: LRUCache, shared: SharedCache):
+        """
+        Initialize cache
+
+        Args:
+            local: In-process cache checked first
+            shared: Host-wide cache checked on a local miss; hits are
+                copied into the local cache for their remaining TTL
+        """
+        self.local = local
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, record_stats: bool = True) -> Optional[Any]:
+        """
+        Look up a value locally, then in the shared cache
+
+        Args:
+            key: Cache key
+            record_stats: Count this lookup in hits/misses
+
+        Returns:
+            Cached value, or None on miss or expiry
+        """
+        value = self.local.get(key, record_stats=False)
+        if value is None:
+            entry = self.shared.lookup(key, record_stats)
+            if entry is not None:
+                value, expires_at = entry
+                self.local.set(key, value, ttl=expires_at - time.time())
+
+        with self._lock:
+            if value is None:
+                self.misses += record_stats
+            else:
+                self.hits += record_stats
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store a value in both caches
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live in seconds (defaults to each cache's default)
+
+        Returns:
+            True if the local cache stored the value
+        """
+        self.shared.set(key, value, ttl)
+        return self.local.set(key, value, ttl)
+
+    def clear(self) -> None:
+        """Drop all entries of both caches"""
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self) -> dict:
+        """
+        Snapshot of cache counters
+
+        Returns:
+            Local cache stats with combined hits/misses, and the shared
+            cache's stats under "shared"
+        """
+        stats = self.local.stats()
+        stats.update(hits=self.hits, misses=self.misses, shared=self.shared.stats())
+        return stats
@@ -0,0 +1,100 @@
+"""
+Single-flight call coalescing
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class _LeaderAborted(Exception):
+    """Raised to followers when the leading call was interrupted"""
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution
+
+    The first caller for a key (the leader) runs the function; callers
+    arriving while it runs (followers) block and receive the same result
+    or the same exception. If the leader is interrupted by a
+    BaseException such as cancellation, followers do not inherit it and
+    retry instead, so one of them becomes the new leader.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight"""
+        self._calls: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once per key among concurrent callers
+
+        Args:
+            key: Key identifying equivalent calls
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            Result of fn (from this call or the in-flight leader)
+
+        Raises:
+            Exception: Whatever fn raised in the leading call
+        """
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._calls[key] = future
+                    self.executions += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                return self._lead(key, future, fn)
+
+            try:
+                return future.result()
+            except _LeaderAborted:
+                with self._lock:
+                    self.coalesced -= 1
+                continue
+
+    def _lead(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> Any:
+        """Execute fn as leader and publish the outcome to followers"""
+        try:
+            result = fn()
+        except Exception as e:
+            self._forget(key)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self._forget(key)
+            future.set_exception(_LeaderAborted())
+            raise
+
+        self._forget(key)
+        future.set_result(result)
+        return result
+
+    def _forget(self, key: Hashable) -> None:
+        """Remove key before publishing so late callers start a fresh call"""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Snapshot of coalescing counters
+
+        Returns:
+            Dict with in_flight, executions and coalesced (executions saved)
+        """
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+            }
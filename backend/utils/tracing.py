@@ -0,0 +1,129 @@
+"""
+Per-request stage timing
+
+A RequestTrace lives in a context variable for the duration of a request.
+Code anywhere below the route (validation, planning, backend execution,
+serialization) wraps its work in `stage(name)`; QueryExecutor copies the
+request context into worker threads, so stages recorded there land in
+the same trace. Without an active trace a stage costs one context
+variable lookup.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
+import threading
+import time
+
+
+class RequestTrace:
+    """Accumulated stage durations of one request"""
+
+    def __init__(self, profiler: Optional[Any] = None):
+        """
+        Initialize an empty trace
+
+        Args:
+            profiler: SamplingProfiler recording this request, if profiled
+        """
+        self.start = time.perf_counter()
+        self.profiler = profiler
+        # Stage name -> seconds; insertion order is first-recorded order
+        self.stages: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+        Add time to a stage (stages recorded repeatedly accumulate)
+
+        Args:
+            name: Stage name
+            seconds: Duration to add
+        """
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        """Seconds since the request started"""
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value with every stage and the total so far
+
+        Returns:
+            Comma-separated `name;dur=<ms>` entries
+        """
+        with self._lock:
+            stages = list(self.stages.items())
+        stages.append(("total", self.elapsed()))
+        return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """Trace of the request being handled, if any"""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_request(trace: RequestTrace) -> Iterator[RequestTrace]:
+    """
+    Make a trace current for the enclosed request handling
+
+    Args:
+        trace: Trace of the request
+
+    Yields:
+        The trace
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a stage of the current request
+
+    Args:
+        name: Stage name (validate, plan, execute, ...)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+def run_traced(fn: Callable[..., Any], args: tuple, queued_since: float) -> Any:
+    """
+    Run a call on a worker thread inside the submitting request's trace
+
+    Records the time spent waiting for the worker as the "queue" stage
+    and lets the request's profiler sample this thread while it works.
+
+    Args:
+        fn: Callable to run
+        args: Positional arguments for fn
+        queued_since: time.perf_counter() when the call was submitted
+
+    Returns:
+        Return value of fn
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return fn(*args)
+    trace.add("queue", time.perf_counter() - queued_since)
+    if trace.profiler is None:
+        return fn(*args)
+    with trace.profiler.attach():
+        return fn(*args)